@@ -0,0 +1,73 @@
+from pkg_resources import require
+require("cothread==2.14")
+from cothread.catools import camonitor
+from Ring_Buffer import Ring_Buffer
+
+
+class EPICS_Monitor():
+    """Keeps the recent history of a set of Epics PVs using camonitor subscriptions.
+
+    Every update sent by the IOC is pushed into a bounded ring buffer for that PV,
+    so the latest value, or the last N samples, can be read without a network
+    round trip. Waveform PVs have all of their samples pushed into the buffer.
+
+    Attributes:
+        buffers (dict): Ring_Buffer for each PV, keyed by the full PV name
+        subscriptions (list): cothread subscriptions, closed by close()
+    """
+
+    def __init__(self, pv_names, depth):
+        """Creates a ring buffer for each PV and subscribes to them
+
+        Args:
+            pv_names (list): Full names of the PVs to monitor
+            depth (int): Number of samples kept for each PV
+        Returns:
+
+        """
+        self.buffers = dict((name, Ring_Buffer(depth)) for name in pv_names)
+        # all_updates makes sure no sample is dropped if updates arrive faster than they are handled
+        self.subscriptions = camonitor(pv_names, self._update, all_updates=True)
+
+    def _update(self, value, index):
+        """Private callback that stores each update sent by camonitor
+
+        Args:
+            value (variant): The new value, augmented with the PV name by cothread
+            index (int): Position of the PV in the subscription list
+        Returns:
+
+        """
+        self.buffers[value.name].append(value)
+
+    def get_latest(self, pv_name):
+        """Gets the most recent update of a PV
+
+        Args:
+            pv_name (str): Full name of the PV
+        Returns:
+            variant: The latest value, or None if no update has arrived yet
+        """
+        return self.buffers[pv_name].get_latest()
+
+    def get_last(self, pv_name, samples):
+        """Gets the most recent samples of a PV
+
+        Args:
+            pv_name (str): Full name of the PV
+            samples (int): Number of samples wanted
+        Returns:
+            float array: The samples, oldest first
+        """
+        return self.buffers[pv_name].get_last(samples)
+
+    def close(self):
+        """Closes all of the subscriptions, the buffered data is kept
+
+        Args:
+
+        Returns:
+
+        """
+        for subscription in self.subscriptions:
+            subscription.close()
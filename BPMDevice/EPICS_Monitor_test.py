@@ -0,0 +1,51 @@
+import unittest
+from mock import patch, MagicMock
+from BPMDevice.EPICS_Monitor import EPICS_Monitor
+
+
+class Update(float):
+    # cothread gives each update the name of the PV it came from
+    def __new__(cls, value, name):
+        update = float.__new__(cls, value)
+        update.name = name
+        return update
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    @patch("BPMDevice.EPICS_Monitor.camonitor")
+    def setUp(self, mock_camonitor):
+        # Stuff you run before each test
+        self.subscription = MagicMock()
+        mock_camonitor.return_value = [self.subscription]
+        self.monitor = EPICS_Monitor(["BPM:X", "BPM:Y"], 3)
+        mock_camonitor.assert_called_with(["BPM:X", "BPM:Y"], self.monitor._update, all_updates=True)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    def test_updates_stored_for_each_pv(self):
+        self.assertEqual(self.monitor.get_latest("BPM:X"), None)
+        for value in [1.0, 2.0, 3.0, 4.0]:
+            self.monitor._update(Update(value, "BPM:X"), 0)
+        self.monitor._update(Update(-1.0, "BPM:Y"), 1)
+        self.assertEqual(self.monitor.get_latest("BPM:X"), 4.0)
+        self.assertEqual(self.monitor.get_last("BPM:X", 5).tolist(), [2.0, 3.0, 4.0])  # only the depth is kept
+        self.assertEqual(self.monitor.get_latest("BPM:Y"), -1.0)
+
+    def test_close_closes_subscriptions(self):
+        self.monitor._update(Update(1.0, "BPM:X"), 0)
+        self.monitor.close()
+        self.assertTrue(self.subscription.close.called)
+        self.assertEqual(self.monitor.get_latest("BPM:X"), 1.0)  # the data is kept
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,9 @@ from pkg_resources import require
 require("cothread==2.14")
 from cothread.catools import *
 import cothread
+import Instrument_Transport
 from Generic_BPMDevice import *
-from subprocess import Popen, PIPE
+from EPICS_Monitor import EPICS_Monitor
 import numpy as np
 
 class Electron_BPMDevice(Generic_BPMDevice):
@@ -17,20 +18,44 @@ class Electron_BPMDevice(Generic_BPMDevice):
 
     Attributes:
         epicsID (str): Channel identifier string that will be used to access PVs.  
+        pv_names (dict): Full channel name for each PV in pv_list, built once at start up.
     """
 
+    pv_list = ["SA:X", "SA:Y", "SA:CURRENT", "SA:POWER",
+               "SA:A", "SA:B", "SA:C", "SA:D",
+               "SA:AN", "SA:BN", "SA:CN", "SA:DN"]  # Every PV used by the getters, connected at start up
+
+    def _pv_name(self, pv):
+        """Private method that gets the full channel name of a PV.
+
+        Args:
+            pv (str): Name of the Epics process variable, without the Epics ID.
+        Returns:
+            str: Full channel name of the process variable.
+        """
+        if pv in self.pv_names:
+            return self.pv_names[pv]  # Use the name built at start up
+        return self.epicsID + pv
+
     def _read_epics_pv (self,pv):
         """Private method to read an Epics process variable.
         
         Wraps up caget call, makes it easy for multiple reads to be programmed 
-        and a timeout added if required. 
+        and a timeout added if required. If the PV is being monitored the latest
+        update is returned instead, without going over the network.
         
         Args:
             pv (str): Name of the Epics process variable to read.  
         Returns: 
             variant: Value of requested process variable.
         """
-        return caget(self.epicsID+pv)  # Get PV data
+        name = self._pv_name(pv)
+        if self.monitor is not None and name in self.monitor.buffers:
+            value = self.monitor.get_latest(name)
+            if value is not None:  # Fall back to caget until the first update arrives
+                return value
+        with Instrument_Transport.timed("caget", "Electron_BPMDevice"):
+            return Instrument_Transport.epics_call("caget", caget, name)  # Get PV data
 
     def __init__(self, dev_ID):
         """Initializes the Libera BPM device object and assigns it an ID. 
@@ -44,14 +69,13 @@ class Electron_BPMDevice(Generic_BPMDevice):
             raise TypeError  # Raises a type error if integer is not used
         else:
             self.epicsID = dev_ID # TS-DI-EBPM-04:
+        self.monitor = None  # PVs are polled with caget until monitoring is started
+        self.pv_names = dict((pv, self.epicsID + pv) for pv in self.pv_list)  # Build each channel name once
 
-        pv = "SA:X"  # Any PV hosts on the device could be used here
-        node = connect(self.epicsID + pv, cainfo=True).host.split(":")[0]  # Get the IP address of the host
-        host_info = Popen(["arp", "-n", node], stdout=PIPE).communicate()[0]  # Uses arp to get more info about the host
-        host_info = host_info.split("\n")[1]  # Splits the data about the host
-        index = host_info.find(":")  # Gets the first ":", used in the MAC address
-        host_info = host_info[index - 2:index + 15]  # Gets the devices MAC address
-        self.macaddress = host_info
+        # Connect every channel in parallel, cothread keeps the channels open for later reads
+        host = Instrument_Transport.epics_connect(connect, [self.pv_names[pv] for pv in self.pv_list])
+        node = host.split(":")[0]  # Get the IP address of the host
+        self.macaddress = Instrument_Transport.host_mac_address(node)  # Gets the devices MAC address using arp
         print "Opened connection to "+self.get_device_ID()  # Informs the user the device is now connected to
 
     def __del__(self):
@@ -61,7 +85,53 @@ class Electron_BPMDevice(Generic_BPMDevice):
         Returns:
          
         """
-        print "Closed connection to "+self.get_device_ID()
+        if getattr(self, "monitor", None) is not None:  # Nothing to close if the connection failed
+            self.stop_monitoring()  # Closes any camonitor subscriptions
+        if getattr(self, "macaddress", None) is not None:  # Only set once the device has connected
+            print "Closed connection to "+self.get_device_ID()
+
+    def start_monitoring(self, pvs=None, depth=10000):
+        """Subscribes to PVs so that reads are served from local ring buffers
+
+        Each update sent by the device is stored as it arrives, so the getters
+        return the latest value without a network round trip, and the history
+        can be read with get_monitored_samples. SA, FA and TBT PVs can be used.
+
+        Args:
+            pvs (str list): PV names, without the Epics ID, to monitor. Defaults
+                to the SA PVs used by the getters.
+            depth (int): Number of samples kept for each PV
+        Returns:
+
+        """
+        if pvs is None:
+            pvs = self.pv_list
+        self.stop_monitoring()  # Only one set of subscriptions is kept at a time
+        self.monitor = EPICS_Monitor([self._pv_name(pv) for pv in pvs], depth)
+
+    def stop_monitoring(self):
+        """Closes the monitor subscriptions, the getters go back to using caget
+
+        Args:
+        Returns:
+
+        """
+        if self.monitor is not None:
+            self.monitor.close()
+            self.monitor = None
+
+    def get_monitored_samples(self, pv, samples):
+        """Gets the most recent samples of a monitored PV
+
+        Args:
+            pv (str): PV name, without the Epics ID
+            samples (int): Number of samples wanted
+        Returns:
+            float array: The samples, oldest first
+        """
+        if self.monitor is None:
+            raise Exception("Monitoring has not been started")
+        return self.monitor.get_last(self._pv_name(pv), samples)
 
     def get_X_position(self):
         """Override method, gets the calculated X position of the beam.
@@ -1,4 +1,11 @@
 from abc import ABCMeta, abstractmethod
+from Ring_Buffer import Ring_Buffer
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import time
+import warnings
+import Instrument_Transport
 
 class Generic_BPMDevice():
     """Generic BPM Device class used for hardware abstraction.
@@ -12,6 +19,139 @@ class Generic_BPMDevice():
 
     __metaclass__ = ABCMeta  # Allows for abstract methods to be created.
 
+    def _read_snapshot(self, key):
+        """Private method that takes a new snapshot and gets one value from it
+
+        Used by devices whose getters are served by their get_snapshot override. Every
+        call is a new acquisition, nothing is cached between calls. To read several
+        values from the same acquisition, call get_snapshot and read them from the
+        dict it returns.
+
+        Args:
+            key (str): Name of the value in the snapshot
+        Returns:
+            variant: The value from the new acquisition
+        """
+        if getattr(self.get_snapshot, "im_func", None) is Generic_BPMDevice.get_snapshot.im_func:
+            # The default get_snapshot calls the getters, which would call back here forever
+            raise Exception(type(self).__name__ + " reads its values from snapshots, so must override get_snapshot")
+        return self.get_snapshot()[key]
+
+    def get_snapshot(self):
+        """Takes one acquisition and gets every derived value from it
+
+        Devices that can read all of their values from a single acquisition should
+        override this, and can serve their getters from it with _read_snapshot. By
+        default each getter is simply called in turn. Every call takes a new
+        acquisition, so the values read from the returned dict all come from the
+        same one.
+
+        Args:
+        Returns:
+            dict: Derived values keyed by the name of the getter that returns them,
+                "X_position", "Y_position", "beam_current", "input_power", "ADC_sum",
+                "raw_BPM_buttons" and "normalised_BPM_buttons"
+        """
+        return {
+            "X_position": self.get_X_position(),
+            "Y_position": self.get_Y_position(),
+            "beam_current": self.get_beam_current(),
+            "input_power": self.get_input_power(),
+            "ADC_sum": self.get_ADC_sum(),
+            "raw_BPM_buttons": self.get_raw_BPM_buttons(),
+            "normalised_BPM_buttons": self.get_normalised_BPM_buttons()}
+
+    def settle(self, max_wait, tolerance=0.01, window=5, poll_interval=0.01, clock=None, sleep=None,
+               quantities=("ADC_sum",), min_dwell=0.0, absolute_tolerance=0.0):
+        """Waits until the chosen readings have stopped changing, or until max_wait has passed
+
+        A new snapshot is taken at each poll, so every reading is from an acquisition made
+        after the setpoint was applied rather than a cached or repeated value. Readings
+        asked for before min_dwell has passed are not kept, as the acquisition may have
+        started before the setpoint took effect. The last few readings of each quantity are
+        kept, and the signal is taken to be settled once the spread of each is within the
+        tolerance of their mean, or within the absolute tolerance. Quantities with several
+        values, such as raw_BPM_buttons, are checked value by value. This lets each point
+        wait only as long as it needs to, with max_wait as the worst case.
+
+        When a session is being recorded the number of polls is recorded too, and a replay
+        makes exactly that many polls and gives back the recorded time, so the replayed
+        acquisitions stay in step with the recording however fast the replay runs.
+
+        Args:
+            max_wait (float): Longest time in seconds to wait for, nothing is polled if this is 0
+            tolerance (float): Largest spread of the readings allowed, as a fraction of their mean
+            window (int): Number of readings that have to agree
+            poll_interval (float): Time in seconds to wait between readings
+            clock (callable): Function that returns the current time in seconds, time.time if None is given
+            sleep (callable): Function used to wait between readings, time.sleep if None is given
+            quantities (str list): Snapshot values that have to settle, e.g. ("X_position", "Y_position"),
+                or "raw_BPM_buttons" to wait for every button
+            min_dwell (float): Time in seconds after the start before readings are kept
+            absolute_tolerance (float): Spread of the readings that is always allowed, in their own
+                units, for values such as positions whose mean can be close to zero
+        Returns:
+            float: The time in seconds spent settling
+        """
+        if type(max_wait) != float and type(max_wait) != int and np.float64 != np.dtype(max_wait):
+            raise TypeError
+        elif type(window) != int:
+            raise TypeError
+        elif type(min_dwell) != float and type(min_dwell) != int:
+            raise TypeError
+        elif max_wait < 0 or tolerance < 0 or window < 1 or min_dwell < 0 or absolute_tolerance < 0:
+            raise ValueError
+        elif max_wait == 0:
+            return 0.0
+        if clock is None:
+            clock = time.time
+        if sleep is None:
+            sleep = time.sleep
+
+        session = Instrument_Transport.current_session()
+        if session is not None and session.replaying:
+            polls, elapsed = session.exchange("settle", "settle", list(quantities), None)
+            for poll in range(polls):
+                self.get_snapshot()  # The acquisitions the recording made, in the same order
+            return elapsed
+
+        readings = {}  # A Ring_Buffer for each element of each quantity, made at the first reading kept
+        start = clock()
+        requested = 0.0  # Time the acquisition is asked for, no earlier than the end of the last poll
+        polls = 0
+        elapsed = 0.0
+        try:
+            while True:
+                polls += 1
+                snapshot = self.get_snapshot()  # A new acquisition for every reading
+                elapsed = clock() - start
+                if requested >= min_dwell:
+                    settled = True
+                    for quantity in quantities:
+                        values = np.ravel(snapshot[quantity])  # Each button of raw_BPM_buttons settles on its own
+                        if quantity not in readings:
+                            readings[quantity] = [Ring_Buffer(window) for value in values]
+                        for buffer, value in zip(readings[quantity], values):
+                            buffer.append(value)
+                            if len(buffer) < window:
+                                settled = False
+                            else:
+                                last = buffer.get_last(window)
+                                spread = last.max() - last.min()
+                                if spread > tolerance * abs(last.mean()) and spread > absolute_tolerance:
+                                    settled = False
+                    if settled:
+                        return elapsed  # readings agree, so the signal has settled
+                if elapsed >= max_wait:
+                    warnings.warn("BPM readings did not settle within " + str(max_wait) + "s")
+                    return elapsed
+                sleep(poll_interval)
+                requested = elapsed
+        finally:
+            if session is not None:
+                # Recorded even if a poll fails, so the replay fails at the same poll
+                session.exchange("settle", "settle", list(quantities), lambda: [polls, elapsed])
+
     @abstractmethod
     def get_X_position (self):
         """Abstract method for override, gets the calculated X position of the beam.
@@ -0,0 +1,145 @@
+import unittest
+import os
+import shutil
+import tempfile
+import warnings
+from mock import patch, MagicMock
+from Generic_BPMDevice import *
+
+
+class Stub_BPMDevice(Generic_BPMDevice):
+    # Only the ADC sum is needed to test the settling, the rest are left empty
+    def __init__(self, readings):
+        self.readings = list(readings)
+
+    def get_ADC_sum(self):
+        return self.readings.pop(0)
+
+    def get_X_position(self):
+        pass
+
+    def get_Y_position(self):
+        pass
+
+    def get_beam_current(self):
+        pass
+
+    def get_input_power(self):
+        pass
+
+    def get_raw_BPM_buttons(self):
+        pass
+
+    def get_normalised_BPM_buttons(self):
+        pass
+
+    def get_device_ID(self):
+        pass
+
+    def get_input_tolerance(self):
+        pass
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    @patch("time.sleep")
+    @patch("time.time", side_effect=[0.0, 0.1, 0.2, 0.3, 0.4, 0.5])
+    def test_settle_returns_once_readings_agree(self, mock_time, mock_sleep):
+        BPM = Stub_BPMDevice([50, 80, 100, 100, 101])
+        self.assertEqual(BPM.settle(10, tolerance=0.02, window=3), 0.5)
+        self.assertEqual(mock_sleep.call_count, 4)
+        self.assertEqual(BPM.readings, [])
+
+    @patch("time.sleep")
+    @patch("time.time", side_effect=[0.0, 0.1, 0.2, 0.3, 0.4, 0.5])
+    def test_settle_on_buttons_compares_each_button(self, mock_time, mock_sleep):
+        BPM = Stub_BPMDevice([])
+        # The buttons are far apart but each is steady, apart from D which is still moving at first
+        BPM.get_snapshot = MagicMock(side_effect=[{"raw_BPM_buttons": (800, 900, 1100, 1000)},
+                                                  {"raw_BPM_buttons": (800, 900, 1100, 1100)},
+                                                  {"raw_BPM_buttons": (801, 900, 1100, 1200)},
+                                                  {"raw_BPM_buttons": (800, 901, 1099, 1200)},
+                                                  {"raw_BPM_buttons": (800, 900, 1100, 1201)}])
+        self.assertEqual(BPM.settle(10, tolerance=0.01, window=3, quantities=("raw_BPM_buttons",)), 0.5)
+        self.assertEqual(BPM.get_snapshot.call_count, 5)  # not settled until D stopped moving
+
+    @patch("time.sleep")
+    @patch("time.time", side_effect=[0.0, 0.1, 0.2, 0.3, 0.4, 0.5])
+    def test_settle_replayed_by_count(self, mock_time, mock_sleep):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "session.jsonl")
+            Instrument_Transport.start_recording(path)
+            self.assertEqual(Stub_BPMDevice([50, 80, 100, 100, 101]).settle(10, tolerance=0.02, window=3), 0.5)
+            Instrument_Transport.start_replay(path)
+            BPM = Stub_BPMDevice([0, 0, 0, 0, 0, 0, 0])  # would settle after three polls if it was not replayed
+            self.assertEqual(BPM.settle(10, tolerance=0.02, window=3), 0.5)
+            self.assertEqual(len(BPM.readings), 2)  # the five polls that were recorded
+            self.assertEqual(mock_sleep.call_count, 4)  # only the recording waited
+        finally:
+            Instrument_Transport.stop_session()
+            shutil.rmtree(directory)
+
+    @patch("time.sleep")
+    @patch("time.time", side_effect=[0.0, 0.5, 1.0, 1.5])
+    def test_settle_gives_up_at_max_wait(self, mock_time, mock_sleep):
+        BPM = Stub_BPMDevice([10, 50, 90])
+        with warnings.catch_warnings(record=True) as warning_list:
+            warnings.simplefilter("always")
+            self.assertEqual(BPM.settle(1.5, window=2), 1.5)
+        self.assertTrue(any(item.category == UserWarning for item in warning_list))
+
+    @patch("time.sleep")
+    @patch("time.time", side_effect=[0.0, 0.1, 0.2, 0.3, 0.4, 0.5])
+    def test_settle_on_positions_ignores_readings_before_min_dwell(self, mock_time, mock_sleep):
+        BPM = Stub_BPMDevice([])
+        # The first two readings agree but are taken too soon after the setpoint to be used
+        BPM.get_snapshot = MagicMock(side_effect=[{"X_position": 0.0, "Y_position": 0.0},
+                                                  {"X_position": 0.0, "Y_position": 0.0},
+                                                  {"X_position": 0.5, "Y_position": -0.2},
+                                                  {"X_position": 0.5, "Y_position": -0.2},
+                                                  {"X_position": 0.5005, "Y_position": -0.2}])
+        self.assertEqual(BPM.settle(10, tolerance=0, window=3, quantities=("X_position", "Y_position"),
+                                    min_dwell=0.15, absolute_tolerance=0.001), 0.5)
+        self.assertEqual(BPM.get_snapshot.call_count, 5)
+
+    def test_each_snapshot_read_is_a_new_acquisition(self):
+        BPM = Stub_BPMDevice([])
+        snapshots = [{"X_position": 1.0, "Y_position": 2.0}, {"X_position": 3.0, "Y_position": 4.0}]
+        BPM.get_snapshot = MagicMock(side_effect=snapshots)
+        self.assertEqual(BPM._read_snapshot("X_position"), 1.0)
+        self.assertEqual(BPM._read_snapshot("Y_position"), 4.0)  # nothing cached from the first read
+        self.assertEqual(BPM.get_snapshot.call_count, 2)
+
+    def test_read_snapshot_without_get_snapshot_override_raises(self):
+        BPM = Stub_BPMDevice([])
+        self.assertRaises(Exception, BPM._read_snapshot, "X_position")  # would recurse through the getters
+
+    def test_settle_without_max_wait_does_not_poll(self):
+        BPM = Stub_BPMDevice([])
+        self.assertEqual(BPM.settle(0), 0.0)
+
+    def test_settle_if_invalid_input_types_used(self):
+        BPM = Stub_BPMDevice([])
+        self.assertRaises(TypeError, BPM.settle, "1")
+        self.assertRaises(TypeError, BPM.settle, 1, 0.01, 2.5)
+        self.assertRaises(ValueError, BPM.settle, -1)
+        self.assertRaises(ValueError, BPM.settle, 1, 0.01, 0)
+        self.assertRaises(TypeError, BPM.settle, 1, min_dwell="1")
+        self.assertRaises(ValueError, BPM.settle, 1, min_dwell=-1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+
+
+class Ring_Buffer():
+    """Fixed size NumPy buffer that keeps the most recent samples written to it.
+
+    Once the buffer is full the oldest samples are overwritten, so the memory used
+    never grows no matter how long data is pushed into it. Whole arrays can be
+    appended at once, which is how waveform updates are stored.
+
+    Attributes:
+        depth (int): Maximum number of samples held in the buffer
+        data (float array): Storage for the samples, written in a circle
+        index (int): Position the next sample will be written to
+        count (int): Number of valid samples currently held
+        last_size (int): Number of samples written by the most recent append
+    """
+
+    def __init__(self, depth, dtype=float):
+        """Initialises an empty buffer
+
+        Args:
+            depth (int): Maximum number of samples held in the buffer
+            dtype (numpy dtype): Type of the samples stored (default float)
+        Returns:
+
+        """
+        if type(depth) != int:
+            raise TypeError
+        elif depth < 1:
+            raise ValueError
+        self.depth = depth
+        self.data = np.zeros(depth, dtype=dtype)
+        self.index = 0
+        self.count = 0
+        self.last_size = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, values):
+        """Writes a single value or an array of values to the buffer
+
+        Args:
+            values (float/float array): New samples, oldest first
+        Returns:
+
+        """
+        values = np.asarray(values, dtype=self.data.dtype).ravel()
+        values = values[-self.depth:]  # Only the newest samples can fit in the buffer
+        size = values.size
+        first = min(size, self.depth - self.index)  # Samples that fit before the end of the storage
+        self.data[self.index:self.index + first] = values[:first]
+        self.data[:size - first] = values[first:]  # Wrap the rest round to the start
+        self.index = (self.index + size) % self.depth
+        self.count = min(self.count + size, self.depth)
+        self.last_size = size
+
+    def get_last(self, samples):
+        """Gets the most recent samples from the buffer
+
+        Args:
+            samples (int): Number of samples wanted, fewer are returned if the buffer
+                does not hold that many yet
+        Returns:
+            float array: The samples, oldest first
+        """
+        samples = min(samples, self.count)
+        start = (self.index - samples) % self.depth
+        if start + samples <= self.depth:
+            return self.data[start:start + samples].copy()
+        return np.concatenate((self.data[start:], self.data[:self.index]))
+
+    def get_latest(self):
+        """Gets the values written by the most recent append
+
+        Args:
+
+        Returns:
+            variant: A float if a single value was written, otherwise the array of
+                samples written. None if nothing has been written yet.
+        """
+        if self.count == 0:
+            return None
+        elif self.last_size == 1:
+            return self.data[(self.index - 1) % self.depth]
+        return self.get_last(self.last_size)
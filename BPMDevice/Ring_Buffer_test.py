@@ -0,0 +1,40 @@
+import unittest
+from Ring_Buffer import Ring_Buffer
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.buffer = Ring_Buffer(5)
+        unittest.TestCase.setUp(self)
+
+    def test_invalid_depth(self):
+        self.assertRaises(TypeError, Ring_Buffer, 1.5)
+        self.assertRaises(ValueError, Ring_Buffer, 0)
+
+    def test_empty_buffer(self):
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.get_latest(), None)
+        self.assertEqual(self.buffer.get_last(3).tolist(), [])
+
+    def test_scalar_updates(self):
+        for value in range(3):
+            self.buffer.append(value)
+        self.assertEqual(self.buffer.get_latest(), 2)
+        self.assertEqual(self.buffer.get_last(2).tolist(), [1, 2])
+
+    def test_wraps_round_when_full(self):
+        self.buffer.append([0, 1, 2, 3])
+        self.buffer.append([4, 5, 6])
+        self.assertEqual(len(self.buffer), 5)
+        self.assertEqual(self.buffer.get_last(5).tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual(self.buffer.get_latest().tolist(), [4, 5, 6])
+
+    def test_update_larger_than_buffer(self):
+        self.buffer.append(range(12))
+        self.assertEqual(self.buffer.get_last(10).tolist(), [7, 8, 9, 10, 11])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ from Generic_BPMDevice import *
 from pkg_resources import require
 require("numpy")
 import numpy as np
+import Instrument_Transport
 
 
 class Simulated_BPMDevice(Generic_BPMDevice):
@@ -11,15 +12,50 @@ class Simulated_BPMDevice(Generic_BPMDevice):
 
     All of the abstract methods in the parent class must be overridden. This class has
     access to the RF device used in the testing so that it can read in the signals that
-    are supposedly provided to it via it's RF inputs. 
+    are supposedly provided to it via it's RF inputs. If it is also given a simulated
+    programmable attenuator, the power into each button, and so the beam position, follows
+    the attenuation of each channel. The model is in simulate(), which also takes whole
+    arrays of settings so large sweeps can be worked out in one call.
+
+    TBT, FA and ADC waveforms can be made with get_waveform(), with seeded Gaussian noise,
+    jitter on the positions and quantised ADC samples, so the code that reads, averages and
+    reports on waveforms can be run with as much data as a real device gives. With noise
+    set, the getters average a waveform, like the real devices, instead of giving the exact
+    value from the model. If it is given a timing profile, each reading takes as long as
+    it would on a real BPM.
+
+    The ADC saturates when a button's raw amplitude reaches 2 ** (adc_bits - 1) counts, which
+    with 16 bits and an equal splitter is about -30.3dBm into the BPM, -18.3dBm from the RF
+    source, well above the -40dBm limit the simulated RF source is normally given. Above that
+    the ADC waveform is clipped, so with noise the raw and normalised buttons, which are
+    measured from it, stop following the input power and a warning is given. The sum, current
+    and power come from the TBT data and are not clipped, and without noise every value is the
+    exact model, which has no ADC limit.
 
     Attributes:
         attenuation (float): Attenuation produced by the virtual splitter and cables
         RFSim (RF Simulator Obj) : Reference to an RF simulator 
         GateSim (Gate Source Simulator Obj) : Reference to a gate source simulator
+        ProgAttenSim (Programmable Attenuator Simulator Obj) : Reference to a programmable
+            attenuator simulator, between the splitter and the buttons
+        kx (float): Horizontal sensitivity of the pickups in mm
+        ky (float): Vertical sensitivity of the pickups in mm
+        position_jitter (float): Standard deviation of the turn by turn positions in mm
+        adc_noise (float): Standard deviation of the noise on each ADC sample in counts
+        adc_bits (int): Resolution of the ADC, the samples are rounded and clipped to its range
+        tbt_samples (int): Number of TBT samples averaged by the getters when there is noise
+        adc_samples (int): Number of ADC samples averaged by the getters when there is noise
+        random (RandomState): Source of the noise, seeded so runs can be repeated
+        timing (Timing_Profile): How long the device takes to answer and take an acquisition,
+            None to answer straight away
     """
 
-    def __init__(self, RFSim, GateSim=None):
+    fa_decimation = 64  # Number of turns averaged into each FA sample
+    adc_frequency = 0.2113  # Frequency of the signal the ADC sees, in cycles per sample
+
+    def __init__(self, RFSim, GateSim=None, ProgAttenSim=None, kx=10.0, ky=10.0, seed=None,
+                 position_jitter=0.0, adc_noise=0.0, adc_bits=16, tbt_samples=1000, adc_samples=1000,
+                 timing=None):
         """Initializes the Libera BPM device object and assigns it an ID. 
         
         Args:
@@ -29,6 +65,19 @@ class Simulated_BPMDevice(Generic_BPMDevice):
             GateSim (Gate_Source Object): The interface object that has access to a Gate Source
                 device. This will typically be a simulated GateSource, this is an input to this 
                 class so it know what signals are being sent to it. 
+            ProgAttenSim (Prog_Atten Object): The interface object that has access to a 
+                programmable attenuator, typically a simulated one. Each channel attenuates 
+                the signal into one button, None if there is no attenuator.
+            kx (float): Horizontal sensitivity of the pickups in mm
+            ky (float): Vertical sensitivity of the pickups in mm
+            seed (int): Seed for the noise, None to seed it differently every time
+            position_jitter (float): Standard deviation of the turn by turn positions in mm
+            adc_noise (float): Standard deviation of the noise on each ADC sample in counts
+            adc_bits (int): Resolution of the ADC in bits
+            tbt_samples (int): Number of TBT samples averaged by the getters when there is noise
+            adc_samples (int): Number of ADC samples averaged by the getters when there is noise
+            timing (Timing_Profile): How long the device takes to answer and take an acquisition,
+                None to answer straight away
                 
         Returns: 
             
@@ -37,6 +86,176 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         self.attenuation = 12  # Typical attenuation when using a 4 way splitter and cables
         self.RFSim = RFSim  # Instance of the RF source used, allows the simulator to know what signals are output
         self.GateSim = GateSim  # Instance of the Gate device, allows the simulator to know what signals are output
+        self.ProgAttenSim = ProgAttenSim  # Instance of the attenuator, allows the simulator to know each button's power
+        self.kx = kx
+        self.ky = ky
+        if type(position_jitter) != float and type(position_jitter) != int:
+            raise TypeError
+        elif type(adc_noise) != float and type(adc_noise) != int:
+            raise TypeError
+        elif type(adc_bits) != int or type(tbt_samples) != int or type(adc_samples) != int:
+            raise TypeError
+        elif position_jitter < 0 or adc_noise < 0 or adc_bits < 2 or tbt_samples < 1 or adc_samples < 1:
+            raise ValueError
+        self.position_jitter = position_jitter
+        self.adc_noise = adc_noise
+        self.adc_bits = adc_bits
+        self.tbt_samples = tbt_samples
+        self.adc_samples = adc_samples
+        self.random = np.random.RandomState(seed)
+        self.timing = timing  # How long the virtual device takes to respond
+
+    def simulate(self, output_power, attenuation, dutycycle=None):
+        """Works out what the BPM reads for given RF, attenuator and gate settings
+
+        The RF power is split four ways, losing the splitter and cable attenuation, and then
+        each channel of the attenuator takes its own attenuation off the signal into one
+        button. The settings can be single values or arrays with one row per point, so a
+        whole sweep can be worked out in one call.
+
+        Args:
+            output_power (float/float array): Power output by the RF source in dBm, one value per point
+            attenuation (float array): Attenuation of channels A, B, C and D in dB, shape (4,) or (points, 4)
+            dutycycle (float/float array): Duty cycle of the gate source (0-1), None if it is not modulating
+        Returns:
+            dict: Arrays of "button_powers" (mW into each button), "X_position", "Y_position",
+                "input_power", "beam_current", "ADC_sum", "raw_BPM_buttons" and
+                "normalised_BPM_buttons", with one row per point
+        """
+        output_power = np.asarray(output_power, dtype=float)
+        attenuation = np.asarray(attenuation, dtype=float)
+        if attenuation.shape[-1] != 4:
+            raise ValueError
+        loss = self.attenuation + 10 * np.log10(4)  # Splitter and cables, with the power shared between four buttons
+        if dutycycle is not None:
+            loss = loss + np.absolute(20 * np.log10(dutycycle))  # factor the duty cycle into the power
+        button_powers = 10 ** (((output_power - loss)[..., np.newaxis] - attenuation) / 10)  # dBm to mW
+        a, b, c, d = button_powers[..., 0], button_powers[..., 1], button_powers[..., 2], button_powers[..., 3]
+        total = a + b + c + d
+        input_power = 10 * np.log10(total)  # mW back to dBm
+        beam_current = 1000 * (1.1193) ** input_power  # Extracted equation from Rigol3030 vs Libera BPM measurements
+        raw = 4000 * beam_current[..., np.newaxis] * button_powers / total[..., np.newaxis]  # Linear value for each button
+        return {"button_powers": button_powers,
+                "X_position": self.kx * ((a + d) - (b + c)) / total,
+                "Y_position": self.ky * ((a + b) - (c + d)) / total,
+                "input_power": input_power,
+                "beam_current": beam_current,
+                "ADC_sum": raw.sum(axis=-1),
+                "raw_BPM_buttons": raw,
+                "normalised_BPM_buttons": raw / raw.mean(axis=-1)[..., np.newaxis]}
+
+    def _simulate_now(self):
+        """Private method that works out what the BPM reads with the current instrument settings
+
+        Args:
+
+        Returns:
+            dict: Values from simulate() for the current settings
+        """
+        dutycycle = None
+        attenuation = (0, 0, 0, 0)  # With no attenuator the splitter is equal
+        with Instrument_Transport.untimed():  # The real BPM does not have to ask the other instruments
+            if self.GateSim is not None and self.GateSim.get_modulation_state() != False:  # Checks if the gate is enabled
+                dutycycle = self.GateSim.get_pulse_dutycycle()  # Get the current duty cycle
+            if self.ProgAttenSim is not None:
+                attenuation = self.ProgAttenSim.get_global_attenuation()
+            output_power = self.RFSim.get_output_power()[0]
+        return self.simulate(output_power, attenuation, dutycycle)
+
+    def get_waveform(self, waveform, samples):
+        """Makes a waveform like the ones read from a real device, for the current settings
+
+        "TBT" and "FA" give the X and Y positions in mm, Q and the sum for each turn, or
+        for each FA sample. The positions have jitter added and the sum has the ADC noise
+        of four buttons added, FA samples being an average of fa_decimation turns so they
+        have less noise. "ADC" gives a sine wave on each button with the amplitude of the
+        raw button signal, with noise added and then rounded and clipped to the range of
+        the ADC. Every sample is made in one go, so long waveforms are quick to make.
+
+        Args:
+            waveform (str): "TBT", "FA" or "ADC"
+            samples (int): Number of samples in the waveform
+        Returns:
+            float array: Shape (samples, 4), columns X, Y, Q and sum for "TBT" and "FA", or
+                buttons A, B, C and D for "ADC", which are integer counts
+        """
+        if type(samples) != int:
+            raise TypeError
+        elif samples < 1:
+            raise ValueError
+        Instrument_Transport.simulated_delay(self.timing, "command", "acquire")
+        return self._waveform(waveform, samples, self._simulate_now())
+
+    def _waveform(self, waveform, samples, state):
+        """Private method that makes a waveform from the model, without taking any time
+
+        Args:
+            waveform (str): "TBT", "FA" or "ADC"
+            samples (int): Number of samples in the waveform
+            state (dict): Exact model values from _simulate_now
+        Returns:
+            float array: The waveform, see get_waveform
+        """
+        raw = state["raw_BPM_buttons"]
+        if waveform == "ADC":
+            limit = 2 ** (self.adc_bits - 1)
+            phase = 2 * np.pi * self.adc_frequency * np.arange(samples)
+            adc = raw * np.sin(phase)[:, np.newaxis]  # Each button sees the same RF, at its own amplitude
+            adc += self.random.normal(0, self.adc_noise, (samples, 4))
+            return np.clip(np.round(adc), -limit, limit - 1)  # Quantised to the ADC's range
+        elif waveform in ("TBT", "FA"):
+            a, b, c, d = raw
+            noise = np.array([self.position_jitter, self.position_jitter,
+                              self.position_jitter / ((self.kx + self.ky) / 2.0), 2 * self.adc_noise])
+            if waveform == "FA":
+                noise /= np.sqrt(self.fa_decimation)  # Each FA sample is an average of turns
+            values = np.array([state["X_position"], state["Y_position"],
+                               ((a + c) - (b + d)) / (a + b + c + d), state["ADC_sum"]])
+            return values + self.random.normal(0, 1, (samples, 4)) * noise
+        raise ValueError
+
+    def get_snapshot(self):
+        """Override method, takes one acquisition and derives every value from it
+
+        Without noise the exact model values are used. With noise a TBT and an ADC
+        waveform are averaged, like the real devices do, and the beam current and input
+        power are scaled from the exact model by the sum that was measured, so they have
+        the same noise as the sum. Either way the device is only asked for one acquisition.
+
+        Args:
+
+        Returns:
+            dict: Derived values keyed by the name of the getter that returns them,
+                "X_position", "Y_position", "beam_current", "input_power", "ADC_sum",
+                "raw_BPM_buttons" and "normalised_BPM_buttons"
+        """
+        Instrument_Transport.simulated_delay(self.timing, "command", "acquire")  # One acquisition for every value
+        state = self._simulate_now()
+        if self.position_jitter == 0 and self.adc_noise == 0:
+            snapshot = {
+                "X_position": float(state["X_position"]),
+                "Y_position": float(state["Y_position"]),
+                "beam_current": float(state["beam_current"]),
+                "input_power": float(state["input_power"]),
+                "ADC_sum": float(state["ADC_sum"]),
+                "raw_BPM_buttons": tuple(state["raw_BPM_buttons"].tolist()),
+                "normalised_BPM_buttons": tuple(state["normalised_BPM_buttons"].tolist())}
+            return snapshot
+        x, y, q, mean_sum = self._waveform("TBT", self.tbt_samples, state).mean(axis=0)
+        adc = self._waveform("ADC", self.adc_samples, state)
+        if adc.max() >= 2 ** (self.adc_bits - 1) - 1 or adc.min() <= -2 ** (self.adc_bits - 1):
+            warnings.warn("Simulated BPM ADC saturated, the raw button values are clipped")
+        raw = np.sqrt(2 * np.mean(adc ** 2, axis=0))  # Amplitude of each button from its RMS
+        scale = mean_sum / state["ADC_sum"]  # Noise on the sum, relative to the exact sum
+        snapshot = {
+            "X_position": float(x),
+            "Y_position": float(y),
+            "beam_current": float(state["beam_current"] * scale),
+            "input_power": float(state["input_power"] + 10 * np.log10(abs(scale))),
+            "ADC_sum": float(np.round(mean_sum)),  # round the Sum to an integer
+            "raw_BPM_buttons": tuple(raw.tolist()),
+            "normalised_BPM_buttons": tuple((raw / raw.mean()).tolist())}
+        return snapshot
 
     def get_X_position (self):
         """Override method, gets the calculated X position of the beam.
@@ -46,7 +265,7 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: X position in mm
         """
-        return 0.0  # With an equal splitter there should be no X shift
+        return self._read_snapshot("X_position")  # With an equal splitter there should be no X shift
 
     def get_Y_position(self):
         """Override method, gets the calculated X position of the beam.
@@ -56,7 +275,7 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Y position in mm
         """
-        return 0.0 # With an equal splitter there should be no Y shift
+        return self._read_snapshot("Y_position")  # With an equal splitter there should be no Y shift
 
     def get_beam_current(self):
         """Override method, gets the beam current read by the BPMs. 
@@ -69,30 +288,21 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Current in mA
         """
-        current = self.get_input_power()  # Gets the current input power
-        current = 1000 * (1.1193) ** current # Extracted equation from Rigol3030 vs Libera BPM measurements
-        return current
+        return self._read_snapshot("beam_current")
 
     def get_input_power(self):
         """Override method, gets the input power of the signals input to the device 
         
         This function assumes that a standard 4 way splitter is used, that combined with the cable losses give an 
-        estimated loss of 12 dBm. This is then taken off of the output power set by the RF device giving the result. 
+        estimated loss of 12 dBm. This is then taken off of the output power set by the RF device, along with any
+        attenuation from the programmable attenuator, giving the result. 
         
         Args:
         
         Returns: 
             float: Input power in dBm
         """
-        if self.GateSim == None:  # Checks if the simulation is using a gate source
-            return self.RFSim.get_output_power()[0] - self.attenuation
-        elif self.GateSim.get_modulation_state() == False:  # Checks if the simulated gate source is enabled
-            return self.RFSim.get_output_power()[0] - self.attenuation
-        else:  # gate source must be present and enabled
-            dutycycle = self.GateSim.get_pulse_dutycycle()  # Get the current duty cycle
-            log_cycle = 20 * np.log10(dutycycle)  # Convert the duty cycle into dB
-            # factor the duty cycle into the power read by the simulated BPM
-            return (self.RFSim.get_output_power()[0] - np.absolute(log_cycle)) - self.attenuation
+        return self._read_snapshot("input_power")
 
     def get_raw_BPM_buttons(self):
         """Override method, gets the raw signal from each BPM.
@@ -100,13 +310,12 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         Args:
             
         Returns: 
-            int: Raw signal from BPM A
-            int: Raw signal from BPM B
-            int: Raw signal from BPM C
-            int: Raw signal from BPM D
+            float: Raw signal from BPM A
+            float: Raw signal from BPM B
+            float: Raw signal from BPM C
+            float: Raw signal from BPM D
         """
-        ADC = 1000 * self.get_beam_current()  # Gets a linear value for the BPM
-        return ADC, ADC, ADC, ADC
+        return self._read_snapshot("raw_BPM_buttons")
 
     def get_normalised_BPM_buttons(self):
         """Override method, gets the normalised signal from each BPM.
@@ -119,7 +328,7 @@ class Simulated_BPMDevice(Generic_BPMDevice):
             float: Normalised signal from BPM C
             float: Normalised signal from BPM D
         """
-        return 1, 1, 1, 1  # Assumes all BPM pickups are equal
+        return self._read_snapshot("normalised_BPM_buttons")  # All 1 with an equal splitter
 
     def get_device_ID(self):
         """Override method, gets the type of BPM device that the device is
@@ -129,6 +338,7 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         Returns: 
             str: Device type 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return "Simulated BPM Device"
 
     def get_ADC_sum(self):
@@ -142,9 +352,7 @@ class Simulated_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: max input power in dBm
         """
-        a, b, c, d = self.get_raw_BPM_buttons()
-        sum = a + b + c + d  # Sums the BPM values used in the simulator
-        return sum
+        return self._read_snapshot("ADC_sum")  # Sum of the BPM values used in the simulator
 
     def get_input_tolerance(self):
         """Override method, gets the maximum input power the device can take
@@ -1,39 +1,128 @@
-# import unittest
-# from mock import patch
-# from Simulated_BPMDevice import *
-# import RFSignalGenerators
-#
-# # Needs to be redesigned to take into account the gate source object....
-#
-# class ExpectedDataTest(unittest.TestCase):
-#
-#     @classmethod
-#     def setUpClass(cls):
-#         # Stuff you only run once
-#         super(ExpectedDataTest, cls).setUpClass()
-#
-#     def setUp(self):
-#         # Stuff you run before each test
-#         unittest.TestCase.setUp(self)
-#
-#     def tearDown(self):
-#         # Stuff you want to run after each test
-#         pass
-#
-#     @patch("RFSignalGenerators.Simulated_RFSigGen")
-#     def test_Sim_BPM_get_output_power(self, mock_RFDev):
-#         test_output_values = -100
-#         simulator_attenuation = 12
-#         mock_RFDev.get_output_power.return_value = test_output_values
-#
-#         SimRF = Simulated_BPMDevice(mock_RFDev)
-#         SimRF.get_input_power()
-#         self.assertTrue(mock_RFDev.get_output_power.called)
-#         self.assertEqual(SimRF.get_input_power(), test_output_values - simulator_attenuation)
-#
-#     def test_get_input_tolerance(self):
-#         self.assertEqual(self.BPM_test_inst.get_input_tolerance(), -40)
-#
-#
-# if __name__ == "__main__":
-#         unittest.main()
\ No newline at end of file
+import unittest
+import warnings
+from mock import patch, MagicMock
+from Simulated_BPMDevice import *
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.RF = MagicMock()
+        self.RF.get_output_power.return_value = (-20.0, "-20.0DBM")
+        self.atten = MagicMock()
+        self.atten.get_global_attenuation.return_value = (0, 0, 0, 0)
+        self.BPM = Simulated_BPMDevice(self.RF, ProgAttenSim=self.atten)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    def test_equal_attenuation_gives_centred_beam(self):
+        self.assertEqual(self.BPM.get_X_position(), 0.0)
+        self.assertEqual(self.BPM.get_Y_position(), 0.0)
+        self.assertAlmostEqual(self.BPM.get_input_power(), -20.0 - 12)
+        for value in self.BPM.get_normalised_BPM_buttons():
+            self.assertAlmostEqual(value, 1.0)
+
+    def test_position_follows_attenuation(self):
+        self.atten.get_global_attenuation.return_value = (0, 10, 10, 0)  # B and C turned down, so beam moves to +X
+        self.assertAlmostEqual(self.BPM.get_X_position(), 10.0 * (2.0 - 0.2) / 2.2)
+        self.assertAlmostEqual(self.BPM.get_Y_position(), 0.0)
+        self.assertAlmostEqual(self.BPM.get_ADC_sum(), 4000 * self.BPM.get_beam_current())
+
+    def test_gate_duty_cycle_reduces_input_power(self):
+        gate = MagicMock()
+        gate.get_modulation_state.return_value = True
+        gate.get_pulse_dutycycle.return_value = 0.1
+        BPM = Simulated_BPMDevice(self.RF, gate)
+        self.assertAlmostEqual(BPM.get_input_power(), -20.0 - 20 - 12)
+
+    def test_whole_sweep_in_one_call(self):
+        attenuation = np.random.RandomState(0).uniform(0, 40, (1000, 4))
+        output_power = np.full(1000, -20.0)
+        results = self.BPM.simulate(output_power, attenuation)
+        self.assertEqual(results["X_position"].shape, (1000,))
+        self.assertEqual(results["raw_BPM_buttons"].shape, (1000, 4))
+        self.atten.get_global_attenuation.return_value = tuple(attenuation[10])
+        self.assertAlmostEqual(results["X_position"][10], self.BPM.get_X_position())
+        self.assertAlmostEqual(results["Y_position"][10], self.BPM.get_Y_position())
+
+    def test_simulate_if_invalid_input_types_used(self):
+        self.assertRaises(ValueError, self.BPM.simulate, -20, (0, 0, 0))
+
+    def test_seeded_waveforms_repeat(self):
+        first = Simulated_BPMDevice(self.RF, seed=3, position_jitter=0.01, adc_noise=5)
+        second = Simulated_BPMDevice(self.RF, seed=3, position_jitter=0.01, adc_noise=5)
+        for waveform in ("TBT", "FA", "ADC"):
+            self.assertTrue(np.array_equal(first.get_waveform(waveform, 100), second.get_waveform(waveform, 100)))
+
+    def test_waveform_noise_averages_to_the_model(self):
+        self.atten.get_global_attenuation.return_value = (0, 10, 10, 0)
+        BPM = Simulated_BPMDevice(self.RF, ProgAttenSim=self.atten, seed=0, position_jitter=0.1, adc_noise=20)
+        tbt = BPM.get_waveform("TBT", 100000)
+        fa = BPM.get_waveform("FA", 100000)
+        self.assertEqual(tbt.shape, (100000, 4))
+        self.assertAlmostEqual(tbt[:, 0].mean(), self.BPM.get_X_position(), places=2)
+        self.assertAlmostEqual(tbt[:, 0].std(), 0.1, places=2)
+        self.assertLess(fa[:, 0].std(), tbt[:, 0].std() / 4)  # FA samples average out the jitter
+        self.assertNotEqual(BPM.get_X_position(), BPM.get_X_position())  # Each reading is a new acquisition
+        self.assertAlmostEqual(BPM.get_X_position(), self.BPM.get_X_position(), places=1)
+
+    def test_adc_waveform_quantised(self):
+        BPM = Simulated_BPMDevice(self.RF, seed=0, adc_noise=2.5, adc_bits=12)
+        adc = BPM.get_waveform("ADC", 1000)
+        self.assertEqual(adc.shape, (1000, 4))
+        self.assertTrue(np.array_equal(adc, np.round(adc)))
+        self.assertEqual(adc.max(), 2 ** 11 - 1)  # The buttons are far above the range of a 12 bit ADC
+        self.assertEqual(adc.min(), -2 ** 11)
+
+    def test_adc_saturates_at_high_input_power(self):
+        BPM = Simulated_BPMDevice(self.RF, seed=0, adc_noise=5)
+        exact = self.BPM.get_snapshot()
+        with warnings.catch_warnings(record=True) as warning_list:
+            warnings.simplefilter("always")
+            snapshot = BPM.get_snapshot()  # -32dBm in, just below the ADC range
+        self.assertEqual(warning_list, [])
+        for raw, exact_raw in zip(snapshot["raw_BPM_buttons"], exact["raw_BPM_buttons"]):
+            self.assertAlmostEqual(raw / exact_raw, 1, places=2)
+        self.RF.get_output_power.return_value = (-10.0, "-10.0DBM")  # -22dBm in, above the ADC range
+        exact = self.BPM.get_snapshot()
+        with warnings.catch_warnings(record=True) as warning_list:
+            warnings.simplefilter("always")
+            snapshot = BPM.get_snapshot()
+        self.assertTrue(any(item.category == UserWarning for item in warning_list))
+        for raw, exact_raw in zip(snapshot["raw_BPM_buttons"], exact["raw_BPM_buttons"]):
+            self.assertLess(raw, 0.9 * exact_raw)  # clipped, so no longer following the input power
+            self.assertLess(raw, 2 ** 15 * np.sqrt(2))  # no more than a full scale square wave
+        self.assertAlmostEqual(snapshot["input_power"], exact["input_power"], places=2)  # from the TBT sum
+
+    def test_waveform_if_invalid_input_types_used(self):
+        self.assertRaises(ValueError, self.BPM.get_waveform, "XY", 10)
+        self.assertRaises(TypeError, self.BPM.get_waveform, "TBT", 1.5)
+        self.assertRaises(ValueError, self.BPM.get_waveform, "TBT", 0)
+        self.assertRaises(TypeError, Simulated_BPMDevice, self.RF, adc_noise="1")
+        self.assertRaises(ValueError, Simulated_BPMDevice, self.RF, position_jitter=-1)
+
+    def test_timing_profile_spent_on_each_reading(self):
+        clock = Instrument_Transport.Virtual_Clock(True)
+        start = clock.time()
+        BPM = Simulated_BPMDevice(self.RF, timing=Instrument_Transport.Timing_Profile(
+            latency=10, acquisition_time=100, clock=clock))
+        BPM.get_snapshot()
+        self.assertAlmostEqual(clock.time() - start, 110, places=2)  # every value from one acquisition
+        BPM.get_X_position()
+        self.assertAlmostEqual(clock.time() - start, 220, places=2)  # every getter is a new acquisition
+
+    def test_get_input_tolerance(self):
+        self.assertEqual(self.BPM.get_input_tolerance(), -40)
+
+
+if __name__ == "__main__":
+        unittest.main()
@@ -2,8 +2,9 @@ from pkg_resources import require
 require("cothread==2.14")
 from cothread.catools import *
 import cothread
+import Instrument_Transport
 from Generic_BPMDevice import *
-from subprocess import Popen, PIPE
+from EPICS_Monitor import EPICS_Monitor
 import numpy as np
 
 
@@ -16,8 +17,26 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
 
     Attributes:
         epicsID (str): Channel identifier string that will be used to access PVs.  
+        pv_names (dict): Full channel name for each PV in pv_list, built once at start up.
+        monitor (EPICS_Monitor): Subscriptions reads are served from, None when not monitoring.
+        saved_scan (int): Scan setting of the record before monitoring started.
     """
 
+    pv_list = [".X", ".Y", ".Sum", ".A", ".B", ".C", ".D", ".PROC", ".SCAN"]  # Every field used, connected at start up
+    monitored_pvs = [".X", ".Y", ".Sum", ".A", ".B", ".C", ".D"]  # Fields read by get_snapshot
+
+    def _pv_name(self, pv):
+        """Private method that gets the full channel name of a PV.
+
+        Args:
+            pv (str): Name of the Epics process variable, without the Epics ID.
+        Returns:
+            str: Full channel name of the process variable.
+        """
+        if pv in self.pv_names:
+            return self.pv_names[pv]  # Use the name built at start up
+        return self.epicsID + pv
+
     def _trigger_epics(self):
         """Private method to update the EPICS variables
         
@@ -28,7 +47,8 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
 
         Returns: 
         """
-        caput(self.epicsID + ".PROC", 1)  # Write to the .PROC data base to update all of the values
+        with Instrument_Transport.timed("caput", "SparkERXR_EPICS_BPMDevice"):
+            Instrument_Transport.epics_call("caput", caput, self._pv_name(".PROC"), 1)  # Update all of the values
 
     def _read_epics_pv(self, pv):
         """Private method to read an Epics process variable.
@@ -40,7 +60,31 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
             variant: Value of requested process variable.
         """
         self._trigger_epics()  # Update all values before reading
-        return caget(self.epicsID + pv)  # Read selected epics PV
+        with Instrument_Transport.timed("caget", "SparkERXR_EPICS_BPMDevice"):
+            return Instrument_Transport.epics_call("caget", caget, self._pv_name(pv))  # Read selected epics PV
+
+    def _read_epics_pvs(self, pvs):
+        """Private method to read several Epics process variables in one call.
+
+        The record is not processed here, so every value comes from the same
+        acquisition as long as the caller triggers it once beforehand. If the
+        PVs are being monitored the latest updates are returned instead, without
+        going over the network. Each PV's latest update is taken on its own, so
+        while monitoring the values can come from different acquisitions if an
+        update arrives part way through.
+
+        Args:
+            pvs (list): Names of the Epics process variables to read.
+
+        Returns:
+            list: Values of the requested process variables, in the same order.
+        """
+        if self.monitor is not None and set(pvs) <= set(self.monitored_pvs):
+            values = [self.monitor.get_latest(self._pv_name(pv)) for pv in pvs]
+            if None not in values:  # Fall back to caget until every PV has had an update
+                return values
+        with Instrument_Transport.timed("caget", "SparkERXR_EPICS_BPMDevice"):
+            return Instrument_Transport.epics_call("caget", caget, [self._pv_name(pv) for pv in pvs])  # Read all the PVs with a single list caget
 
     def _write_epics_pv(self, pv, value):
         """Private method to read an Epics process variable.
@@ -52,7 +96,8 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Returns: 
             variant: Value of requested process variable after writing to it
         """
-        caput(self.epicsID+pv, value)  # Write to EPICs PV
+        with Instrument_Transport.timed("caput", "SparkERXR_EPICS_BPMDevice"):
+            Instrument_Transport.epics_call("caput", caput, self._pv_name(pv), value)  # Write to EPICs PV
         return self._read_epics_pv(pv)
 
     def __init__(self, database, daq_type):
@@ -66,21 +111,111 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         if type(database) and type(daq_type) != str:
             raise TypeError
         self.epicsID = database+":signals:"+daq_type  # Different signal types can be used
+        self.monitor = None  # PVs are polled with caget until monitoring is started
+        self.saved_scan = None  # Scan setting to put back when monitoring stops
+        self.pv_names = dict((pv, self.epicsID + pv) for pv in self.pv_list)  # Build each channel name once
+
+        # Connect every channel in parallel, cothread keeps the channels open for later reads
+        host = Instrument_Transport.epics_connect(connect, [self.pv_names[pv] for pv in self.pv_list])
         self._write_epics_pv(".SCAN", 0)  # Required so that values can be read from he database
         self._trigger_epics()  # Triggers the first count
 
-        pv = ".X"  # Pick a PV that is hosted on the device
-        node = connect(self.epicsID + pv, cainfo=True).host.split(":")[0]  # Get the IP address of the host
-        host_info = Popen(["arp", "-n", node], stdout=PIPE).communicate()[0]  # Get info about the host using arp
-        host_info = host_info.split("\n")[1]  # Split the info sent back
-        index = host_info.find(":")  # Find the first ":", used in the MAC address
-        host_info = host_info[index - 2:index + 15]  # Get the MAC address
-        self.macaddress = host_info
+        node = host.split(":")[0]  # Get the IP address of the host
+        self.macaddress = Instrument_Transport.host_mac_address(node)  # Get the MAC address using arp
         print "Opened link with" + self.get_device_ID()  # Tells the user they have connected to the device
 
     def __del__(self):
-        print "Closed link with" + self.get_device_ID()  # Tells the user they have connected to the device
+        if getattr(self, "monitor", None) is not None:  # Nothing to close if the connection failed
+            self.stop_monitoring()  # Closes any camonitor subscriptions
+        if getattr(self, "macaddress", None) is not None:  # Only set once the device has connected
+            print "Closed link with" + self.get_device_ID()  # Tells the user they have disconnected from the device
+
+    def start_monitoring(self, depth=10000):
+        """Lets the record run at the device rate and serves reads from local ring buffers
+
+        The record is switched to I/O Intr scanning so it processes on every new
+        acquisition, and each update of the fields read by get_snapshot is stored
+        as it arrives. Reads then no longer trigger the record or go over the
+        network, and the history can be read with get_monitored_samples. The scan
+        setting of the record is saved, and put back by stop_monitoring. The
+        latest update of each field is read on its own, so a snapshot taken while
+        monitoring is not guaranteed to come from a single acquisition.
+
+        Args:
+            depth (int): Number of samples kept for each PV
+        Returns:
+
+        """
+        self.stop_monitoring()  # Only one set of subscriptions is kept at a time
+        self.saved_scan = self._read_epics_pvs([".SCAN"])[0]  # Put back when monitoring stops
+        self._write_epics_pv(".SCAN", 2)  # I/O Intr, process on every new acquisition
+        self.monitor = EPICS_Monitor([self._pv_name(pv) for pv in self.monitored_pvs], depth)
 
+    def stop_monitoring(self):
+        """Closes the monitor subscriptions, reads go back to triggering the record
+
+        The scan setting the record had before monitoring started is put back.
+
+        Args:
+        Returns:
+
+        """
+        if self.monitor is not None:
+            self.monitor.close()
+            self.monitor = None
+            self._write_epics_pv(".SCAN", self.saved_scan)  # Back to how it was before monitoring
+
+    def get_monitored_samples(self, pv, samples):
+        """Gets the most recent samples of a monitored PV
+
+        Args:
+            pv (str): Field name, e.g. ".X"
+            samples (int): Number of samples wanted
+        Returns:
+            float array: The samples, oldest first
+        """
+        if self.monitor is None:
+            raise Exception("Monitoring has not been started")
+        return self.monitor.get_last(self._pv_name(pv), samples)
+
+
+    def get_snapshot(self):
+        """Processes the record once and reads every field from that acquisition
+
+        A single write to .PROC is followed by one list caget of the .X, .Y, .Sum,
+        .A, .B, .C and .D fields, so every value is from the same coherent record.
+        Each call is a new acquisition, so read several values from one returned dict
+        rather than calling several getters.
+
+        Args:
+
+        Returns:
+            dict: Derived values keyed by the name of the getter that returns them,
+                "X_position", "Y_position", "beam_current", "input_power", "ADC_sum",
+                "raw_BPM_buttons" and "normalised_BPM_buttons"
+        """
+        if self.monitor is None:  # A monitored record processes by itself
+            self._trigger_epics()  # Triggers the acquisition
+        x, y, daq_sum, a, b, c, d = self._read_epics_pvs(self.monitored_pvs)
+        x = np.mean(x) / 1000000.0  # Gets the mean PV value and converts from nm to mm
+        y = np.mean(y) / 1000000.0  # Gets the mean PV value and converts from nm to mm
+        # The sum needs converting from ADC counts to mA and dBm, this is not finished
+        daq_sum = np.mean(daq_sum)  # Gets the mean PV value
+        a = np.round(np.mean(a))  # Gets the mean PV value, rounded to the nearest integer
+        b = np.round(np.mean(b))
+        c = np.round(np.mean(c))
+        d = np.round(np.mean(d))
+        sum_button = (a + b + c + d) / 4.0  # Gets the average BPM sum
+
+        snapshot = {
+            "X_position": x,
+            "Y_position": y,
+            "beam_current": daq_sum,
+            "input_power": daq_sum,
+            "ADC_sum": np.round(daq_sum),  # Rounds the mean to the nearest integer
+            "raw_BPM_buttons": (a, b, c, d),
+            "normalised_BPM_buttons": (a / sum_button, b / sum_button, c / sum_button, d / sum_button)}
+        return snapshot
 
     def get_X_position(self):
         """Override method, gets the calculated X position of the beam.
@@ -90,11 +225,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: X position in mm
         """
-        self._trigger_epics()  # Triggers the acquisition
-        x = self._read_epics_pv(".X")  # Gets the PV value
-        x = np.mean(x)  # Gets the mean PV value
-        x = x/1000000.0  # Converts from nm to mm
-        return x
+        return self._read_snapshot("X_position")
 
     def get_Y_position(self):
         """Override method, gets the calculated X position of the beam.
@@ -104,11 +235,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Y position in mm
         """
-        self._trigger_epics()  # Triggers the acquisition
-        y = self._read_epics_pv(".Y")  # Gets the PV value
-        y = np.mean(y)  # Gets the mean PV value
-        y = y/1000000.0  # Converts from nm to mm
-        return y
+        return self._read_snapshot("Y_position")
 
     def get_beam_current(self):
         """Override method, gets the beam current read by the BPMs. 
@@ -118,11 +245,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Current in mA
         """
-        # This function is not finished it needs to convert from ADC counts to mA
-        self._trigger_epics()  # Triggers the acquisition
-        daq_sum = self._read_epics_pv(".Sum")  # Gets the PV value
-        daq_sum = np.mean(daq_sum)  # Gets the mean PV value
-        return daq_sum
+        return self._read_snapshot("beam_current")
 
     def get_input_power(self):
         """Override method, gets the input power of the signals input to the device 
@@ -132,11 +255,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Input power in dBm
         """
-        # This function is not finished it needs to convert from ADC counts to dBm
-        self._trigger_epics()  # Triggers the acquisition
-        daq_sum = self._read_epics_pv(".Sum")  # Gets the PV value
-        daq_sum = np.mean(daq_sum)  # Gets the mean PV value
-        return daq_sum
+        return self._read_snapshot("input_power")
 
     def get_ADC_sum(self):
         """Override method, gets the input power of the signals input to the device 
@@ -146,11 +265,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Returns: 
             int: Input power in dBm
         """
-        self._trigger_epics()  # Triggers the acquisition
-        daq_sum = self._read_epics_pv(".Sum")
-        daq_sum = np.mean(daq_sum)  # Gets the PV value
-        daq_sum = np.round(daq_sum)  # Rounds the mean to the nearest integer
-        return daq_sum
+        return self._read_snapshot("ADC_sum")
 
     def get_raw_BPM_buttons(self):
         """Override method, gets the raw signal from each BPM.
@@ -163,20 +278,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
             int: Raw signal from BPM C
             int: Raw signal from BPM D
         """
-        self._trigger_epics()  # triggers the acquisition
-        a = self._read_epics_pv(".A")  # gets the PV value
-        b = self._read_epics_pv(".B")
-        c = self._read_epics_pv(".C")
-        d = self._read_epics_pv(".D")
-        a = np.mean(a)  # gets the mean PV value
-        b = np.mean(b)
-        c = np.mean(c)
-        d = np.mean(d)
-        a = np.round(a)  # Round the PV to the nearest integer
-        b = np.round(b)
-        c = np.round(c)
-        d = np.round(d)
-        return a, b, c, d
+        return self._read_snapshot("raw_BPM_buttons")
 
     def get_normalised_BPM_buttons(self):
         """Override method, gets the normalised signal from each BPM.
@@ -188,15 +290,7 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
             float: Normalised signal from BPM C
             float: Normalised signal from BPM D
         """
-        self._trigger_epics()  # Triggers the acquisition
-        a, b, c, d = self.get_raw_BPM_buttons()  # Gets the RAW bpm buttons
-        sum_button = a + b + c + d  # Calculates the BPM sum
-        sum_button = sum_button/4.0  # Gets the average BPM sum
-        a = a/sum_button  # Normalises the A button
-        b = b/sum_button  # Normalises the B button
-        c = c/sum_button  # Normalises the C button
-        d = d/sum_button  # Normalises the D button
-        return (a,b,c,d)
+        return self._read_snapshot("normalised_BPM_buttons")
 
     def get_device_ID(self):
         """Override method, gets the device's epics ID and MAC address 
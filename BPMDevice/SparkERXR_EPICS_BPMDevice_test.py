@@ -1,5 +1,6 @@
 import unittest
-from mock import patch
+import sys
+from mock import patch, MagicMock
 import BPMDevice
 
 daq = "sa"
@@ -29,6 +30,9 @@ def mocked_BPM_replies(pv):
     else:
         print "none found"
 
+def mocked_BPM_list_replies(pvs):
+    return [mocked_BPM_replies(pv) for pv in pvs]
+
 
 class ExpectedDataTest(unittest.TestCase):
     global daq
@@ -71,25 +75,25 @@ class ExpectedDataTest(unittest.TestCase):
     #     self.assertTrue(mock_replies.called)
 
     @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._trigger_epics")
-    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pv", side_effect=mocked_BPM_replies)
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pvs", side_effect=mocked_BPM_list_replies)
     def test_get_raw_BPM_buttons(self, mock_replies, epics_trigger_mock):
         self.assertEqual(self.BPM_test_inst.get_raw_BPM_buttons(), (800,900,1100,1200))
         self.assertTrue(mock_replies.called)
 
     @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._trigger_epics")
-    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pv", side_effect=mocked_BPM_replies)
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pvs", side_effect=mocked_BPM_list_replies)
     def test_get_normalised_BPM_buttons(self, mock_replies, epics_trigger_mock):
         self.assertEqual(self.BPM_test_inst.get_normalised_BPM_buttons(), (0.8,0.9,1.1,1.2))
         self.assertTrue(mock_replies.called)
 
     @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._trigger_epics")
-    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pv", side_effect=mocked_BPM_replies)
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pvs", side_effect=mocked_BPM_list_replies)
     def test_get_X_position(self, mock_replies, epics_trigger_mock):
         self.assertEqual(self.BPM_test_inst.get_X_position(), 100/1000000.0) # divide by 1000 to change to mm
         self.assertTrue(mock_replies.called)
 
     @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._trigger_epics")
-    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pv", side_effect=mocked_BPM_replies)
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pvs", side_effect=mocked_BPM_list_replies)
     def test_get_Y_position(self, mock_replies, epics_trigger_mock):
         self.assertEqual(self.BPM_test_inst.get_Y_position(), -100/1000000.0) # divide by 1000 to change to mm
         self.assertTrue(mock_replies.called)
@@ -98,11 +102,59 @@ class ExpectedDataTest(unittest.TestCase):
         self.assertEqual(self.BPM_test_inst.get_input_tolerance(), -40)
 
     @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._trigger_epics")
-    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pv", side_effect=mocked_BPM_replies)
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pvs", side_effect=mocked_BPM_list_replies)
     def test_get_ADC_sum(self, mock_replies, epics_trigger_mock):
         self.assertEqual(self.BPM_test_inst.get_ADC_sum(), 4000) # divide by 1000 to change to mm
         self.assertTrue(mock_replies.called)
 
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._trigger_epics")
+    @patch("BPMDevice.SparkERXR_EPICS_BPMDevice._read_epics_pvs", side_effect=mocked_BPM_list_replies)
+    def test_snapshot_takes_one_acquisition(self, mock_replies, epics_trigger_mock):
+        self.BPM_test_inst.get_snapshot()
+        self.assertEqual(epics_trigger_mock.call_count, 1)
+        self.assertEqual(mock_replies.call_count, 1)
+        self.BPM_test_inst.get_X_position()  # Every getter is a new acquisition
+        self.assertEqual(epics_trigger_mock.call_count, 2)
+
+    def test_failed_connect_cleans_up(self):
+        with patch("Instrument_Transport.epics_connect", side_effect=Exception("no response")):
+            self.assertRaises(Exception, BPMDevice.SparkERXR_EPICS_BPMDevice, "libera", daq)
+        BPM = object.__new__(sys.modules["BPMDevice.SparkERXR_EPICS_BPMDevice"].SparkERXR_EPICS_BPMDevice)
+        BPM.__del__()  # Nothing was set up, so there is nothing to close
+
+    def test_monitoring_restores_scan(self):
+        driver = sys.modules["BPMDevice.SparkERXR_EPICS_BPMDevice"]
+        scan = [1]  # The record was left scanning by something else
+
+        def mocked_caput(pv, value):
+            if pv == "libera:signals:sa.SCAN":
+                scan[0] = value
+
+        def mocked_caget(pvs):
+            if type(pvs) == list:
+                return [mocked_caget(pv) for pv in pvs]
+            return scan[0] if pvs == "libera:signals:sa.SCAN" else 0
+
+        subscription = MagicMock()
+        with patch.object(driver, "caput", side_effect=mocked_caput), \
+                patch.object(driver, "caget", side_effect=mocked_caget), \
+                patch("BPMDevice.EPICS_Monitor.camonitor", return_value=[subscription]) as mock_camonitor:
+            self.BPM_test_inst.start_monitoring(10)
+            self.assertEqual(scan[0], 2)  # I/O Intr while monitoring
+            names = mock_camonitor.call_args[0][0]
+            self.assertEqual(names, ["libera:signals:sa" + pv for pv in self.BPM_test_inst.monitored_pvs])
+            self.BPM_test_inst.stop_monitoring()
+            self.assertEqual(scan[0], 1)  # put back as it was
+            self.assertTrue(subscription.close.called)
+            self.assertEqual(self.BPM_test_inst.monitor, None)
+
+    def test_monitored_reads_use_latest_updates(self):
+        self.BPM_test_inst.monitor = MagicMock()
+        self.BPM_test_inst.monitor.get_latest.side_effect = lambda name: {"libera:signals:sa.X": 1.0,
+                                                                          "libera:signals:sa.Y": 2.0}[name]
+        self.assertEqual(self.BPM_test_inst._read_epics_pvs([".X", ".Y"]), [1.0, 2.0])
+        self.BPM_test_inst.monitor = None
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
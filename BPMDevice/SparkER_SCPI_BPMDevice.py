@@ -1,9 +1,9 @@
-import telnetlib
+import Instrument_Transport
 from Generic_BPMDevice import *
-from subprocess import Popen, PIPE
 from pkg_resources import require
 require("numpy")
 import numpy as np
+import numbers
 
 
 
@@ -29,8 +29,10 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns:
             str: Reply message from the SparkER
         """
-        self._telnet_write(message)
-        return self._telnet_read()
+        with self.tn.lock:  # Stops another driver on the same instrument writing before the reply is read
+            with Instrument_Transport.timed("telnet query", "SparkER_SCPI_BPMDevice"):
+                self._telnet_write(message)
+                return self._telnet_read()
 
     def _telnet_write(self, message):
         """Private method that will send a message over telnet to the SparkER
@@ -53,6 +55,37 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         """
         return self.tn.read_until('\r\n',timeout).rstrip('\n') # Gets the reply, removes termination characters
 
+    def _parse_waveform(self, reply, channels):
+        """Private method that decodes a waveform reply into a sample per row array
+
+        The reply text is decoded straight into a float array and then reshaped,
+        without copying, so that each row is one sample and each column one channel.
+        Any incomplete sample at the end of the reply is dropped.
+
+        Args:
+            reply (str): Whitespace separated values from the SparkER
+            channels (int): Number of interleaved channels in the reply
+        Returns:
+            float array: (samples, channels) view of the data
+        """
+        data = np.fromstring(reply, dtype=float, sep=" ")  # Decode the text straight into floats
+        samples = data.size // channels
+        return data[:samples * channels].reshape(samples, channels)
+
+    def _channel_statistics(self, waveform):
+        """Private method that gets the mean and RMS of every channel of a waveform
+
+        Args:
+            waveform (float array): (samples, channels) array from _parse_waveform
+        Returns:
+            float array: Mean of each channel
+            float array: RMS of each channel
+        """
+        samples = waveform.shape[0]
+        mean = waveform.sum(axis=0) / samples
+        rms = np.sqrt(np.einsum("ij,ij->j", waveform, waveform) / samples)  # Sum of squares of every column at once
+        return mean, rms
+
     def _trigger_DAQ(self):
         """Private method to fire a software trigger to update the DAQ
 
@@ -68,27 +101,133 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         else:
             pass
 
-    def __init__(self, IPaddress, port, timeout, autoTrig = 1):
+    waveform_channels = {"TBT_XY": 2, "TBT_QSUM": 2, "ADC": 4}  # Interleaved channels in each waveform reply
+
+    def __init__(self, IPaddress, port, timeout, autoTrig = 1, tbt_samples=100, adc_samples=200):
         """Initializes the Libera BPM device object and assigns it an ID. 
 
         Args:
             dev_ID (str/int): The two digit ID number assigned to that specific BPM device. 
+            tbt_samples (int): Default number of TBT samples read for each acquisition
+            adc_samples (int): Default number of ADC samples read for each acquisition
         Returns:
 .
         """
         self.autoTrig = autoTrig
+        self.tbt_samples = tbt_samples
+        self.adc_samples = adc_samples
         self.IP = IPaddress
         self.timeout = timeout
-        self.tn = telnetlib.Telnet(IPaddress, port, self.timeout) # Opens telnet connection
+        self.tn = Instrument_Transport.get_transport(IPaddress, port, self.timeout)  # Shares one connection per instrument
         self.DeviceID = self.get_device_ID()
         self._telnet_query("START") # starts the device
         self._trigger_DAQ()
         print("Opened connection to " + self.DeviceID)  # Informs the user the device is connected
 
     def __del__(self):
-        self.tn.close()  # Disconnects telnet device
+        self.tn.release()  # Closes the connection once no other driver is using it
         print("Closed connection to " + self.DeviceID)  # Informs the user the device is disconnected
 
+    def get_snapshot(self, tbt_samples=None, adc_samples=None):
+        """Triggers the device once and reads every derived value from that acquisition
+
+        The XY, QSUM and ADC buffers are all read after a single trigger, so every
+        value comes from the same acquisition. Each call triggers again, so read
+        several values from one returned dict rather than calling several getters.
+
+        Args:
+            tbt_samples (int): Number of TBT samples to read, defaults to the device setting
+            adc_samples (int): Number of ADC samples to read, defaults to the device setting
+
+        Returns:
+            dict: Derived values keyed by the name of the getter that returns them,
+                "X_position", "Y_position", "beam_current", "input_power", "ADC_sum",
+                "raw_BPM_buttons" and "normalised_BPM_buttons"
+        """
+        if tbt_samples is None:
+            tbt_samples = self.tbt_samples
+        if adc_samples is None:
+            adc_samples = self.adc_samples
+
+        self._trigger_DAQ()
+        xy = self._parse_waveform(self._telnet_query("TBT_XY " + str(tbt_samples)), 2)  # Get samples of XY data
+        mean_xy = self._channel_statistics(xy)[0] / 1000  # Average the XY data and convert um to mm
+        mean_x, mean_y = mean_xy
+
+        # This is not finished, only records ADC counts, not in mA or dBm
+        qsum = self._parse_waveform(self._telnet_query("TBT_QSUM " + str(tbt_samples)), 2)  # Grab Q sum data
+        mean_sum = self._channel_statistics(qsum)[0][1]  # Calculate the mean Sum value
+
+        adc = self._parse_waveform(self._telnet_query("ADC " + str(adc_samples)), 4)  # Get samples of ADC data
+        rms_a, rms_b, rms_c, rms_d = self._channel_statistics(adc)[1]  # Get the RMS value of each button
+        average = (rms_a + rms_b + rms_c + rms_d) / 4  # Get the average BPM value
+
+        snapshot = {
+            "X_position": mean_x,
+            "Y_position": mean_y,
+            "beam_current": mean_sum,
+            "input_power": mean_sum,
+            "ADC_sum": np.round(mean_sum),  # round the Sum to an integer
+            "raw_BPM_buttons": (rms_a, rms_b, rms_c, rms_d),
+            "normalised_BPM_buttons": (rms_a / average, rms_b / average, rms_c / average, rms_d / average)}
+        return snapshot
+
+    def stream_waveform(self, waveform, samples, chunk_samples=1024):
+        """Reads a deep capture in fixed size chunks while the reply is still arriving
+
+        The device is triggered once, then the reply is decoded as it comes in over
+        telnet and handed back in chunks. The whole reply is never held in memory,
+        so very long captures can be reduced incrementally. The transport is locked
+        until the generator finishes, so no other driver can write part way through
+        the reply. If the generator is closed before the end, the rest of the reply
+        is read and thrown away so it is not taken as the answer to the next query.
+
+        Args:
+            waveform (str): Data to read, "ADC", "TBT_XY" or "TBT_QSUM"
+            samples (int): Total number of samples to read
+            chunk_samples (int): Number of samples in each chunk
+        Returns:
+            generator: Yields (samples, channels) float arrays, the last chunk may be shorter
+        """
+        if waveform not in self.waveform_channels:
+            raise ValueError
+        elif not isinstance(samples, numbers.Integral) or not isinstance(chunk_samples, numbers.Integral):
+            raise TypeError
+        channels = self.waveform_channels[waveform]
+        chunk_size = chunk_samples * channels  # Number of values in a full chunk
+
+        with self.tn.lock:  # Held for the whole reply, as it is read between yields
+            self._trigger_DAQ()
+            self._telnet_write(waveform + " " + str(samples))
+            pending = np.empty(0)  # Decoded values that have not been handed back yet
+            partial = ""  # Text of a value that was split between two reads
+            finished = False
+            try:
+                while not finished:
+                    text = self.tn.read_some()  # Whatever has arrived so far
+                    if text == "":
+                        finished = True  # Nothing more will arrive
+                        raise EOFError("Connection closed during waveform read")
+                    if "\n" in text:
+                        text = text[:text.index("\n")]  # The termination characters end the reply
+                        finished = True
+                    text = partial + text
+                    if finished:
+                        partial = ""
+                    else:
+                        text, _, partial = text.rpartition(" ")  # The last value may not have fully arrived
+                    pending = np.append(pending, np.fromstring(text, dtype=float, sep=" "))
+                    while pending.size >= chunk_size:
+                        yield pending[:chunk_size].reshape(chunk_samples, channels)
+                        pending = pending[chunk_size:]
+            finally:
+                if not finished:
+                    self.tn.read_until("\n")  # Stopped early, so throw away the rest of the reply
+
+            remaining = pending.size // channels
+            if remaining > 0:
+                yield pending[:remaining * channels].reshape(remaining, channels)
+
     def get_X_position(self):
         """Override method, gets the calculated X position of the beam.
 
@@ -97,14 +236,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: X position in mm
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query("TBT_XY 100")  # Get 100 samples of XY data
-        replies = replies.rsplit()  # Split the data into lists
-        replies = np.array(map(float, replies))  # Convert the data into a float array
-        x = replies[0::2]  # Grab the X data only
-        mean_x = np.mean(x)  # Calculate the average of the X data
-        mean_x = mean_x / 1000  # convert um to mm
-        return mean_x
+        return self._read_snapshot("X_position")
 
     def get_Y_position(self):
         """Override method, gets the calculated Y position of the beam.
@@ -114,14 +246,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Y position in mm
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query("TBT_XY 100")  # Get 100 samples of XY data
-        replies = replies.rsplit()  # Split the data into lists
-        replies = np.array(map(float, replies))  # Convert the data into a float array
-        y = replies[1::2]  # Grab the Y data only
-        mean_y = np.mean(y)  # Calculate the average of the Y data
-        mean_y = mean_y / 1000  # convert um to mm
-        return mean_y
+        return self._read_snapshot("Y_position")
 
     def get_beam_current(self):
         """Override method, gets the beam current read by the BPMs. 
@@ -131,16 +256,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Current in mA
         """
-        self._trigger_DAQ()
-        # This is not finished, only records ADC counts, not in mA
-        replies = self._telnet_query("TBT_QSUM 100")
-        replies = replies.rsplit()
-        replies = np.array(map(float, replies))
-        q = replies[0::2]
-        bpm_sum = replies[1::2]
-        mean_q = np.mean(q)
-        mean_sum = np.mean(bpm_sum)
-        return mean_sum
+        return self._read_snapshot("beam_current")
 
     def get_input_power(self):
         """Override method, gets the input power of the signals input to the device 
@@ -150,16 +266,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Input power in dBm
         """
-        # This is not finished, only records ADC counts, not in dBm
-        self._trigger_DAQ()
-        replies = self._telnet_query("TBT_QSUM 100")
-        replies = replies.rsplit()
-        replies = np.array(map(float, replies))
-        q = replies[0::2]
-        bpm_sum = replies[1::2]
-        mean_q = np.mean(q)
-        mean_sum = np.mean(bpm_sum)
-        return mean_sum
+        return self._read_snapshot("input_power")
 
     def get_raw_BPM_buttons(self):
         """Override method, gets the raw signal from each BPM.
@@ -172,19 +279,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
             float: Raw signal from BPM C
             float: Raw signal from BPM D
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query("ADC 200")  # Get 200 samples of ADC data
-        replies = replies.rsplit()  # Convert the string in to a list of values
-        replies = np.array(map(float, replies))  # Convert these into a flaot array
-        a = replies[0::4]  # Get the A button data only
-        b = replies[1::4]  # Get the B button data only
-        c = replies[2::4]  # Get the C button data only
-        d = replies[3::4]  # Get the D button data only
-        rms_a = np.sqrt(np.mean(np.square(a)))  # Get the RMS value
-        rms_b = np.sqrt(np.mean(np.square(b)))  # Get the RMS value
-        rms_c = np.sqrt(np.mean(np.square(c)))  # Get the RMS value
-        rms_d = np.sqrt(np.mean(np.square(d)))  # Get the RMS value
-        return rms_a, rms_b, rms_c, rms_d
+        return self._read_snapshot("raw_BPM_buttons")
 
     def get_normalised_BPM_buttons(self):
         """Override method, gets the normalised signal from each BPM.
@@ -197,14 +292,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
             float: Normalised signal from BPM C
             float: Normalised signal from BPM D
         """
-        a, b, c, d = self.get_raw_BPM_buttons()  # Get the RAW ADC button values
-        sum = a + b + c + d  # Get the sum of these values
-        sum = sum/4  # Get the average BPM value
-        a = a/sum  # Normalise the BPM value
-        b = b/sum  # Normalise the BPM value
-        c = c/sum  # Normalise the BPM value
-        d = d/sum  # Normalise the BPM value
-        return a, b, c, d
+        return self._read_snapshot("normalised_BPM_buttons")
 
     def get_device_ID(self):
         """Override method, gets the device's epics ID and MAC address 
@@ -215,11 +303,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
             str: Device with epics channel ID and MAC address
         """
 
-        node = self.IP  # Get the devices IP address
-        host_info = Popen(["arp", "-n", node], stdout=PIPE).communicate()[0]  # arp with the device
-        host_info = host_info.split("\n")[1]  # split the information the host gives
-        index = host_info.find(":")  # find the index of the first ":" (used in the MAC address)
-        host_info = host_info[index - 2:index + 15]  # Return the MAC address
+        host_info = Instrument_Transport.host_mac_address(self.IP)  # arp with the device for its MAC address
         return "Spark BPM \"" + host_info + "\""
 
     def get_ADC_sum(self):
@@ -233,17 +317,7 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             int: sum of the ADC buttons
         """
-        self._trigger_DAQ()
-        # This is not finished, only records ADC counts, not in mA
-        replies = self._telnet_query("TBT_QSUM 100")  # Grab 100 samples of Q sum data
-        replies = replies.rsplit()  # Split the values into a list
-        replies = np.array(map(float, replies))  # Convert the list into a float array
-        q = replies[0::2]  # Grab the Q data only
-        bpm_sum = replies[1::2]  #  Grab the Sum data only
-        mean_q = np.mean(q)  # Calculate the mean Q value
-        mean_sum = np.mean(bpm_sum)  # Calculate the mean Sum value
-        mean_sum = np.round(mean_sum)  # round the Sum to an integer
-        return mean_sum  # return the mean sum
+        return self._read_snapshot("ADC_sum")
 
     def get_input_tolerance(self):
         """Override method, gets the maximum input power the device can take
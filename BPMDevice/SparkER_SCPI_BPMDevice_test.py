@@ -1,5 +1,7 @@
 import BPMDevice
 import unittest
+import threading
+import numpy as np
 from mock import patch
 
 def mock_get_device_ID():
@@ -29,9 +31,10 @@ class ExpectedDataTest(unittest.TestCase):
         self.Spark_test_inst = BPMDevice.SparkER_SCPI_BPMDevice("0", 0, 0)
         unittest.TestCase.setUp(self)
 
-    def tearDown(self):
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice.get_device_ID", side_effect=mock_get_device_ID)
+    def tearDown(self, mock_dev_ID):
         # Stuff you want to run after each test
-        pass
+        del self.Spark_test_inst  # Releases the transport, so the next test opens a new one
 
     @patch("BPMDevice.SparkER_SCPI_BPMDevice.get_device_ID", side_effect=mock_get_device_ID)
     def test_device_ID(self, mock_dev_ID):
@@ -77,5 +80,55 @@ class ExpectedDataTest(unittest.TestCase):
         self.assertEqual(self.Spark_test_inst.get_ADC_sum(), 4000)
         self.assertTrue(mock_replies.called)
 
+    def test_parse_waveform(self):
+        waveform = self.Spark_test_inst._parse_waveform("1 2 3 4\r\n5 6 7", 2)
+        self.assertEqual(waveform.tolist(), [[1, 2], [3, 4], [5, 6]])
+        mean, rms = self.Spark_test_inst._channel_statistics(waveform)
+        self.assertEqual(mean.tolist(), [3, 4])
+        self.assertAlmostEqual(rms[0], (35 / 3.0) ** 0.5)
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._telnet_write")
+    def test_stream_waveform(self, mock_write):
+        self.Spark_test_inst.tn.tn.read_some.side_effect = ["800 900 11", "00 1200 800 900 1100 1200 8", "00 900 1100 1200\r\n"]
+        chunks = list(self.Spark_test_inst.stream_waveform("ADC", 3, chunk_samples=2))
+        mock_write.assert_called_with("ADC 3")
+        self.assertEqual([chunk.shape for chunk in chunks], [(2, 4), (1, 4)])
+        self.assertEqual(chunks[0][1].tolist(), [800, 900, 1100, 1200])
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._telnet_write")
+    def test_stream_waveform_holds_lock_and_drains_when_closed(self, mock_write):
+        self.Spark_test_inst.tn.tn.read_some.side_effect = ["800 900 1100 1200 800 900 1100 1200 8"]
+        stream = self.Spark_test_inst.stream_waveform("ADC", np.int64(3), chunk_samples=2)
+        self.assertEqual(next(stream).shape, (2, 4))
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(self.Spark_test_inst.tn.lock.acquire(False)))
+        thread.start()
+        thread.join()
+        self.assertEqual(acquired, [False])  # another driver can not write part way through the reply
+        stream.close()
+        self.Spark_test_inst.tn.tn.read_until.assert_called_with("\n", 0)  # the rest of the reply is read
+        self.assertTrue(self.Spark_test_inst.tn.lock.acquire(False))
+        self.Spark_test_inst.tn.lock.release()
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._telnet_write")
+    def test_stream_waveform_invalid_input(self, mock_write):
+        self.assertRaises(ValueError, list, self.Spark_test_inst.stream_waveform("SA", 100))
+        self.assertRaises(TypeError, list, self.Spark_test_inst.stream_waveform("ADC", 100.0))
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._telnet_query", side_effect=mock_BPM_replies)
+    def test_get_snapshot(self, mock_replies):
+        snapshot = self.Spark_test_inst.get_snapshot()
+        self.assertEqual(snapshot["X_position"], 0.001)
+        self.assertEqual(snapshot["Y_position"], 0.002)
+        self.assertEqual(snapshot["ADC_sum"], 4000)
+        self.assertEqual(snapshot["raw_BPM_buttons"], (800, 900, 1100, 1200))
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._telnet_query", side_effect=mock_BPM_replies)
+    def test_snapshot_takes_one_trigger(self, mock_replies):
+        self.Spark_test_inst.get_snapshot()
+        self.assertEqual(mock_replies.call_args_list.count((("TRIG",),)), 1)
+        self.Spark_test_inst.get_Y_position()  # Every getter is a new measurement
+        self.assertEqual(mock_replies.call_args_list.count((("TRIG",),)), 2)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,4 +1,9 @@
-from Simulated_BPMDevice import *
-from Electron_BPMDevice import *
-from SparkER_SCPI_BPMDevice import *
-from SparkERXR_EPICS_BPMDevice import *
\ No newline at end of file
+import Instrument_Transport
+
+# Drivers are only imported when they are first used, the EPICS ones need cothread
+Instrument_Transport.lazy_package(__name__, {
+    "Generic_BPMDevice": "Generic_BPMDevice",
+    "Simulated_BPMDevice": "Simulated_BPMDevice",
+    "Electron_BPMDevice": "Electron_BPMDevice",
+    "SparkER_SCPI_BPMDevice": "SparkER_SCPI_BPMDevice",
+    "SparkERXR_EPICS_BPMDevice": "SparkERXR_EPICS_BPMDevice"})
@@ -1,5 +1,5 @@
 from Generic_GateSource import *
-import telnetlib
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
 import numpy as np
@@ -19,8 +19,10 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         Returns:
             str: Reply message from the Rigol3030
         """
-        self._telnet_write(message)
-        return self._telnet_read()
+        with self.tn.lock:  # Stops another driver on the same instrument writing before the reply is read
+            with Instrument_Transport.timed("telnet query", "Rigol3030DSG_GateSource"):
+                self._telnet_write(message)
+                return self._telnet_read()
 
     def _telnet_write(self, message):
         """Private method that will send a message over telnet to the Rigol3030 
@@ -43,6 +45,21 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         """
         return self.tn.read_until("\n", self.timeout).rstrip('\n')  # Reads reply from device, strips termination char
 
+    def _update_modulation_state(self, reply):
+        """Private method that records the modulation state from a "MOD:STAT?" reply
+
+        Args:
+            reply (str): Reply to the "MOD:STAT?" query
+
+        Returns:
+            bool: True if the modulation is on, False if it is off
+        """
+        if reply == "0":
+            self.modulation_state = False  # If it isn't, return a False
+        elif reply == "1":
+            self.modulation_state = True  # If it is, return a True
+        return self.modulation_state
+
     # Constructor and Deconstructor
 
     def __init__(self, ipaddress, port=5555, timeout=1):
@@ -57,12 +74,13 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
             
         """
         self.timeout = timeout  # Sets timeout for the telnet calls
-        self.tn = telnetlib.Telnet(ipaddress, port, self.timeout)  # Connects to the IP via telnet
+        self.tn = Instrument_Transport.get_transport(ipaddress, port, self.timeout)  # Shares one connection per instrument
         self.get_device_ID()  # Gets the device ID, checks connection is made
         self.modulation_state = False  # Default parameter for the modulation state
         self.turn_off_modulation()  # Turns off the signal modulation
-        self._telnet_write("PULM:SOUR INT")  # Sets the trigger source for the pulse
-        self._telnet_write("PULM:TRIG:MODE AUTO")  # Sets the trigger mode for the source
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("PULM:SOUR INT")  # Sets the trigger source for the pulse
+            batch.write("PULM:TRIG:MODE AUTO")  # Sets the trigger mode for the source
         self.pulse_period = self.set_pulse_period(3)  # Sets the pulse period to 3us by default
         self.set_pulse_dutycycle(0)  # Sets the duty cycle to 0 by default
         print("Opened connection to gate source " + self.DeviceID)  # Inform the user the device is connected to
@@ -76,7 +94,7 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         
         """
         self.turn_off_modulation()  # Turns off the signal modulation
-        self.tn.close()  # Closes the telnet connection
+        self.tn.release()  # Closes the connection once no other driver is using it
         print("Closed connection to gate source " + self.DeviceID)  # Lets the user know connection is closed
 
     # API Methods
@@ -105,10 +123,12 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         Returns:
 
         """
-        self._telnet_write("PULM:OUT:STAT ON")  # Turns on the pulse output switch
-        self._telnet_write("PULM:STAT ON")  # Enables the modulation state function
-        self._telnet_write("MOD:STAT ON")  # Turns on the modulation state output
-        return self.get_modulation_state()
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("PULM:OUT:STAT ON")  # Turns on the pulse output switch
+            batch.write("PULM:STAT ON")  # Enables the modulation state function
+            batch.write("MOD:STAT ON")  # Turns on the modulation state output
+            batch.query("MOD:STAT?")  # Checks the modulation state in the same message
+        return self._update_modulation_state(batch.replies[0])
 
     def turn_off_modulation(self):
         """Override method, Turns on the pulse modulation.
@@ -122,10 +142,12 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         Returns:
 
         """
-        self._telnet_write("PULM:OUT:STAT OFF")  # Turns off the pulse output switch
-        self._telnet_write("PULM:STAT OFF")  # Disables the modulation state function
-        self._telnet_write("MOD:STAT OFF")  # Turns off the modulation state output
-        return self.get_modulation_state()
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("PULM:OUT:STAT OFF")  # Turns off the pulse output switch
+            batch.write("PULM:STAT OFF")  # Disables the modulation state function
+            batch.write("MOD:STAT OFF")  # Turns off the modulation state output
+            batch.query("MOD:STAT?")  # Checks the modulation state in the same message
+        return self._update_modulation_state(batch.replies[0])
 
     def get_modulation_state(self):
         """Override method, Checks if the pulse modulation is on or off
@@ -135,12 +157,7 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         Returns:
 
         """
-        modulation  = self._telnet_query("MOD:STAT?")  # Checks the modulation state
-        if modulation == "0":
-            self.modulation_state = False  # If it isn't, return a False
-        elif modulation == "1":
-            self.modulation_state = True  # If it is, return a True
-        return self.modulation_state
+        return self._update_modulation_state(self._telnet_query("MOD:STAT?"))  # Checks the modulation state
 
     def get_pulse_period(self):
         """Override method, Gets the total pulse period of the modulation signal
@@ -174,8 +191,11 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         elif period < 0:
             raise ValueError
 
-        self._telnet_write("PULM:PER "+str(period)+"us")  # use default units of microseconds, and set the period
-        return self.get_pulse_period()
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("PULM:PER "+str(period)+"us")  # use default units of microseconds, and set the period
+            batch.query("PULM:PER?")  # reads back the period in the same message
+        self.pulse_period = batch.replies[0]
+        return float(self._split_num_char(self.pulse_period)[0]), self.pulse_period
 
     def get_pulse_dutycycle(self):
         """Override method, Gets the duty cycle of the modulation signal
@@ -216,9 +236,13 @@ class Rigol3030DSG_GateSource(Generic_GateSource):
         elif dutycycle > 1 or dutycycle < 0:
             raise ValueError
 
-        dutycycle = (self.get_pulse_period()[0])*dutycycle  # calculates the pulse width given the desired duty cycle
-        self._telnet_write("PULM:WIDT "+str(dutycycle)+"us")  # writes the calculated pulse width
-        return self.get_pulse_dutycycle()
+        period = self.get_pulse_period()[0]  # gets the pulse period numeric
+        pulse_width = period*dutycycle  # calculates the pulse width given the desired duty cycle
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("PULM:WIDT "+str(pulse_width)+"us")  # writes the calculated pulse width
+            batch.query("PULM:WIDT?")  # reads back the pulse width in the same message
+        pulse_width = float(self._split_num_char(batch.replies[0])[0])  # converts the pulse width into a numeric
+        return pulse_width/period  # calculates the duty cycle and returns it
 
     def invert_pulse_polarity(self, polarity):
         """Inverts the polarity of the gate signal
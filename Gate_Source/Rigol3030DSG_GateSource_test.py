@@ -12,6 +12,16 @@ dutycycle = "0.03uS"
 
 def mocked_rigol_replies(input):
     global output, period, dutycycle
+    if ";" in input:
+        # Batched message, handle each command in turn and join the answers to the queries
+        replies = []
+        for command in input.split(";"):
+            command = command.lstrip(":")
+            if "?" in command:
+                replies.append(mocked_rigol_replies(command))
+            else:
+                mocked_rigol_writes(command)
+        return ";".join(replies)
 
     if input == "MOD:STAT?":
         return output
@@ -24,6 +34,9 @@ def mocked_rigol_replies(input):
 
 def mocked_rigol_writes(input):
     global output, period, dutycycle
+    if ";" in input:
+        for command in input.split(";"):
+            mocked_rigol_writes(command.lstrip(":"))
     if input == "PULM:OUT:STAT OFF":
         output = "0"
     elif input == "PULM:OUT:STAT ON":
@@ -49,9 +62,11 @@ class ExpectedDataTest(unittest.TestCase):
         self.GS_test_inst = Gate_Source.Rigol3030DSG_GateSource("0", 0, 0)
         unittest.TestCase.setUp(self)
 
-    def tearDown(self):
+    @patch("Gate_Source.Rigol3030DSG_GateSource._telnet_write")
+    @patch("Gate_Source.Rigol3030DSG_GateSource._telnet_query", side_effect=mocked_rigol_replies)
+    def tearDown(self, mock_telnet_query, mock_telnet_write):
         # Stuff you want to run after each test
-        pass
+        del self.GS_test_inst  # Releases the transport, so the next test opens a new one
 
     @patch("Gate_Source.Rigol3030DSG_GateSource._telnet_write")
     @patch("Gate_Source.Rigol3030DSG_GateSource._telnet_read")
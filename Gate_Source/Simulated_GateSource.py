@@ -2,6 +2,7 @@ from Generic_GateSource import *
 from pkg_resources import require
 require("numpy")
 import numpy as np
+import Instrument_Transport
 
 
 class Simulated_GateSource(Generic_GateSource):
@@ -11,14 +12,19 @@ class Simulated_GateSource(Generic_GateSource):
         this will abstract hardware as the methods here are called, but the functionality is 
         implemented by the individual children.
 
-        Attributes:
+        If it is given a timing profile, each command takes as long as it would on a real
+        gate source, and changes to the modulation wait for it to settle.
 
+        Attributes:
+            timing (Timing_Profile): How long the device takes to answer and settle, None to answer straight away
         """
 
-    def __init__(self):
+    def __init__(self, timing=None):
         """Initialises the Simulated GateSource object
 
         Args:
+            timing (Timing_Profile): How long the device takes to answer and settle, None 
+                to answer straight away
 
         Returns:
 
@@ -26,6 +32,7 @@ class Simulated_GateSource(Generic_GateSource):
         self.dutycycle = 0  # default duty cycle level
         self.enable = False  # default output state
         self.period = 3  # default period in us
+        self.timing = timing  # how long the virtual device takes to respond
         print("Opened connection to \"Simulated GateSource\"")  # informs the user the object has been constructed
 
     def __del__(self):
@@ -46,6 +53,7 @@ class Simulated_GateSource(Generic_GateSource):
         Returns:
             str: The DeviceID of the gate source.
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return "Simulated GateSource"  # simulated device type
 
     def turn_on_modulation(self):
@@ -56,6 +64,7 @@ class Simulated_GateSource(Generic_GateSource):
         Returns:
 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.enable = True  # make the virtual state on
         return self.get_modulation_state()
 
@@ -67,6 +76,7 @@ class Simulated_GateSource(Generic_GateSource):
         Returns:
 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.enable = False  # make the virtual state off
         return self.get_modulation_state()
 
@@ -78,6 +88,7 @@ class Simulated_GateSource(Generic_GateSource):
         Returns:
 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.enable  # get the modulation state
 
     def get_pulse_period(self):
@@ -90,6 +101,7 @@ class Simulated_GateSource(Generic_GateSource):
             str: The units that the pulse period is measured in 
 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.period, str(self.period)+"uS"  #get the pulse period in uS
 
     def set_pulse_period(self, period):
@@ -110,6 +122,7 @@ class Simulated_GateSource(Generic_GateSource):
         # checks a positive number is used
         elif period < 0:
             raise ValueError
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.period = period  # sets the virtual pulse period
         return self.get_pulse_period()
 
@@ -125,6 +138,7 @@ class Simulated_GateSource(Generic_GateSource):
          Returns:
              float: decimal value (0-1) of the duty cycle of the pulse modulation 
          """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.dutycycle  # get the virtual duty cycle
 
     def set_pulse_dutycycle(self, dutycycle):
@@ -147,5 +161,6 @@ class Simulated_GateSource(Generic_GateSource):
         elif dutycycle > 1 or dutycycle < 0:
             raise ValueError
 
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.dutycycle = dutycycle  # set the virtual duty cycle
         return self.get_pulse_dutycycle()
\ No newline at end of file
@@ -1,3 +1,7 @@
 from Generic_GateSource import *
-from Rigol3030DSG_GateSource import *
-from Simulated_GateSource import *
\ No newline at end of file
+import Instrument_Transport
+
+# Drivers are only imported when they are first used
+Instrument_Transport.lazy_package(__name__, {
+    "Rigol3030DSG_GateSource": "Rigol3030DSG_GateSource",
+    "Simulated_GateSource": "Simulated_GateSource"})
@@ -0,0 +1,189 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import threading
+import time
+from Timing_Model import station_clock
+
+
+class Latency_Log():
+    """Records how long instrument calls take, and which test step made them.
+
+    Drivers wrap their telnet round trips and EPICS calls in timed(), the sweep engine
+    wraps the set, settle and measure parts of each step, and the tests wrap their
+    reporting. Every record is tagged with the test, step and phase that were current
+    when it was made, so the time spent in a test can be broken down afterwards.
+
+    Attributes:
+        records (tuple list): (test, step, phase, kind, name, duration) for each timed call
+        test (str): Name of the test currently running
+        step (int): Index of the step currently running, None outside of a step
+        phase (str): Part of the step currently running, "set", "settle", "measure" or "report"
+        clock (callable): Function that returns the current time in seconds
+        lock (Lock): Stops records from different threads being added at the same time
+    """
+
+    def __init__(self, clock=time.time):
+        """Starts an empty log
+
+        Args:
+            clock (callable): Function that returns the current time in seconds
+        Returns:
+
+        """
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Removes every record from the log
+
+        Args:
+
+        Returns:
+
+        """
+        self.records = []
+        self.test = None
+        self.step = None
+        self.phase = None
+
+    def start_test(self, test):
+        """Tags the records that follow with the name of a test
+
+        Args:
+            test (str): Name of the test
+        Returns:
+
+        """
+        self.test = test
+        self.step = None
+        self.phase = None
+
+    def start_step(self, step):
+        """Tags the records that follow with the index of a step
+
+        Args:
+            step (int): Index of the step, None once the steps have finished
+        Returns:
+
+        """
+        self.step = step
+
+    def record(self, kind, name, duration):
+        """Adds a record for a call that has already been timed
+
+        Args:
+            kind (str): Type of call, for example "telnet query", "caget" or "phase"
+            name (str): What was called, for example the driver or the phase name
+            duration (float): Time the call took in seconds
+        Returns:
+
+        """
+        with self.lock:
+            self.records.append((self.test, self.step, self.phase, kind, name, duration))
+
+    def timed(self, kind, name):
+        """Times the code inside a with block and records it
+
+        Args:
+            kind (str): Type of call, for example "telnet query", "caget" or "phase"
+            name (str): What was called, for example the driver or the phase name
+        Returns:
+            context manager: Records the time taken when the with block exits
+        """
+        return _Timer(self, kind, name)
+
+    def phase_timed(self, phase):
+        """Times one phase of a step, tagging the calls made inside it with the phase
+
+        Args:
+            phase (str): "set", "settle", "measure" or "report"
+        Returns:
+            context manager: Records the time taken when the with block exits
+        """
+        return _Timer(self, "phase", phase, phase)
+
+    def _statistics(self, durations):
+        """Private method that summarises a list of durations
+
+        Args:
+            durations (float list): Times in seconds
+        Returns:
+            dict: "count", "total", "median", "p90" and "p99" of the durations
+        """
+        durations = np.asarray(durations, dtype=float)
+        return {"count": len(durations),
+                "total": durations.sum(),
+                "median": np.percentile(durations, 50),
+                "p90": np.percentile(durations, 90),
+                "p99": np.percentile(durations, 99)}
+
+    def summary(self):
+        """Breaks down where the time went in each test
+
+        Phases are summed over each step before the statistics are taken, so the median of
+        "set" is the median time a step spent setting. Instrument calls are summarised one
+        call at a time.
+
+        Args:
+
+        Returns:
+            dict: For each test, a dict of statistics keyed by (kind, name), where kind is
+                "phase" for the phases of the steps.
+        """
+        grouped = {}
+        for test, step, phase, kind, name, duration in self.records:
+            calls = grouped.setdefault(test, {})
+            if kind == "phase":
+                steps = calls.setdefault((kind, name), {})
+                steps[step] = steps.get(step, 0.0) + duration  # summed over the step
+            else:
+                calls.setdefault((kind, name), []).append(duration)  # every call kept on its own
+
+        summary = {}
+        for test in grouped:
+            summary[test] = {}
+            for key, durations in grouped[test].items():
+                if type(durations) == dict:
+                    durations = list(durations.values())
+                summary[test][key] = self._statistics(durations)
+        return summary
+
+
+class _Timer():
+    """Context manager used by Latency_Log to time a with block"""
+
+    def __init__(self, log, kind, name, phase=None):
+        self.log = log
+        self.kind = kind
+        self.name = name
+        self.phase = phase
+
+    def __enter__(self):
+        if self.phase is not None:
+            self.outer_phase = self.log.phase
+            self.log.phase = self.phase  # calls made inside are tagged with this phase
+        self.start = self.log.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = self.log.clock() - self.start
+        self.log.record(self.kind, self.name, duration)
+        if self.phase is not None:
+            self.log.phase = self.outer_phase
+
+
+latency_log = Latency_Log(station_clock.time)  # Shared by every driver and test, on the station clock
+
+
+def timed(kind, name):
+    """Times the code inside a with block in the shared latency log
+
+    Args:
+        kind (str): Type of call, for example "telnet query", "caget" or "phase"
+        name (str): What was called, for example the driver or the phase name
+    Returns:
+        context manager: Records the time taken when the with block exits
+    """
+    return latency_log.timed(kind, name)
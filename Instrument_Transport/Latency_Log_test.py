@@ -0,0 +1,72 @@
+import unittest
+from mock import MagicMock
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.clock = MagicMock()
+        self.log = Instrument_Transport.Latency_Log(clock=self.clock)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    def test_calls_tagged_with_test_step_and_phase(self):
+        self.clock.side_effect = [0.0, 1.0, 1.25, 2.0]
+        self.log.start_test("test")
+        self.log.start_step(3)
+        with self.log.phase_timed("set"):
+            with self.log.timed("telnet query", "RF"):
+                pass
+        self.assertEqual(self.log.records, [("test", 3, "set", "telnet query", "RF", 0.25),
+                                            ("test", 3, "set", "phase", "set", 2.0)])
+        self.assertEqual(self.log.phase, None)
+
+    def test_phases_summed_over_each_step(self):
+        self.log.start_test("test")
+        for step, duration in [(0, 1.0), (0, 2.0), (1, 5.0)]:
+            self.log.start_step(step)
+            self.log.record("phase", "settle", duration)
+        stats = self.log.summary()["test"][("phase", "settle")]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["total"], 8.0)
+        self.assertEqual(stats["median"], 4.0)
+
+    def test_calls_summarised_per_test(self):
+        for test in ["first", "second"]:
+            self.log.start_test(test)
+            for duration in range(1, 101):
+                self.log.record("caget", "BPM", duration / 1000.0)
+        summary = self.log.summary()
+        self.assertEqual(sorted(summary), ["first", "second"])
+        stats = summary["first"][("caget", "BPM")]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["median"], 0.0505)
+        self.assertAlmostEqual(stats["p90"], 0.0901)
+        self.assertAlmostEqual(stats["p99"], 0.09901)
+
+    def test_time_recorded_if_call_fails(self):
+        self.clock.side_effect = [0.0, 0.5]
+        with self.assertRaises(IOError):
+            with self.log.timed("telnet query", "RF"):
+                raise IOError
+        self.assertEqual(self.log.records, [(None, None, None, "telnet query", "RF", 0.5)])
+
+    def test_timed_uses_shared_log(self):
+        Instrument_Transport.latency_log.clear()
+        with Instrument_Transport.timed("caput", "BPM"):
+            pass
+        self.assertEqual([record[3:5] for record in Instrument_Transport.latency_log.records], [("caput", "BPM")])
+        Instrument_Transport.latency_log.clear()
+
+if __name__ == "__main__":
+    unittest.main()
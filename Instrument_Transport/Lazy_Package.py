@@ -0,0 +1,83 @@
+import importlib
+import sys
+import types
+
+
+def lazy_package(name, registry):
+    """Makes a package import its modules only when one of their names is first used
+
+    Called at the end of a package's __init__.py, so that importing the package is quick
+    and a run only imports the drivers, and the libraries behind them, that it uses.
+
+    Args:
+        name (str): Name of the package, __name__ in its __init__.py
+        registry (dict): Module each name is imported from, relative to the package, for
+            example {"SparkERXR_EPICS_BPMDevice": "SparkERXR_EPICS_BPMDevice"}
+    Returns:
+        Lazy_Package: The package, which has replaced the original one in sys.modules
+    """
+    package = Lazy_Package(sys.modules[name], registry)
+    sys.modules[name] = package
+    return package
+
+
+class Lazy_Package(types.ModuleType):
+    """Package that imports the module behind a name the first time the name is used.
+
+    Everything already in the package is kept, so the light modules can still be imported
+    straight away in __init__.py. "from package import *" imports every module.
+
+    Attributes:
+        _registry (dict): Module each name is imported from, relative to the package
+        _original (module): The package this replaced, kept so its functions still have their globals
+    """
+
+    def __init__(self, package, registry):
+        """Copies the package that is being replaced
+
+        Args:
+            package (module): The package being replaced
+            registry (dict): Module each name is imported from, relative to the package
+        Returns:
+
+        """
+        types.ModuleType.__init__(self, package.__name__, package.__doc__)
+        self.__dict__.update(package.__dict__)
+        self._original = package
+        self._registry = dict(registry)
+        self.__all__ = sorted(set(registry) | set(name for name in package.__dict__ if not name.startswith("_")))
+
+    def __getattribute__(self, name):
+        """Looks up a name, giving the value from its module if the module has been set over it
+
+        Importing a module sets it on the package under its own name, which is usually also
+        the name of the class it holds, so "import package.Driver" would otherwise leave
+        package.Driver as the module rather than the class.
+
+        Args:
+            name (str): Name being looked up
+        Returns:
+            variant: The value of the name
+        """
+        value = types.ModuleType.__getattribute__(self, name)
+        if name.startswith("_") or not isinstance(value, types.ModuleType):
+            return value
+        registry = types.ModuleType.__getattribute__(self, "_registry")
+        if name in registry and value.__name__ == self.__name__ + "." + registry[name] and hasattr(value, name):
+            value = getattr(value, name)
+            self.__dict__[name] = value  # so the module is only looked through once
+        return value
+
+    def __getattr__(self, name):
+        """Imports the module behind a registered name, only called if the name is not already set
+
+        Args:
+            name (str): Name being looked up
+        Returns:
+            variant: The value of the name in its module
+        """
+        registry = self.__dict__.get("_registry", {})
+        if name not in registry:
+            raise AttributeError("'" + self.__name__ + "' has no attribute '" + name + "'")
+        module = importlib.import_module(self.__name__ + "." + registry[name])
+        return getattr(module, name)
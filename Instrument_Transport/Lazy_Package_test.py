@@ -0,0 +1,63 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.directory = tempfile.mkdtemp()
+        package = os.path.join(self.directory, "Lazy_Drivers")
+        os.mkdir(package)
+        files = {"__init__.py": "import Instrument_Transport\n"
+                                "Instrument_Transport.lazy_package(__name__, {\"Light_Driver\": \"Light_Driver\",\n"
+                                "    \"Heavy_Driver\": \"Heavy_Driver\", \"helper\": \"Light_Driver\"})\n",
+                 "Light_Driver.py": "class Light_Driver():\n    def __init__(self, limit=0):\n        self.limit = limit\n\n"
+                                    "def helper():\n    return 1\n",
+                 "Heavy_Driver.py": "import library_that_is_not_installed\n"}
+        for name in files:
+            with open(os.path.join(package, name), "w") as source:
+                source.write(files[name])
+        sys.path.insert(0, self.directory)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        sys.path.remove(self.directory)
+        for name in list(sys.modules):
+            if name.split(".")[0] == "Lazy_Drivers":
+                del sys.modules[name]
+        shutil.rmtree(self.directory)
+
+    def test_modules_imported_on_first_use(self):
+        import Lazy_Drivers
+        self.assertNotIn("Lazy_Drivers.Light_Driver", sys.modules)
+        self.assertEqual(Lazy_Drivers.Light_Driver.__name__, "Light_Driver")  # the class, not the module
+        self.assertIn("Lazy_Drivers.Light_Driver", sys.modules)
+        self.assertEqual(Lazy_Drivers.helper(), 1)
+        self.assertNotIn("Lazy_Drivers.Heavy_Driver", sys.modules)
+
+    def test_class_used_after_its_module_is_imported(self):
+        import Lazy_Drivers.Light_Driver
+        self.assertEqual(Lazy_Drivers.Light_Driver(limit=-40).limit, -40)  # the class, not the module
+        from Lazy_Drivers import Light_Driver
+        self.assertEqual(Light_Driver.__name__, "Light_Driver")
+
+    def test_missing_library_only_raised_when_driver_used(self):
+        import Lazy_Drivers
+        self.assertRaises(ImportError, getattr, Lazy_Drivers, "Heavy_Driver")
+        self.assertRaises(AttributeError, getattr, Lazy_Drivers, "Unknown_Driver")
+        self.assertEqual(Lazy_Drivers.__all__, ["Heavy_Driver", "Instrument_Transport", "Light_Driver", "helper"])
+
+
+if __name__ == "__main__":
+    unittest.main()
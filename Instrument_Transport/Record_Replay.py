@@ -0,0 +1,399 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import json
+import threading
+import time
+from subprocess import Popen, PIPE
+
+_session = None  # Session every transport and EPICS call goes through, None to talk to the instruments directly
+
+
+def current_session():
+    """Gets the session that is recording or replaying instrument traffic
+
+    Args:
+
+    Returns:
+        Session_Recording/Session_Replay: The current session, None if there is not one
+    """
+    return _session
+
+
+def start_recording(path):
+    """Starts saving every instrument exchange to a file
+
+    Only transports opened after this is called are recorded, so it should be called
+    before any drivers are created.
+
+    Args:
+        path (str): Location of the recording
+    Returns:
+        Session_Recording: The new session
+    """
+    global _session
+    stop_session()
+    _session = Session_Recording(path)
+    return _session
+
+
+def start_replay(path, real_time=False):
+    """Starts answering the drivers from a recording instead of the instruments
+
+    Only transports opened after this is called are replayed, so it should be called
+    before any drivers are created.
+
+    Args:
+        path (str): Location of the recording
+        real_time (bool): True to answer at the recorded speed, False to answer straight away
+    Returns:
+        Session_Replay: The new session
+    """
+    global _session
+    stop_session()
+    _session = Session_Replay(path, real_time)
+    return _session
+
+
+def stop_session():
+    """Closes the current session, later transports talk to the instruments directly
+
+    Args:
+
+    Returns:
+
+    """
+    global _session
+    if _session is not None:
+        _session.close()
+    _session = None
+
+
+def epics_call(kind, function, *args):
+    """Makes an EPICS call through the current session
+
+    Args:
+        kind (str): "caget" or "caput"
+        function (callable): The cothread function to call
+        *args: Arguments for the function, the PV name or list of names first
+    Returns:
+        variant: What the function returned, or what it returned in the recording
+    """
+    if _session is None:
+        return function(*args)
+    value = _session.exchange("epics", kind, _to_json(list(args)), lambda: function(*args))
+    if _session.replaying:
+        if type(args[0]) == list:
+            value = [_to_array(item) for item in value]  # one value for each PV
+        else:
+            value = _to_array(value)
+    return value
+
+
+def epics_connect(function, names):
+    """Connects to EPICS channels through the current session and finds the host serving them
+
+    Only the host is recorded, so a replay does not need the channels to exist.
+
+    Args:
+        function (callable): The cothread connect function
+        names (str list): Channel names to connect to
+    Returns:
+        str: "address:port" of the host serving the first channel
+    """
+    send = lambda: function(names, cainfo=True)[0].host
+    if _session is None:
+        return send()
+    return _session.exchange("epics", "connect", _to_json(names), send)
+
+
+def host_mac_address(node):
+    """Finds the MAC address of a host on the local network with arp, through the current session
+
+    Args:
+        node (str): IP address of the host
+    Returns:
+        str: MAC address of the host
+    """
+    send = lambda: Popen(["arp", "-n", node], stdout=PIPE).communicate()[0]
+    if _session is None:
+        host_info = send()
+    else:
+        host_info = _session.exchange("arp", "arp", node, send)
+    host_info = host_info.split("\n")[1]  # Split the info sent back, the first line is the heading
+    index = host_info.find(":")  # Find the first ":", used in the MAC address
+    return host_info[index - 2:index + 15]  # Get the MAC address
+
+
+def _to_json(value):
+    """Private function that turns instrument values into types that can be written as JSON
+
+    Args:
+        value (variant): Value to convert, numpy and cothread types included
+    Returns:
+        variant: The same value made of lists, floats, ints and strings
+    """
+    if type(value) in (list, tuple):
+        return [_to_json(item) for item in value]
+    elif hasattr(value, "tolist"):
+        return value.tolist()  # numpy arrays and scalars, including cothread's ca_array
+    elif isinstance(value, bool):
+        return value
+    elif isinstance(value, float):
+        return float(value)
+    elif isinstance(value, int):
+        return int(value)
+    elif isinstance(value, basestring):
+        return str(value)
+    return value
+
+
+def _from_json(value):
+    """Private function that turns the unicode strings read back from JSON into str
+
+    Args:
+        value (variant): Value read from the recording
+    Returns:
+        variant: The same value with every string as a str
+    """
+    if type(value) == list:
+        return [_from_json(item) for item in value]
+    elif type(value) == unicode:
+        return str(value)
+    return value
+
+
+def _error_type(error):
+    """Private function that names the type of an error, so it can be raised again on replay
+
+    Args:
+        error (Exception): Error raised by an exchange
+    Returns:
+        str: "module.name" of the error type, for example "socket.error"
+    """
+    return type(error).__module__ + "." + type(error).__name__
+
+
+def _recorded_error(exchange):
+    """Private function that makes the error that was raised by a recorded exchange
+
+    The error type is imported from the module it was defined in, so drivers catching
+    socket.error, EOFError or the EPICS errors see the same type as they did when the
+    recording was made. Recordings without the type, or types that can no longer be
+    made, give a plain Exception.
+
+    Args:
+        exchange (dict): The recorded exchange
+    Returns:
+        Exception: The error to raise
+    """
+    if exchange.get("error_type") is not None:
+        module, name = exchange["error_type"].rsplit(".", 1)
+        try:
+            error_class = getattr(__import__(module, fromlist=[name]), name)
+            if issubclass(error_class, BaseException):
+                return error_class(exchange["error"])
+        except Exception:
+            pass  # not importable here, or it needs other arguments
+    return Exception(exchange["error"])
+
+
+def _to_array(value):
+    """Private function that turns a recorded waveform back into a numpy array
+
+    Args:
+        value (variant): Value read from the recording
+    Returns:
+        variant: A numpy array if the value is a list, otherwise the value
+    """
+    if type(value) == list:
+        return np.array(value)
+    return value
+
+
+class Session_Recording():
+    """Saves every exchange with the instruments to a file, so it can be replayed later.
+
+    Each exchange is a line of JSON giving the channel it was on ("host:port" for telnet,
+    "epics" for EPICS), the kind of exchange, what was sent, what came back or the error
+    that was raised and its type, when it started relative to the start of the session
+    and how long it took.
+
+    Attributes:
+        path (str): Location of the recording
+        replaying (bool): Always False, the instruments are really talked to
+        clock (callable): Function that returns the current time in seconds
+        start (float): Time the session started
+        lock (Lock): Stops exchanges from different threads being written at the same time
+    """
+
+    replaying = False
+
+    def __init__(self, path, clock=time.time):
+        """Opens the file the recording is saved to
+
+        Args:
+            path (str): Location of the recording
+            clock (callable): Function that returns the current time in seconds
+        Returns:
+
+        """
+        self.path = path
+        self.clock = clock
+        self.start = clock()
+        self.lock = threading.Lock()
+        self.file = open(path, "w")
+
+    def exchange(self, channel, kind, request, send):
+        """Makes an exchange with an instrument and records it
+
+        Args:
+            channel (str): "host:port" for telnet, "epics" for EPICS
+            kind (str): Kind of exchange, for example "write", "read_until" or "caget"
+            request (variant): What is sent, anything that can be written as JSON
+            send (callable): Makes the exchange and returns the response
+        Returns:
+            variant: The response from the instrument
+        """
+        start = self.clock()
+        try:
+            response = send()
+        except Exception as error:
+            self._save(channel, kind, request, None, error, start)
+            raise
+        self._save(channel, kind, request, _to_json(response), None, start)
+        return response
+
+    def _save(self, channel, kind, request, response, error, start):
+        """Private method that writes one exchange to the recording
+
+        Args:
+            channel (str): "host:port" for telnet, "epics" for EPICS
+            kind (str): Kind of exchange
+            request (variant): What was sent
+            response (variant): What came back, None if there was an error
+            error (Exception): Error that was raised, None if there was not one. Its message
+                and type are recorded
+            start (float): Time the exchange started
+        Returns:
+
+        """
+        entry = {"channel": channel, "kind": kind, "request": request, "response": response,
+                 "error": None, "error_type": None, "time": start - self.start, "duration": self.clock() - start}
+        if error is not None:
+            entry["error"] = str(error)
+            entry["error_type"] = _error_type(error)
+        line = json.dumps(entry)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        """Finishes the recording
+
+        Args:
+
+        Returns:
+
+        """
+        with self.lock:
+            self.file.close()
+
+
+class Session_Replay():
+    """Answers the drivers from a recording, without talking to the instruments.
+
+    The exchanges on each channel are played back in the order they were recorded, and
+    each request has to match the one in the recording, so a replay shows the drivers
+    and tests are doing exactly what they did when the recording was made. Replies can
+    be given at the speed they were recorded, or straight away to measure how fast the
+    parsing, test logic and reporting are on their own.
+
+    Attributes:
+        path (str): Location of the recording
+        replaying (bool): Always True, the instruments are not talked to
+        real_time (bool): True to answer at the recorded speed, False to answer straight away
+        clock (callable): Function that returns the current time in seconds
+        sleep (callable): Function used to wait for the recorded time
+        start (float): Time the session started
+        exchanges (dict): Exchanges still to be played, listed for each channel
+        lock (Lock): Stops exchanges from different threads being taken at the same time
+    """
+
+    replaying = True
+
+    def __init__(self, path, real_time=False, clock=time.time, sleep=time.sleep):
+        """Reads in the recording
+
+        Args:
+            path (str): Location of the recording
+            real_time (bool): True to answer at the recorded speed, False to answer straight away
+            clock (callable): Function that returns the current time in seconds
+            sleep (callable): Function used to wait for the recorded time
+        Returns:
+
+        """
+        if type(real_time) != bool:
+            raise TypeError
+        self.path = path
+        self.real_time = real_time
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.exchanges = {}
+        with open(path) as recording:
+            for line in recording:
+                if line.strip():
+                    exchange = json.loads(line)
+                    self.exchanges.setdefault(exchange["channel"], []).append(exchange)
+        for channel in self.exchanges:
+            self.exchanges[channel].reverse()  # so the next exchange can be popped off the end
+        self.start = clock()
+
+    def exchange(self, channel, kind, request, send):
+        """Gives the recorded response to a request
+
+        Args:
+            channel (str): "host:port" for telnet, "epics" for EPICS
+            kind (str): Kind of exchange, for example "write", "read_until" or "caget"
+            request (variant): What would have been sent
+            send (callable): Not called, the instrument is not talked to
+        Returns:
+            variant: The recorded response
+        """
+        with self.lock:
+            if not self.exchanges.get(channel):
+                raise Exception("Nothing left in the recording for " + kind + " " + json.dumps(request) +
+                                " on " + channel)
+            exchange = self.exchanges[channel].pop()
+        if exchange["kind"] != kind or exchange["request"] != _to_json(request):
+            raise Exception("Replay does not match the recording on " + channel + ", expected " +
+                            exchange["kind"] + " " + json.dumps(exchange["request"]) + " but got " +
+                            kind + " " + json.dumps(_to_json(request)))
+        if self.real_time:
+            wait = self.start + exchange["time"] + exchange["duration"] - self.clock()
+            if wait > 0:
+                self.sleep(wait)  # the reply arrives when it did in the recording
+        if exchange["error"] is not None:
+            raise _recorded_error(exchange)  # the same type of error the instrument gave
+        return _from_json(exchange["response"])
+
+    def remaining(self):
+        """Counts the exchanges that have not been played back
+
+        Args:
+
+        Returns:
+            int: Number of exchanges left in the recording
+        """
+        with self.lock:
+            return sum(len(exchanges) for exchanges in self.exchanges.values())
+
+    def close(self):
+        """Finishes the replay
+
+        Args:
+
+        Returns:
+
+        """
+        pass
@@ -0,0 +1,139 @@
+import unittest
+import importlib
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import types
+from mock import patch, MagicMock
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "session.jsonl")
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        Instrument_Transport.stop_session()
+        Instrument_Transport.reset_transports()
+        shutil.rmtree(self.directory)
+
+    @patch("telnetlib.Telnet")
+    def _record(self, mock_telnet):
+        mock_telnet.return_value.read_until.return_value = "Rigol Technologies,DSG3030\n"
+        caget = MagicMock(side_effect=[[1.5, [1, 2, 3]], IOError("timed out")])
+        Instrument_Transport.start_recording(self.path)
+        transport = Instrument_Transport.get_transport("0", 0, 1)
+        transport.write("*IDN?\r\n")
+        reply = transport.read_until("\n")
+        values = Instrument_Transport.epics_call("caget", caget, ["BPM:X", "BPM:WF"])
+        self.assertRaises(IOError, Instrument_Transport.epics_call, "caget", caget, "BPM:Y")
+        transport.release()
+        Instrument_Transport.stop_session()
+        return reply, values
+
+    @patch("telnetlib.Telnet")
+    def test_replay_gives_recorded_responses(self, mock_telnet):
+        self._record()
+        session = Instrument_Transport.start_replay(self.path)
+        transport = Instrument_Transport.get_transport("0", 0, 1)
+        self.assertFalse(mock_telnet.called)  # nothing is connected to
+        transport.write("*IDN?\r\n")
+        self.assertEqual(transport.read_until("\n"), "Rigol Technologies,DSG3030\n")
+        caget = MagicMock()
+        values = Instrument_Transport.epics_call("caget", caget, ["BPM:X", "BPM:WF"])
+        self.assertEqual(values[0], 1.5)
+        self.assertEqual(values[1].tolist(), [1, 2, 3])  # waveforms come back as arrays
+        self.assertRaises(IOError, Instrument_Transport.epics_call, "caget", caget, "BPM:Y")  # the recorded type
+        self.assertFalse(caget.called)
+        self.assertEqual(session.remaining(), 0)
+        transport.release()
+
+    def test_replay_raises_recorded_error_types(self):
+        session = Instrument_Transport.Session_Recording(self.path)
+        for error in [socket.error(111, "Connection refused"), EOFError("telnet connection closed"),
+                      KeyError("not importable")]:
+            self.assertRaises(type(error), session.exchange, "0:0", "read_until", "\n", MagicMock(side_effect=error))
+        session.close()
+        session = Instrument_Transport.Session_Replay(self.path)
+        session.exchanges["0:0"][0]["error_type"] = "missing_module.Error"  # the last exchange
+        self.assertRaises(socket.error, session.exchange, "0:0", "read_until", "\n", None)
+        self.assertRaises(EOFError, session.exchange, "0:0", "read_until", "\n", None)
+        with self.assertRaises(Exception) as context:
+            session.exchange("0:0", "read_until", "\n", None)
+        self.assertEqual(type(context.exception), Exception)  # a type that cannot be made is a plain Exception
+        self.assertEqual(str(context.exception), "'not importable'")
+
+    def test_replay_if_request_differs(self):
+        self._record()
+        Instrument_Transport.start_replay(self.path)
+        transport = Instrument_Transport.get_transport("0", 0, 1)
+        self.assertRaises(Exception, transport.write, ":OUTP ON\r\n")
+        self.assertRaises(Exception, Instrument_Transport.epics_call, "caput", MagicMock(), "BPM:X", 1)
+        transport.release()
+
+    def test_replay_waits_in_real_time(self):
+        self._record()
+        clock = MagicMock(return_value=100.0)
+        sleep = MagicMock()
+        session = Instrument_Transport.Session_Replay(self.path, True, clock, sleep)
+        session.exchanges["0:0"][-1]["time"] = 0.25
+        session.exchanges["0:0"][-1]["duration"] = 0.5
+        session.exchange("0:0", "write", "*IDN?\r\n", None)
+        sleep.assert_called_with(0.75)
+        self.assertRaises(TypeError, Instrument_Transport.Session_Replay, self.path, 1)
+
+    def _epics_driver(self, catools):
+        # Imports the EPICS BPM driver against a stand in for cothread, which needs the CA library
+        cothread = types.ModuleType("cothread")
+        cothread.catools = catools
+        modules = {"cothread": cothread, "cothread.catools": catools}
+        with patch.dict(sys.modules, modules):
+            for name in ["BPMDevice.SparkERXR_EPICS_BPMDevice", "BPMDevice.EPICS_Monitor"]:
+                sys.modules.pop(name, None)
+            driver = importlib.import_module("BPMDevice.SparkERXR_EPICS_BPMDevice").SparkERXR_EPICS_BPMDevice
+            return driver("libera", "sa")
+
+    @patch("Instrument_Transport.Record_Replay.Popen")
+    def test_replay_constructs_epics_driver(self, mock_popen):
+        mock_popen.return_value.communicate.return_value = (
+            "Address HWtype HWaddress Flags Mask Iface\n172.23.0.5 ether 00:d0:50:31:03:b9 C eth0\n", "")
+        catools = types.ModuleType("cothread.catools")
+        catools.connect = MagicMock(return_value=[MagicMock(host="172.23.0.5:5064")])
+        catools.caput = MagicMock(return_value=1)
+        catools.caget = MagicMock(return_value=0)
+        catools.camonitor = MagicMock()
+        Instrument_Transport.start_recording(self.path)
+        BPM = self._epics_driver(catools)
+        Instrument_Transport.stop_session()
+        self.assertEqual(BPM.macaddress, "00:d0:50:31:03:b9")
+        mock_popen.assert_called_with(["arp", "-n", "172.23.0.5"], stdout=-1)
+
+        mock_popen.reset_mock()
+        for name in ["connect", "caput", "caget", "camonitor"]:
+            setattr(catools, name, MagicMock(side_effect=IOError("nothing to connect to")))
+        session = Instrument_Transport.start_replay(self.path)
+        BPM = self._epics_driver(catools)
+        self.assertEqual(BPM.macaddress, "00:d0:50:31:03:b9")
+        self.assertFalse(catools.connect.called or catools.caput.called or catools.caget.called)
+        self.assertFalse(mock_popen.called)
+        self.assertEqual(session.remaining(), 0)
+
+    def test_calls_direct_without_session(self):
+        caput = MagicMock(return_value=1)
+        self.assertEqual(Instrument_Transport.epics_call("caput", caput, "BPM:X", 2), 1)
+        caput.assert_called_with("BPM:X", 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import json
+import warnings
+from Timing_Model import Timing_Profile, typical_timings
+
+long_run_hours = 6  # Runs estimated to take at least this long are flagged before they start
+phases = ("set", "settle", "measure", "report")  # Parts of a test the estimate is broken down into
+
+
+def calibrate_timing(path, channel, simulator):
+    """Makes a timing profile for a simulator from a recording of the real instrument
+
+    The exchanges made on the instrument's channel in a recording made by
+    Instrument_Transport.start_recording are used. The time spent on the channel is shared
+    out between the exchanges that wait for a reply, so a write followed by a read counts
+    as one command, and the spread of the replies gives the jitter. The settle and
+    acquisition times can not be told apart from the rest of the run, so the typical
+    values for the simulator are kept.
+
+    Args:
+        path (str): Location of the recording
+        channel (str): "host:port" of a telnet instrument, or "epics"
+        simulator (str): Name of the simulator the profile is for, a key of typical_timings
+    Returns:
+        Timing_Profile: Profile with the latency and jitter of the recorded instrument, or the
+            typical profile if the instrument is not in the recording
+    """
+    timings = dict(typical_timings[simulator])
+    durations = []
+    replies = []
+    with open(path) as recording:
+        for line in recording:
+            if line.strip():
+                exchange = json.loads(line)
+                if exchange["channel"] == channel:
+                    durations.append(exchange["duration"])
+                    if exchange["kind"] != "write":
+                        replies.append(exchange["duration"])  # the command has waited for the instrument
+    if replies:
+        timings["latency"] = sum(durations) / len(replies)
+        timings["jitter"] = float(np.std(replies))
+    return Timing_Profile(**timings)
+
+
+def estimate_breakdown(summary):
+    """Breaks the time a run takes down by test and phase
+
+    Args:
+        summary (dict): Summary from Latency_Log.summary() of a run, normally a dry run
+            with simulated instruments on an estimating station clock
+    Returns:
+        dict: Seconds spent in each phase of each test, keyed by test then by phase, with
+            the whole test under "total"
+    """
+    breakdown = {}
+    for test in summary:
+        if test is None:
+            continue  # calls made outside of a test
+        times = dict((phase, 0.0) for phase in phases)
+        for (kind, name), statistics in summary[test].items():
+            if kind == "phase":
+                times[name] = statistics["total"]
+        times["total"] = sum(times[phase] for phase in phases)
+        breakdown[test] = times
+    return breakdown
+
+
+def format_estimate(breakdown):
+    """Writes out a run time estimate as a table
+
+    Args:
+        breakdown (dict): Breakdown from estimate_breakdown()
+    Returns:
+        str: One line for each test with the time of each phase, then the whole run
+    """
+    lines = ["%-52s" % "Test" + "".join("%10s" % phase for phase in phases + ("total",))]
+    for test in sorted(breakdown):
+        lines.append("%-52s" % test + "".join("%10s" % _format_time(breakdown[test][phase])
+                                                for phase in phases + ("total",)))
+    lines.append("%-52s" % "Whole run" + "%50s" % _format_time(total_run_time(breakdown)))  # under the totals
+    return "\n".join(lines)
+
+
+def total_run_time(breakdown):
+    """Adds up the time of every test in a run time estimate
+
+    Args:
+        breakdown (dict): Breakdown from estimate_breakdown()
+    Returns:
+        float: Time the whole run takes in seconds
+    """
+    return sum(times["total"] for times in breakdown.values())
+
+
+def check_run_time(breakdown, limit_hours=long_run_hours):
+    """Warns if a run is estimated to take too long, naming the test that takes the longest
+
+    Args:
+        breakdown (dict): Breakdown from estimate_breakdown()
+        limit_hours (float): Runs estimated to take at least this many hours are flagged
+    Returns:
+        bool: True if the run is under the limit, False if it has been flagged
+    """
+    total = total_run_time(breakdown)
+    if total < limit_hours * 3600:
+        return True
+    longest = max(breakdown, key=lambda test: breakdown[test]["total"])
+    warnings.warn("The run is estimated to take " + _format_time(total) + ", " + longest + " takes " +
+                  _format_time(breakdown[longest]["total"]) + " of that")
+    return False
+
+
+def _format_time(seconds):
+    """Private function that writes a time in hours, minutes and seconds
+
+    Args:
+        seconds (float): Time in seconds
+    Returns:
+        str: The time, for example "1h02m03s", "2m03s" or "3.2s"
+    """
+    if seconds < 60:
+        return "%.1fs" % seconds
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "%dh%02dm%02ds" % (hours, minutes, seconds)
+    return "%dm%02ds" % (minutes, seconds)
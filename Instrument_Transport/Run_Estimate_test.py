@@ -0,0 +1,71 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import warnings
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "session.jsonl")
+        self.summary = {
+            None: {("telnet query", "RF"): {"total": 5.0}},
+            "permutation": {("phase", "set"): {"total": 3600.0}, ("phase", "settle"): {"total": 14400.0},
+                            ("phase", "measure"): {"total": 3600.0}, ("phase", "report"): {"total": 30.0},
+                            ("telnet query", "RF"): {"total": 100.0}},
+            "raster": {("phase", "set"): {"total": 10.0}, ("phase", "measure"): {"total": 20.0}}}
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        shutil.rmtree(self.directory)
+
+    def test_timing_calibrated_from_recording(self):
+        exchanges = [("1.2.3.4:5", "write", 0.002), ("1.2.3.4:5", "read_until", 0.018),
+                     ("1.2.3.4:5", "write", 0.002), ("1.2.3.4:5", "read_until", 0.038),
+                     ("epics", "caget", 0.5)]
+        with open(self.path, "w") as recording:
+            for channel, kind, duration in exchanges:
+                recording.write(json.dumps({"channel": channel, "kind": kind, "duration": duration}) + "\n")
+        profile = Instrument_Transport.calibrate_timing(self.path, "1.2.3.4:5", "Simulated_RFSigGen")
+        self.assertAlmostEqual(profile.latency, 0.03)  # write and reply taken together
+        self.assertAlmostEqual(profile.jitter, 0.01)
+        self.assertEqual(profile.settle_time, Instrument_Transport.typical_timings["Simulated_RFSigGen"]["settle_time"])
+        profile = Instrument_Transport.calibrate_timing(self.path, "9.9.9.9:9", "Simulated_Prog_Atten")
+        self.assertEqual(profile.latency, Instrument_Transport.typical_timings["Simulated_Prog_Atten"]["latency"])
+
+    def test_breakdown_by_test_and_phase(self):
+        breakdown = Instrument_Transport.estimate_breakdown(self.summary)
+        self.assertEqual(sorted(breakdown), ["permutation", "raster"])
+        self.assertEqual(breakdown["raster"], {"set": 10.0, "settle": 0.0, "measure": 20.0, "report": 0.0,
+                                               "total": 30.0})
+        self.assertEqual(breakdown["permutation"]["total"], 21630.0)
+        self.assertEqual(Instrument_Transport.total_run_time(breakdown), 21660.0)
+        table = Instrument_Transport.format_estimate(breakdown).split("\n")
+        self.assertEqual(len(table), 4)
+        self.assertTrue(table[1].startswith("permutation"))
+        self.assertTrue(table[1].endswith("4h00m00s  1h00m00s     30.0s  6h00m30s"))
+        self.assertTrue(table[3].endswith("6h01m00s"))
+
+    def test_long_run_flagged(self):
+        breakdown = Instrument_Transport.estimate_breakdown(self.summary)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertFalse(Instrument_Transport.check_run_time(breakdown))
+            self.assertTrue(Instrument_Transport.check_run_time(breakdown, limit_hours=7))
+        self.assertEqual(len(caught), 1)
+        self.assertIn("permutation takes 6h00m30s", str(caught[0].message))
+
+
+if __name__ == "__main__":
+    unittest.main()
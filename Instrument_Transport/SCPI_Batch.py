@@ -0,0 +1,83 @@
+class SCPI_Batch():
+    """Queues SCPI commands so that they are sent to an instrument in one message.
+
+    Commands are joined with ";:" so each one is read from the root of the command
+    tree, then sent with a single write. If any queries were queued the instrument
+    answers them all in one reply separated by ";", which is split back up so the
+    answer to each query can be picked out with the index returned when it was
+    queued. Used as a context manager the batch is sent when the with block exits.
+
+    Attributes:
+        driver (instrument driver Obj): Driver with _telnet_write and _telnet_query methods
+        commands (str list): Commands waiting to be sent
+        queries (int): Number of queries waiting to be sent
+        replies (str list): Answers to the queries in the last batch sent
+    """
+
+    def __init__(self, driver):
+        """Starts an empty batch for a driver
+
+        Args:
+            driver (instrument driver Obj): Driver the batch will be sent through
+        Returns:
+
+        """
+        self.driver = driver
+        self.commands = []
+        self.queries = 0
+        self.replies = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:  # Nothing is sent if the block failed part way through
+            self.send()
+
+    def write(self, command):
+        """Queues a command that has no reply
+
+        Args:
+            command (str): SCPI command
+        Returns:
+
+        """
+        self.commands.append(command)
+
+    def query(self, command):
+        """Queues a query
+
+        Args:
+            command (str): SCPI query
+        Returns:
+            int: Index of the answer in replies once the batch is sent
+        """
+        self.commands.append(command)
+        self.queries += 1
+        return self.queries - 1
+
+    def send(self):
+        """Sends every queued command in one message and reads back all of the answers
+
+        Args:
+
+        Returns:
+            str list: Answers to the queries, in the order they were queued
+        """
+        if not self.commands:
+            return []
+        message = self.commands[0]
+        for command in self.commands[1:]:
+            if command[0] in "*:":  # Common commands and rooted commands are sent as they are
+                message += ";" + command
+            else:
+                message += ";:" + command  # Go back to the root so the header is not read relative to the last
+        if self.queries == 0:
+            self.driver._telnet_write(message)
+            self.replies = []
+        else:
+            self.replies = [reply.strip() for reply in self.driver._telnet_query(message).split(";")]
+            self.replies += [""] * (self.queries - len(self.replies))  # A reply that timed out gives empty answers
+        self.commands = []
+        self.queries = 0
+        return self.replies
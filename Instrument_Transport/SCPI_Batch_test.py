@@ -0,0 +1,42 @@
+import unittest
+from mock import MagicMock
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.driver = MagicMock()
+        self.driver._telnet_query.return_value = "-50.00;DBM\r"
+        unittest.TestCase.setUp(self)
+
+    def test_writes_sent_in_one_message(self):
+        with Instrument_Transport.SCPI_Batch(self.driver) as batch:
+            batch.write("PULM:OUT:STAT ON")
+            batch.write("*CLS")
+            batch.write("MOD:STAT ON")
+        self.driver._telnet_write.assert_called_once_with("PULM:OUT:STAT ON;*CLS;:MOD:STAT ON")
+        self.assertFalse(self.driver._telnet_query.called)
+
+    def test_replies_split_by_query(self):
+        with Instrument_Transport.SCPI_Batch(self.driver) as batch:
+            batch.write("LEV -50")
+            power = batch.query("LEV?")
+            units = batch.query("UNIT:POW?")
+        self.driver._telnet_query.assert_called_once_with("LEV -50;:LEV?;:UNIT:POW?")
+        self.assertEqual(batch.replies[power], "-50.00")
+        self.assertEqual(batch.replies[units], "DBM")
+
+    def test_nothing_sent_on_error(self):
+        try:
+            with Instrument_Transport.SCPI_Batch(self.driver) as batch:
+                batch.write("LEV -50")
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(self.driver._telnet_write.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
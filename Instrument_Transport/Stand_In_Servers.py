@@ -0,0 +1,445 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import SocketServer
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from Latency_Log import latency_log
+
+
+class _TCP_Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """TCP server that handles each connection on its own thread"""
+    daemon_threads = True  # Connections left open do not stop the program exiting
+    allow_reuse_address = True
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    """Reads messages from one connection and answers them through the stand in"""
+
+    def handle(self):
+        stand_in = self.server.stand_in
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break  # The driver closed the connection
+            reply = stand_in.handle_message(line.rstrip("\r\n"))
+            if reply is not None:
+                self.wfile.write(reply + stand_in.terminator)
+
+
+class Stand_In_Server():
+    """Local TCP server that answers the SCPI messages a driver sends to an instrument.
+
+    This lets the real drivers, and the telnet transport under them, be run and timed on
+    localhost without the hardware. Each message is held for the configured latency, plus
+    normally distributed jitter, before it is answered. The number of messages and commands
+    received are counted so throughput can be worked out. Subclasses say what each command
+    does by overriding command().
+
+    Attributes:
+        host (str): Address the server listens on
+        port (int): Port the server listens on, picked by the OS if 0 was given
+        latency (float): Time each message is held before it is answered, in seconds
+        jitter (float): Standard deviation of the random extra time added to the latency, in seconds
+        messages (int): Number of messages received
+        commands (int): Number of commands received, a batched message holds several
+        terminator (str): Characters sent after each reply
+    """
+
+    __metaclass__ = ABCMeta  # Allows for abstract methods to be created.
+
+    terminator = "\n"
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, seed=None):
+        """Opens the server socket, call start() to begin answering messages
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 lets the OS pick a free one
+            latency (float): Time each message is held before it is answered, in seconds
+            jitter (float): Standard deviation of the random extra time added to the latency, in seconds
+            seed (int): Seed for the jitter, so runs can be repeated
+        Returns:
+
+        """
+        if type(latency) != float and type(latency) != int:
+            raise TypeError
+        elif type(jitter) != float and type(jitter) != int:
+            raise TypeError
+        elif latency < 0 or jitter < 0:
+            raise ValueError
+        self.latency = latency
+        self.jitter = jitter
+        self.random = np.random.RandomState(seed)
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.commands = 0
+        self.server = _TCP_Server((host, port), _Handler)
+        self.server.stand_in = self
+        self.host, self.port = self.server.server_address
+        self.thread = None
+
+    def start(self):
+        """Starts answering messages on a background thread
+
+        Args:
+
+        Returns:
+            Stand_In_Server: This server, so it can be started as it is made
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))  # Quick to shut down
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops answering messages and closes the server socket
+
+        Args:
+
+        Returns:
+
+        """
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset_counts(self):
+        """Sets the message and command counts back to zero
+
+        Args:
+
+        Returns:
+
+        """
+        with self.lock:
+            self.messages = 0
+            self.commands = 0
+
+    def _delay(self):
+        """Private method that gets how long to hold the next message for
+
+        Args:
+
+        Returns:
+            float: Latency plus jitter, never less than zero
+        """
+        with self.lock:
+            extra = self.random.normal(0, self.jitter) if self.jitter > 0 else 0
+        return max(self.latency + extra, 0)
+
+    def split_message(self, message):
+        """Splits a message into its commands, by default a message is one command
+
+        Args:
+            message (str): Message without its termination characters
+        Returns:
+            str list: Commands in the message
+        """
+        return [message]
+
+    def join_replies(self, replies):
+        """Joins the answers to the commands in a message into one reply
+
+        Args:
+            replies (str list): Answers to the queries in the message
+        Returns:
+            str: The reply to send back
+        """
+        return ";".join(replies)
+
+    def handle_message(self, message):
+        """Answers one message from a driver
+
+        Args:
+            message (str): Message without its termination characters
+        Returns:
+            str: Reply to send back, None if the message had no queries in it
+        """
+        commands = self.split_message(message)
+        with self.lock:
+            self.messages += 1
+            self.commands += len(commands)
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)  # Time the instrument takes to deal with the message
+        replies = []
+        with self.lock:  # Messages from different connections change the state one at a time
+            for command in commands:
+                reply = self.command(command)
+                if reply is not None:
+                    replies.append(reply)
+        if not replies:
+            return None
+        return self.join_replies(replies)
+
+    @abstractmethod
+    def command(self, command):
+        """Abstract method for override, carries out one command
+
+        Args:
+            command (str): SCPI command
+        Returns:
+            str: Answer to a query, None if the command has no answer
+        """
+        pass
+
+
+def benchmark_sweep(servers, sweep, points, repeats=1, log=latency_log, clock=time.time):
+    """Times a driver sweep run against stand in servers
+
+    The message and command counts of the servers are reset first, so they only count
+    the sweeps. The driver calls the sweeps record in the latency log are kept, to give
+    the time of each round trip.
+
+    Args:
+        servers (list): Stand_In_Server objects the drivers in the sweep talk to
+        sweep (callable): Runs one sweep through the drivers
+        points (int): Number of test points in one sweep
+        repeats (int): Number of times to run the sweep
+        log (Latency_Log): Log the drivers record their calls in
+        clock (callable): Function that returns the current time in seconds
+    Returns:
+        dict: "sweep_time", the mean time of a sweep in seconds, "commands_per_second",
+            "messages_per_point", the round trips at each test point, "commands_per_point"
+            and "call_times", the median time of each kind of driver call keyed by (kind, name)
+    """
+    if type(points) != int or type(repeats) != int:
+        raise TypeError
+    elif points < 1 or repeats < 1:
+        raise ValueError
+    for server in servers:
+        server.reset_counts()
+    first_record = len(log.records)
+    start = clock()
+    for repeat in range(repeats):
+        sweep()
+    elapsed = clock() - start
+    messages = sum(server.messages for server in servers)
+    commands = sum(server.commands for server in servers)
+
+    calls = {}
+    for test, step, phase, kind, name, duration in log.records[first_record:]:
+        if kind != "phase":
+            calls.setdefault((kind, name), []).append(duration)
+    return {"sweep_time": elapsed / repeats,
+            "commands_per_second": commands / elapsed if elapsed > 0 else float("inf"),
+            "messages_per_point": messages / float(points * repeats),
+            "commands_per_point": commands / float(points * repeats),
+            "call_times": dict((key, float(np.median(durations))) for key, durations in calls.items())}
+
+
+def _number(text):
+    """Private function that reads the number from an SCPI value, ignoring any units
+
+    Args:
+        text (str): Value such as "-40", "499.68MHz" or "3us"
+    Returns:
+        float: The number in the value
+    """
+    number = ""
+    for character in text:
+        if character.isdigit() or character in ".-+e":
+            number += character
+        else:
+            break
+    return float(number)
+
+
+class Rigol3030DSG_Server(Stand_In_Server):
+    """Stand in for the Rigol DSG3030, answering the commands used by Rigol3030DSG_RFSigGen
+    and Rigol3030DSG_GateSource.
+
+    Batched messages are split on ";" and the answers to their queries joined with ";",
+    as the instrument does. A step sweep loaded with the SWE commands starts at its first
+    level on "SWE:EXEC" and moves to the next level on each "*TRG".
+
+    Attributes:
+        state (dict): Value of each setting, keyed by the SCPI header that sets it
+        sweep_point (int): Index of the current sweep point, -1 before the sweep is started
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, seed=None):
+        """Opens the server socket with the instrument in its power on state
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 lets the OS pick a free one
+            latency (float): Time each message is held before it is answered, in seconds
+            jitter (float): Standard deviation of the random extra time added to the latency, in seconds
+            seed (int): Seed for the jitter, so runs can be repeated
+        Returns:
+
+        """
+        Stand_In_Server.__init__(self, host, port, latency, jitter, seed)
+        self.state = {"FREQ": "1000MHz", "LEV": -110.0, "LEV:LIM": 13.0, "UNIT:POW": "DBM", "OUTP": "0",
+                      "MOD:STAT": "0", "PULM:PER": "3us", "PULM:WIDT": "0us", "PULM:POL": "NORM",
+                      "SWE:STEP:STAR:LEV": -110.0, "SWE:STEP:STOP:LEV": -110.0, "SWE:STEP:POIN": 1}
+        self.sweep_point = -1
+
+    def _sweep_level(self):
+        """Private method that moves the output to the level of the current sweep point
+
+        Args:
+
+        Returns:
+
+        """
+        start = self.state["SWE:STEP:STAR:LEV"]
+        stop = self.state["SWE:STEP:STOP:LEV"]
+        steps = max(self.state["SWE:STEP:POIN"] - 1, 1)
+        self.state["LEV"] = min(start + (stop - start) * self.sweep_point / float(steps), self.state["LEV:LIM"])
+
+    def split_message(self, message):
+        return [command.lstrip(":") for command in message.split(";")]
+
+    def command(self, command):
+        if command == "*IDN?":
+            return "Rigol Technologies,DSG3030,DSG3A000000000,00.01.00"
+        elif command == "SWE:EXEC":
+            self.sweep_point = 0  # The sweep starts at its first point
+            self._sweep_level()
+            return None
+        elif command == "*TRG":
+            if 0 <= self.sweep_point < self.state["SWE:STEP:POIN"] - 1:
+                self.sweep_point += 1
+                self._sweep_level()
+            return None
+        elif command.endswith("?"):
+            value = self.state.get(command[:-1], "")
+            if type(value) == float:
+                return "%.2f" % value
+            return str(value)
+
+        header, _, value = command.partition(" ")
+        if header in ("LEV", "LEV:LIM", "SWE:STEP:STAR:LEV", "SWE:STEP:STOP:LEV"):
+            self.state[header] = _number(value)
+            if header == "LEV":
+                self.state["LEV"] = min(self.state["LEV"], self.state["LEV:LIM"])  # The output is capped at the limit
+        elif header == "SWE:STEP:POIN":
+            self.state[header] = int(_number(value))
+        elif header in ("OUTP", "MOD:STAT", "PULM:STAT", "PULM:OUT:STAT"):
+            self.state[header] = "1" if value == "ON" else "0"
+        elif header == "UNIT:POW":
+            self.state[header] = value.upper()
+        else:
+            self.state[header] = value  # Settings that are only read back as they were written
+        return None
+
+
+class MC_RC4DAT6G95_Server(Stand_In_Server):
+    """Stand in for the Mini-Circuits RC4DAT-6G-95, answering the commands used by
+    MC_RC4DAT6G95_Prog_Atten.
+
+    Every reply is followed by an empty line, as the driver reads two lines for each reply.
+
+    Attributes:
+        attenuation (float list): Attenuation of channels 1 to 4 in dB
+    """
+
+    terminator = "\r\n\r\n"
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, seed=None):
+        """Opens the server socket with every channel at 0dB
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 lets the OS pick a free one
+            latency (float): Time each message is held before it is answered, in seconds
+            jitter (float): Standard deviation of the random extra time added to the latency, in seconds
+            seed (int): Seed for the jitter, so runs can be repeated
+        Returns:
+
+        """
+        Stand_In_Server.__init__(self, host, port, latency, jitter, seed)
+        self.attenuation = [0.0, 0.0, 0.0, 0.0]
+
+    def command(self, command):
+        if command == "MN?":
+            return "MN=RC4DAT-6G-95"
+        elif command == "ATT?":
+            return " ".join("%.2f" % value for value in self.attenuation)
+        elif command.startswith(":SetAttPerChan:"):
+            for setting in command[len(":SetAttPerChan:"):].split("_"):  # "1:a_2:b_3:c_4:d"
+                channel, value = setting.split(":")
+                self.attenuation[int(channel) - 1] = round(float(value) * 4) / 4  # 0.25dB steps
+            return "1"
+        elif command.startswith(":CHAN:"):
+            fields = command[len(":CHAN:"):].split(":")
+            if fields[-1] == "Att?":
+                return "%.2f" % self.attenuation[int(fields[0]) - 1]
+            elif fields[-2] == "SetAtt":
+                for channel in fields[:-2]:  # ":CHAN:1:2:3:4:SetAtt:x" sets several channels
+                    self.attenuation[int(channel) - 1] = round(float(fields[-1]) * 4) / 4
+                return "1"
+        return "0"  # The instrument answers 0 to commands it does not understand
+
+
+class SparkER_SCPI_Server(Stand_In_Server):
+    """Stand in for a SparkER, answering the commands used by SparkER_SCPI_BPMDevice.
+
+    Waveforms are made from the configured beam position and sum with seeded Gaussian
+    noise, so the driver parses replies of the same size as the real instrument sends.
+
+    Attributes:
+        X_position (float): Horizontal position of the beam in um
+        Y_position (float): Vertical position of the beam in um
+        sum (float): Sum of the four buttons in ADC counts
+        noise (float): Standard deviation of the noise added to each value
+    """
+
+    terminator = "\r\n"
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, seed=None, noise=0):
+        """Opens the server socket with the beam in the centre
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 lets the OS pick a free one
+            latency (float): Time each message is held before it is answered, in seconds
+            jitter (float): Standard deviation of the random extra time added to the latency, in seconds
+            seed (int): Seed for the jitter and noise, so runs can be repeated
+            noise (float): Standard deviation of the noise added to each value
+        Returns:
+
+        """
+        Stand_In_Server.__init__(self, host, port, latency, jitter, seed)
+        self.X_position = 0.0
+        self.Y_position = 0.0
+        self.sum = 1000000.0
+        self.noise = noise
+
+    def _waveform(self, values, samples):
+        """Private method that writes out a waveform with the same values in every sample
+
+        Args:
+            values (float list): Value of each channel
+            samples (int): Number of samples
+        Returns:
+            str: Space separated values, one sample after another
+        """
+        data = np.tile(np.asarray(values, dtype=float), (samples, 1))
+        if self.noise > 0:
+            data += self.random.normal(0, self.noise, data.shape)
+        return " ".join("%.3f" % value for value in data.ravel())
+
+    def command(self, command):
+        header, _, value = command.partition(" ")
+        if header in ("START", "TRIG"):
+            return "OK"
+        elif header == "TBT_XY":
+            return self._waveform([self.X_position, self.Y_position], int(value))
+        elif header == "TBT_QSUM":
+            return self._waveform([0.0, self.sum], int(value))
+        elif header == "ADC":
+            return self._waveform([self.sum / 4] * 4, int(value))
+        return "ERROR"
@@ -0,0 +1,112 @@
+import unittest
+import warnings
+from mock import patch
+import Instrument_Transport
+import RFSignalGenerators
+import Gate_Source
+import ProgrammableAttenuator
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.servers = []
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        for server in self.servers:
+            server.stop()
+
+    def _start(self, server):
+        self.servers.append(server.start())
+        return server
+
+    def test_rigol_drivers_share_stand_in(self):
+        server = self._start(Instrument_Transport.Rigol3030DSG_Server())
+        RF = RFSignalGenerators.Rigol3030DSG_RFSigGen(server.host, server.port, 1, -40)
+        GS = Gate_Source.Rigol3030DSG_GateSource(server.host, server.port, 1)
+        self.assertEqual(RF.set_output_power(-50), (-50.0, "-50.00DBM"))
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            self.assertEqual(RF.set_output_power(0), (-40.0, "-40.00DBM"))  # capped by the driver
+        self.assertEqual(RF.turn_on_RF(), True)
+        self.assertEqual(GS.turn_on_modulation(), True)
+        self.assertEqual(GS.set_pulse_dutycycle(0.5), 0.5)
+        server.reset_counts()
+        RF.set_frequency(499.68)
+        self.assertEqual(server.messages, 1)  # the set and the read back go in one message
+        self.assertEqual(server.commands, 2)
+        del RF, GS
+
+    def test_rigol_hardware_sweep(self):
+        server = self._start(Instrument_Transport.Rigol3030DSG_Server())
+        RF = RFSignalGenerators.Rigol3030DSG_RFSigGen(server.host, server.port, 1, -40)
+        RF.setup_power_sweep([-60, -55, -50], 0)
+        for power in [-60.0, -55.0, -50.0]:
+            RF.next_sweep_point()
+            self.assertEqual(server.state["LEV"], power)
+        RF.stop_power_sweep()
+        del RF
+
+    def test_benchmark_sweep(self):
+        server = self._start(Instrument_Transport.Rigol3030DSG_Server())
+        RF = RFSignalGenerators.Rigol3030DSG_RFSigGen(server.host, server.port, 1, -40)
+        powers = [-60, -55, -50, -45]
+
+        def sweep(RF=RF):
+            RF.setup_power_sweep(powers, 0)
+            for power in powers:
+                RF.next_sweep_point()
+            RF.stop_power_sweep()
+
+        results = Instrument_Transport.benchmark_sweep([server], sweep, len(powers), repeats=2)
+        self.assertEqual(results["messages_per_point"], 1.5)  # set up, a message at each point, then stop
+        self.assertGreater(results["commands_per_point"], results["messages_per_point"])
+        self.assertGreater(results["commands_per_second"], 0)
+        self.assertGreater(results["sweep_time"], 0)
+        self.assertIn(("telnet query", "Rigol3030DSG_RFSigGen"), results["call_times"])
+        self.assertRaises(TypeError, Instrument_Transport.benchmark_sweep, [server], sweep, 1.5)
+        self.assertRaises(ValueError, Instrument_Transport.benchmark_sweep, [server], sweep, 4, 0)
+        del sweep, RF
+
+    def test_stand_in_needs_command(self):
+        self.assertRaises(TypeError, Instrument_Transport.Stand_In_Server)
+
+    def test_attenuator_stand_in(self):
+        server = self._start(Instrument_Transport.MC_RC4DAT6G95_Server())
+        atten = ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten(server.host, server.port, 1)
+        self.assertEqual(atten.set_all_channels(10, 20.3, 30, 40), [10.0, 20.25, 30.0, 40.0])
+        self.assertEqual(atten.set_channel_attenuation("B", 5), 5.0)
+        self.assertEqual(atten.set_global_attenuation(3), [3.0, 3.0, 3.0, 3.0])
+        del atten
+
+    def test_sparker_waveforms(self):
+        server = self._start(Instrument_Transport.SparkER_SCPI_Server(seed=1, noise=1.0))
+        server.X_position = 500.0
+        transport = Instrument_Transport.get_transport(server.host, server.port, 1)
+        transport.write("TBT_XY 10\r\n")
+        values = [float(value) for value in transport.read_until("\r\n").split()]
+        self.assertEqual(len(values), 20)
+        self.assertAlmostEqual(sum(values[0::2]) / 10, 500.0, delta=2)
+        transport.release()
+
+    @patch("time.sleep")
+    def test_latency_and_jitter(self, mock_sleep):
+        server = Instrument_Transport.SparkER_SCPI_Server(latency=0.01, jitter=0.001, seed=1)
+        server.handle_message("START")
+        delay = mock_sleep.call_args[0][0]
+        self.assertNotEqual(delay, 0.01)
+        self.assertAlmostEqual(delay, 0.01, delta=0.005)
+        server.stop()
+        self.assertRaises(TypeError, Instrument_Transport.Rigol3030DSG_Server, latency="1")
+        self.assertRaises(ValueError, Instrument_Transport.Rigol3030DSG_Server, jitter=-1)
+
+if __name__ == "__main__":
+    unittest.main()
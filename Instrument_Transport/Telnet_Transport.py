@@ -0,0 +1,234 @@
+import telnetlib
+import socket
+import threading
+from Latency_Log import timed
+from Record_Replay import current_session
+
+_transports = {}  # Open transports, keyed by (host, port)
+
+
+def get_transport(host, port, timeout=1):
+    """Gets the shared transport for an instrument, opening it if needed
+
+    Every logical driver talking to the same host and port is given the same
+    transport, so an instrument only ever has one socket open to it. Each call
+    must be matched with a call to release() on the transport. If a recording or
+    replay session has been started, new transports go through it.
+
+    Args:
+        host (str): IP address of the instrument
+        port (int/str): Port the instrument listens on
+        timeout (float): Timeout for the connection and reads, in seconds
+    Returns:
+        Telnet_Transport: The shared transport
+    """
+    key = (host, int(port))
+    if key not in _transports:
+        _transports[key] = Telnet_Transport(host, int(port), timeout, current_session())
+    transport = _transports[key]
+    transport.users += 1  # Count the drivers using the transport, so it is only closed by the last one
+    return transport
+
+
+def reset_transports():
+    """Closes every pooled transport and empties the pool
+
+    Used by tests, so transports left open by one test are not handed to the next.
+
+    Args:
+
+    Returns:
+
+    """
+    for transport in list(_transports.values()):
+        transport.users = 0
+        if transport.tn is not None:
+            transport.tn.close()
+    _transports.clear()
+
+
+class Telnet_Transport():
+    """Persistent telnet connection to an instrument, shared by all of its drivers.
+
+    Use get_transport() rather than creating these directly so that connections
+    are pooled. The read and write methods match telnetlib so drivers can use it
+    in place of a telnetlib.Telnet object. Nagle's algorithm is turned off so short
+    SCPI messages are sent straight away, and a dropped connection is reopened the
+    next time it is used. Given a session, every write and read is recorded, or when
+    replaying is answered from the recording without opening a connection.
+
+    Attributes:
+        host (str): IP address of the instrument
+        port (int): Port the instrument listens on
+        timeout (float): Timeout for the connection and reads, in seconds
+        users (int): Number of drivers currently using the transport
+        lock (RLock): Held by a driver for the whole of a write and read exchange
+        tn (telnetlib.Telnet): The underlying telnet connection, None when replaying
+        session (Session_Recording/Session_Replay): Session the exchanges go through, None if there is not one
+        channel (str): "host:port", names the connection in the latency log and recordings
+    """
+
+    def __init__(self, host, port, timeout, session=None):
+        """Opens the connection to the instrument
+
+        Args:
+            host (str): IP address of the instrument
+            port (int): Port the instrument listens on
+            timeout (float): Timeout for the connection and reads, in seconds
+            session (Session_Recording/Session_Replay): Session to record or replay the
+                exchanges with, None to talk to the instrument directly
+        Returns:
+
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.users = 0
+        self.lock = threading.RLock()
+        self.tn = None
+        self.session = session
+        self.channel = host + ":" + str(port)
+        if session is None or not session.replaying:
+            self._connect()
+
+    def _exchange(self, kind, request, send):
+        """Private method that makes an exchange through the session, if there is one
+
+        Args:
+            kind (str): "write", "read_until" or "read_some"
+            request (variant): What is sent, recorded so a replay can be checked against it
+            send (callable): Makes the exchange with the instrument and returns the response
+        Returns:
+            variant: The response, from the instrument or from the recording
+        """
+        if self.session is None:
+            return send()
+        return self.session.exchange(self.channel, kind, request, send)
+
+    def _connect(self):
+        """Private method that opens the telnet connection
+
+        Args:
+
+        Returns:
+
+        """
+        if self.tn is not None:
+            self.tn.close()  # Make sure the old socket is not left open
+        self.tn = telnetlib.Telnet(self.host, self.port, self.timeout)
+        # Send each message as soon as it is written instead of waiting to fill a packet
+        self.tn.get_socket().setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _check_connection(self):
+        """Private method that reopens the connection if it has been closed
+
+        Args:
+
+        Returns:
+
+        """
+        if not self.tn.get_socket():  # telnetlib clears the socket when it is closed
+            self._connect()
+
+    def write(self, message):
+        """Writes a message to the instrument, reconnecting once if the link has dropped
+
+        Args:
+            message (str): Message to send, including any termination characters
+        Returns:
+
+        """
+        with timed("telnet write", self.channel):  # Covers writes that are not read back
+            self._exchange("write", message, lambda: self._write(message))
+
+    def _write(self, message):
+        """Private method that writes a message, reconnecting once if the link has dropped
+
+        Args:
+            message (str): Message to send, including any termination characters
+        Returns:
+
+        """
+        self._check_connection()
+        try:
+            self.tn.write(message)
+        except (socket.error, EOFError):
+            self._connect()  # The instrument dropped the link, reconnect and send again
+            self.tn.write(message)
+
+    def read_until(self, match, timeout=None):
+        """Reads until the match string is found or the timeout is reached
+
+        If the link has dropped it is reopened before the error is passed on, the
+        reply is lost but the next message will be sent on the new connection.
+
+        Args:
+            match (str): String that ends the reply
+            timeout (float): Timeout in seconds, defaults to the transport timeout
+        Returns:
+            str: Everything read, including the match string if it was found
+        """
+        if timeout is None:
+            timeout = self.timeout
+        return self._exchange("read_until", match, lambda: self._read_until(match, timeout))
+
+    def _read_until(self, match, timeout):
+        """Private method that reads until the match string is found or the timeout is reached
+
+        Args:
+            match (str): String that ends the reply
+            timeout (float): Timeout in seconds
+        Returns:
+            str: Everything read, including the match string if it was found
+        """
+        self._check_connection()
+        try:
+            return self.tn.read_until(match, timeout)
+        except (socket.error, EOFError):
+            self._connect()
+            raise
+
+    def read_some(self):
+        """Reads whatever data has arrived, waiting for at least some
+
+        Args:
+
+        Returns:
+            str: The data read, an empty string if the connection was closed
+        """
+        return self._exchange("read_some", None, self._read_some)
+
+    def _read_some(self):
+        """Private method that reads whatever data has arrived, waiting for at least some
+
+        Args:
+
+        Returns:
+            str: The data read, an empty string if the connection was closed
+        """
+        self._check_connection()
+        try:
+            return self.tn.read_some()
+        except (socket.error, EOFError):
+            self._connect()
+            raise
+
+    def release(self):
+        """Tells the transport a driver has finished with it
+
+        The connection is closed and removed from the pool once no drivers are
+        using it.
+
+        Args:
+
+        Returns:
+
+        """
+        if self.users <= 0:
+            return  # Already closed, for example by reset_transports
+        self.users -= 1
+        if self.users == 0:
+            if self.tn is not None:
+                self.tn.close()
+            if _transports.get((self.host, self.port)) is self:
+                del _transports[(self.host, self.port)]
@@ -0,0 +1,59 @@
+import unittest
+import socket
+from mock import patch
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    @patch("telnetlib.Telnet")
+    def setUp(self, mock_telnet):
+        # Stuff you run before each test
+        Instrument_Transport.reset_transports()  # Nothing left open by other tests is shared
+        self.mock_telnet = mock_telnet
+        self.transport = Instrument_Transport.get_transport("0", 0, 1)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        Instrument_Transport.reset_transports()
+
+    def test_same_instrument_shares_transport(self):
+        self.assertIs(Instrument_Transport.get_transport("0", "0", 1), self.transport)
+        self.assertEqual(self.transport.users, 2)
+        self.assertEqual(self.mock_telnet.call_count, 1)
+
+    def test_tcp_nodelay_is_set(self):
+        self.transport.tn.get_socket().setsockopt.assert_called_with(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def test_closed_by_last_user(self):
+        Instrument_Transport.get_transport("0", 0, 1)
+        self.transport.release()
+        self.assertFalse(self.transport.tn.close.called)
+        self.transport.release()
+        self.assertTrue(self.transport.tn.close.called)
+
+    @patch("telnetlib.Telnet")
+    def test_reset_closes_pooled_transports(self, mock_telnet):
+        Instrument_Transport.reset_transports()
+        self.assertTrue(self.transport.tn.close.called)
+        self.assertEqual(self.transport.users, 0)
+        self.transport.release()  # a late release does nothing
+        self.assertEqual(self.transport.users, 0)
+        self.assertIsNot(Instrument_Transport.get_transport("0", 0, 1), self.transport)
+
+    @patch("telnetlib.Telnet")
+    def test_reconnects_when_write_fails(self, mock_telnet):
+        self.transport.tn.write.side_effect = socket.error
+        self.transport.write("*IDN?\r\n")
+        self.assertTrue(mock_telnet.called)
+        self.transport.tn.write.assert_called_with("*IDN?\r\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import threading
+import time
+
+_quiet = threading.local()  # Set while a simulator reads the state of the others, so it is not timed
+
+# Rough timings of the real instruments behind each simulator, in seconds. These can be
+# passed to Timing_Profile, for example Timing_Profile(**typical_timings["Simulated_RFSigGen"])
+typical_timings = {
+    "Simulated_RFSigGen": {"latency": 0.015, "jitter": 0.005, "settle_time": 0.05},
+    "Simulated_GateSource": {"latency": 0.015, "jitter": 0.005, "settle_time": 0.01},
+    "Simulated_Prog_Atten": {"latency": 0.03, "jitter": 0.01, "settle_time": 0.002},
+    "Simulated_BPMDevice": {"latency": 0.005, "jitter": 0.002, "acquisition_time": 0.1}}
+
+
+class Virtual_Clock():
+    """Clock and sleep shared by the simulators, the sweep engine and the latency log.
+
+    Normally this is the real clock, and sleeping really waits, so the overlap between
+    instruments can be measured. When estimating, sleeping does not wait but moves the
+    clock on instead, so the time read from the clock is the time the code really took
+    plus the time the instruments would have taken. A whole run with simulated instruments
+    then shows how long the real station would take, without waiting for it.
+
+    Attributes:
+        estimating (bool): True to move the clock on instead of sleeping
+        skipped (float): Time in seconds that has been slept without waiting
+        clock (callable): Function that returns the real time in seconds
+        real_sleep (callable): Function used to wait when not estimating
+        lock (Lock): Stops sleeps from different threads being added at the same time
+    """
+
+    def __init__(self, estimating=False, clock=time.time, sleep=time.sleep):
+        """Starts the clock
+
+        Args:
+            estimating (bool): True to move the clock on instead of sleeping
+            clock (callable): Function that returns the real time in seconds
+            sleep (callable): Function used to wait when not estimating
+        Returns:
+
+        """
+        self.clock = clock
+        self.real_sleep = sleep
+        self.lock = threading.Lock()
+        self.skipped = 0.0
+        self.set_estimating(estimating)
+
+    def set_estimating(self, estimating):
+        """Chooses whether sleeping waits or moves the clock on
+
+        Args:
+            estimating (bool): True to move the clock on instead of sleeping
+        Returns:
+
+        """
+        if type(estimating) != bool:
+            raise TypeError
+        self.estimating = estimating
+
+    def time(self):
+        """Gets the time, including any time that was slept without waiting
+
+        Args:
+
+        Returns:
+            float: Time in seconds
+        """
+        return self.clock() + self.skipped
+
+    def sleep(self, seconds):
+        """Waits, or moves the clock on if estimating
+
+        Args:
+            seconds (float): Time to wait in seconds
+        Returns:
+
+        """
+        if seconds <= 0:
+            return
+        if self.estimating:
+            with self.lock:
+                self.skipped += seconds
+        else:
+            self.real_sleep(seconds)
+
+
+station_clock = Virtual_Clock()  # Shared by every simulator, sweep and the latency log
+
+
+class Timing_Profile():
+    """How long a simulated instrument takes to answer, settle and take an acquisition.
+
+    Each command takes the latency, with Gaussian jitter on it, which is the round trip of
+    the real instrument. Commands that change the output are followed by the settle time,
+    and BPM readings by the acquisition time. The time is spent on a Virtual_Clock, so it is
+    either waited for or only added to the clock.
+
+    Attributes:
+        latency (float): Mean time in seconds to answer a command
+        jitter (float): Standard deviation of the time to answer a command in seconds
+        settle_time (float): Time in seconds for the output to settle after it is changed
+        acquisition_time (float): Time in seconds to take an acquisition
+        clock (Virtual_Clock): Clock the time is spent on
+        random (RandomState): Source of the jitter, seeded so runs can be repeated
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, settle_time=0.0, acquisition_time=0.0, clock=None, seed=None):
+        """Sets up the profile
+
+        Args:
+            latency (float): Mean time in seconds to answer a command
+            jitter (float): Standard deviation of the time to answer a command in seconds
+            settle_time (float): Time in seconds for the output to settle after it is changed
+            acquisition_time (float): Time in seconds to take an acquisition
+            clock (Virtual_Clock): Clock the time is spent on, station_clock if None is given
+            seed (int): Seed for the jitter, None to seed it differently every time
+        Returns:
+
+        """
+        for value in (latency, jitter, settle_time, acquisition_time):
+            if type(value) != float and type(value) != int:
+                raise TypeError
+            elif value < 0:
+                raise ValueError
+        if clock is None:
+            clock = station_clock
+        self.latency = latency
+        self.jitter = jitter
+        self.settle_time = settle_time
+        self.acquisition_time = acquisition_time
+        self.clock = clock
+        self.random = np.random.RandomState(seed)
+
+    def duration(self, *parts):
+        """Works out how long the parts of an exchange take, without spending the time
+
+        Args:
+            *parts (str): "command", "settle" or "acquire"
+        Returns:
+            float: Time in seconds
+        """
+        total = 0.0
+        for part in parts:
+            if part == "command":
+                total += max(0.0, self.random.normal(self.latency, self.jitter))
+            elif part == "settle":
+                total += self.settle_time
+            elif part == "acquire":
+                total += self.acquisition_time
+            else:
+                raise ValueError
+        return total
+
+    def wait(self, *parts):
+        """Spends the time the parts of an exchange take on the clock
+
+        Args:
+            *parts (str): "command", "settle" or "acquire"
+        Returns:
+
+        """
+        if getattr(_quiet, "active", False):
+            return  # a simulator is reading the state of another one
+        self.clock.sleep(self.duration(*parts))
+
+
+def simulated_delay(timing, *parts):
+    """Spends the time a simulated instrument takes, if it has a timing profile
+
+    Args:
+        timing (Timing_Profile): Profile of the instrument, None if it answers straight away
+        *parts (str): "command", "settle" or "acquire"
+    Returns:
+
+    """
+    if timing is not None:
+        timing.wait(*parts)
+
+
+def untimed():
+    """Stops simulated instruments taking any time inside a with block
+
+    Used when one simulator reads the state of another, which the real instruments never
+    have to ask for. Only the thread that entered the with block is affected.
+
+    Args:
+
+    Returns:
+        context manager: Simulated instruments answer straight away inside the with block
+    """
+    return _Untimed()
+
+
+class _Untimed():
+    """Context manager used by untimed()"""
+
+    def __enter__(self):
+        self.outer = getattr(_quiet, "active", False)
+        _quiet.active = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _quiet.active = self.outer
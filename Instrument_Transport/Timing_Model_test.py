@@ -0,0 +1,60 @@
+import unittest
+from mock import MagicMock
+import Instrument_Transport
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.real_clock = MagicMock(return_value=100.0)
+        self.real_sleep = MagicMock()
+        self.clock = Instrument_Transport.Virtual_Clock(True, self.real_clock, self.real_sleep)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    def test_estimating_moves_the_clock_without_waiting(self):
+        self.clock.sleep(2.5)
+        self.clock.sleep(0.5)
+        self.assertEqual(self.clock.time(), 103.0)
+        self.assertFalse(self.real_sleep.called)
+        self.clock.set_estimating(False)
+        self.clock.sleep(1.0)
+        self.real_sleep.assert_called_once_with(1.0)
+        self.assertEqual(self.clock.time(), 103.0)
+
+    def test_profile_spends_its_time_on_the_clock(self):
+        profile = Instrument_Transport.Timing_Profile(latency=0.02, settle_time=0.5, acquisition_time=0.1,
+                                                      clock=self.clock)
+        profile.wait("command", "settle")
+        profile.wait("command", "acquire")
+        self.assertAlmostEqual(self.clock.time(), 100.0 + 0.04 + 0.5 + 0.1)
+        with Instrument_Transport.untimed():
+            profile.wait("command", "settle")
+        self.assertAlmostEqual(self.clock.time(), 100.0 + 0.04 + 0.5 + 0.1)
+
+    def test_seeded_jitter_repeats(self):
+        first = Instrument_Transport.Timing_Profile(latency=0.02, jitter=0.01, clock=self.clock, seed=1)
+        second = Instrument_Transport.Timing_Profile(latency=0.02, jitter=0.01, clock=self.clock, seed=1)
+        durations = [first.duration("command") for i in range(100)]
+        self.assertEqual(durations, [second.duration("command") for i in range(100)])
+        self.assertGreaterEqual(min(durations), 0.0)
+        self.assertNotEqual(min(durations), max(durations))
+
+    def test_profile_if_invalid_input_types_used(self):
+        self.assertRaises(TypeError, Instrument_Transport.Timing_Profile, latency="1")
+        self.assertRaises(ValueError, Instrument_Transport.Timing_Profile, settle_time=-1)
+        self.assertRaises(ValueError, Instrument_Transport.Timing_Profile().duration, "wait")
+        self.assertRaises(TypeError, self.clock.set_estimating, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,8 @@
+from Telnet_Transport import *
+from SCPI_Batch import *
+from Timing_Model import *
+from Run_Estimate import *
+from Latency_Log import *
+from Record_Replay import *
+from Stand_In_Servers import *
+from Lazy_Package import *
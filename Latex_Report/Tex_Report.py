@@ -1,7 +1,7 @@
 from pkg_resources import require
 require("numpy")
 require("matplotlib")
-from pylatex import Document, Section, Figure, NoEscape, Command, Tabular
+from pylatex import Document, Section, Subsection, Figure, NoEscape, Command, Tabular
 import matplotlib.pyplot as plt
 import numpy as np
 from math import ceil
@@ -170,6 +170,45 @@ class Tex_Report():
         self.doc.append(NoEscape(r'\end{figure}'))
 
 
+    def add_timing_appendix(self, summary):
+        """Adds an appendix showing where the time went in each test
+
+        Writes a table for each test with the time spent setting, settling, measuring and
+        reporting in each step, followed by the time taken by each type of instrument call.
+
+        Args:
+            summary (dict): Output of Latency_Log.summary(), statistics for each test keyed
+                by (kind, name)
+
+        Returns:
+
+        """
+        phases = ["set", "settle", "measure", "report"]
+        self.doc.append(NoEscape(r'\clearpage'))
+        self.doc.append(NoEscape(r'\appendix'))
+        with self.doc.create(Section("Timing")):
+            self.doc.append(NoEscape(r'Phases are totalled over each step, instrument calls are counted one at a time. '
+                                     r'Median and percentile times are in milliseconds.\\'))
+            for test in sorted(summary, key=str):
+                calls = summary[test]
+                # Phases first in the order they happen, then the instrument calls
+                keys = [("phase", phase) for phase in phases if ("phase", phase) in calls]
+                keys += sorted(key for key in calls if key[0] != "phase")
+                if test is None:
+                    test = "Outside of the tests"
+                with self.doc.create(Subsection(test)):
+                    table = Tabular('|l|l|c|c|c|c|c|')
+                    table.add_hline()
+                    table.add_row(["Type", "Name", "Count", "Total (s)", "Median", "P90", "P99"])
+                    table.add_hline()
+                    for key in keys:
+                        stats = calls[key]
+                        table.add_row([key[0], key[1], stats["count"], round(stats["total"], 2),
+                                       round(stats["median"] * 1000, 2), round(stats["p90"] * 1000, 2),
+                                       round(stats["p99"] * 1000, 2)])
+                    table.add_hline()
+                    self.doc.append(table)
+
     def create_report(self):
         """Creates the report
         
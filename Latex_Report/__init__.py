@@ -1 +1,5 @@
-from Tex_Report import Tex_Report
+import Instrument_Transport
+
+# pylatex and matplotlib are only imported when a report is first made
+Instrument_Transport.lazy_package(__name__, {
+    "Tex_Report": "Tex_Report"})
@@ -1,99 +1,217 @@
+import os
+import shutil
+import tempfile
 import RFSignalGenerators
 import BPMDevice
 import Gate_Source
 import ProgrammableAttenuator
 import Latex_Report
+import Instrument_Transport
 import Tests
 
-RF = RFSignalGenerators.Rigol3030DSG_RFSigGen(
-    ipaddress="172.23.252.51",
-    port=5555,
-    timeout=1,
-    limit=-40)
+# None talks to the instruments, "record" also saves every exchange with them to session_file,
+# "replay" runs the tests from that file at the recorded speed and "replay fast" as quickly as possible
+session_mode = None
+session_file = "BPMTestSession.jsonl"
 
-GS = Gate_Source.Rigol3030DSG_GateSource(
-    ipaddress="172.23.252.51",
-    port=5555,
-    timeout=1)
+# True runs the tests against the simulated instruments, which take as long as the real ones would.
+# With timing_mode "estimate" nothing waits and the timing appendix shows how long the real station
+# would take, "sleep" really waits so the overlap between instruments can be measured
+simulated = False
+timing_mode = "estimate"
 
-ProgAtten = ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten(
-    ipaddress="172.23.244.105",
-    port=23,
-    timeout=1)
-
-BPM = BPMDevice.SparkERXR_EPICS_BPMDevice(
-    database="libera",
-    daq_type="fa")
-
-report = Latex_Report.Tex_Report("BPMTestReport")
+# estimate_first runs the tests against the simulated instruments without waiting before the real run,
+# to estimate how long each test and phase will take. The simulated instruments are calibrated from the
+# recording in calibration_file if there is one. dry_run only gives the estimate and stops there
+estimate_first = False
+dry_run = False
+calibration_file = session_file
 
 dls_RF_frequency = 499.6817682
 dls_bunch = 1.87319
 subdirectory = "./Results/"
 settling_time = 0
 
-Tests.Beam_position_equidistant_grid_raster_scan_test(
-    RFObject=RF,
-    BPMObject=BPM,
-    ProgAttenObject=ProgAtten,
-    rf_frequency=dls_RF_frequency,
-    rf_power=-40,
-    nominal_attenuation=10,
-    x_points=3,
-    y_points=3,
-    settling_time=settling_time,
-    ReportObject=report,
-    sub_directory=subdirectory)
-
-Tests.Beam_position_attenuation_permutation_test(
-    RFObject=RF,
-    BPMObject=BPM,
-    ProgAttenObject=ProgAtten,
-    rf_frequency=dls_RF_frequency,
-    rf_power=-40,
-    attenuator_max=50,
-    attenuator_min=10,
-    attenuator_steps=2,
-    settling_time=settling_time,
-    ReportObject=report,
-    sub_directory=subdirectory)
-
-ProgAtten.set_global_attenuation(0)
-
-Tests.Beam_Power_Dependence(
-    RFObject=RF,
-    BPMObject=BPM,
-    frequency=dls_RF_frequency,
-    start_power=-100,
-    end_power=-40,
-    samples=10,
-    settling_time=settling_time,
-    ReportObject=report,
-    sub_directory=subdirectory)
-
-Tests.Fixed_voltage_amplitude_fill_pattern_test(
-    RFObject=RF,
-    BPMObject=BPM,
-    GateSourceObject=GS,
-    frequency=dls_RF_frequency,
-    power=-40,
-    samples=10,
-    pulse_period=dls_bunch,
-    settling_time=settling_time,
-    ReportObject=report,
-    sub_directory=subdirectory)
-
-Tests.Scaled_voltage_amplitude_fill_pattern_test(
-    RFObject=RF,
-    BPMObject=BPM,
-    GateSourceObject=GS,
-    frequency=dls_RF_frequency,
-    desired_power=-70,
-    samples=10,
-    pulse_period=dls_bunch,
-    settling_time=settling_time,
-    ReportObject=report,
-    sub_directory=subdirectory)
-
-report.create_report()
 
+def timing_profiles(calibration_file):
+    """Gets the timing profile of each simulated instrument
+
+    Args:
+        calibration_file (str): Recording of a run on the real instruments, None or a file
+            that does not exist to use the typical timings
+    Returns:
+        dict: Timing_Profile for each simulator, keyed by the name of the simulator
+    """
+    channels = {"Simulated_RFSigGen": "172.23.252.51:5555",  # Where the real instruments are
+                "Simulated_GateSource": "172.23.252.51:5555",
+                "Simulated_Prog_Atten": "172.23.244.105:23",
+                "Simulated_BPMDevice": "epics"}
+    profiles = {}
+    for simulator in channels:
+        if calibration_file is not None and os.path.exists(calibration_file):
+            profiles[simulator] = Instrument_Transport.calibrate_timing(calibration_file, channels[simulator], simulator)
+        else:
+            profiles[simulator] = Instrument_Transport.Timing_Profile(**Instrument_Transport.typical_timings[simulator])
+    return profiles
+
+
+def simulated_instruments(profiles):
+    """Makes a simulated station
+
+    Args:
+        profiles (dict): Timing_Profile for each simulator, from timing_profiles()
+    Returns:
+        RFSignalGenerator Obj: Simulated RF source
+        GateSource Obj: Simulated gate source
+        Prog_Atten Obj: Simulated programmable attenuator
+        BPMDevice Obj: Simulated BPM, fed by the other simulated instruments
+    """
+    RF = RFSignalGenerators.Simulated_RFSigGen(
+        limit=-40,
+        timing=profiles["Simulated_RFSigGen"])
+
+    GS = Gate_Source.Simulated_GateSource(
+        timing=profiles["Simulated_GateSource"])
+
+    ProgAtten = ProgrammableAttenuator.Simulated_Prog_Atten(
+        ipaddress="172.23.244.105",
+        port=23,
+        timeout=1,
+        timing=profiles["Simulated_Prog_Atten"])
+
+    BPM = BPMDevice.Simulated_BPMDevice(
+        RFSim=RF,
+        GateSim=GS,
+        ProgAttenSim=ProgAtten,
+        timing=profiles["Simulated_BPMDevice"])
+    return RF, GS, ProgAtten, BPM
+
+
+def run_tests(RF, GS, ProgAtten, BPM, report, sub_directory):
+    """Runs the test list
+
+    Args:
+        RF (RFSignalGenerator Obj): RF source
+        GS (GateSource Obj): Gate source
+        ProgAtten (Prog_Atten Obj): Programmable attenuator
+        BPM (BPMDevice Obj): BPM being tested
+        report (Tex_Report Obj): Report the results are added to
+        sub_directory (str): Directory the plots and data are saved in
+    Returns:
+
+    """
+    Tests.Beam_position_equidistant_grid_raster_scan_test(
+        RFObject=RF,
+        BPMObject=BPM,
+        ProgAttenObject=ProgAtten,
+        rf_frequency=dls_RF_frequency,
+        rf_power=-40,
+        nominal_attenuation=10,
+        x_points=3,
+        y_points=3,
+        settling_time=settling_time,
+        ReportObject=report,
+        sub_directory=sub_directory)
+
+    Tests.Beam_position_attenuation_permutation_test(
+        RFObject=RF,
+        BPMObject=BPM,
+        ProgAttenObject=ProgAtten,
+        rf_frequency=dls_RF_frequency,
+        rf_power=-40,
+        attenuator_max=50,
+        attenuator_min=10,
+        attenuator_steps=2,
+        settling_time=settling_time,
+        ReportObject=report,
+        sub_directory=sub_directory)
+
+    ProgAtten.set_global_attenuation(0)
+
+    Tests.Beam_Power_Dependence(
+        RFObject=RF,
+        BPMObject=BPM,
+        frequency=dls_RF_frequency,
+        start_power=-100,
+        end_power=-40,
+        samples=10,
+        settling_time=settling_time,
+        ReportObject=report,
+        sub_directory=sub_directory)
+
+    Tests.Fixed_voltage_amplitude_fill_pattern_test(
+        RFObject=RF,
+        BPMObject=BPM,
+        GateSourceObject=GS,
+        frequency=dls_RF_frequency,
+        power=-40,
+        samples=10,
+        pulse_period=dls_bunch,
+        settling_time=settling_time,
+        ReportObject=report,
+        sub_directory=sub_directory)
+
+    Tests.Scaled_voltage_amplitude_fill_pattern_test(
+        RFObject=RF,
+        BPMObject=BPM,
+        GateSourceObject=GS,
+        frequency=dls_RF_frequency,
+        desired_power=-70,
+        samples=10,
+        pulse_period=dls_bunch,
+        settling_time=settling_time,
+        ReportObject=report,
+        sub_directory=sub_directory)
+
+
+if estimate_first or dry_run:
+    estimating = Instrument_Transport.station_clock.estimating
+    Instrument_Transport.station_clock.set_estimating(True)  # Nothing waits, the clock is moved on instead
+    dry_run_directory = tempfile.mkdtemp()  # Keeps the dry run's plots and data away from the results
+    run_tests(*simulated_instruments(timing_profiles(calibration_file)),
+              report=Latex_Report.Tex_Report(os.path.join(dry_run_directory, "DryRun")),
+              sub_directory=dry_run_directory + "/")
+    breakdown = Instrument_Transport.estimate_breakdown(Instrument_Transport.latency_log.summary())
+    print(Instrument_Transport.format_estimate(breakdown))
+    Instrument_Transport.check_run_time(breakdown)  # Warns if the run will take too long
+    shutil.rmtree(dry_run_directory)
+    Instrument_Transport.latency_log.clear()
+    Instrument_Transport.station_clock.set_estimating(estimating)
+
+if not dry_run:
+    if session_mode == "record":
+        Instrument_Transport.start_recording(session_file)
+    elif session_mode == "replay":
+        Instrument_Transport.start_replay(session_file, real_time=True)
+    elif session_mode == "replay fast":
+        Instrument_Transport.start_replay(session_file, real_time=False)
+
+    if simulated:
+        Instrument_Transport.station_clock.set_estimating(timing_mode == "estimate")
+        RF, GS, ProgAtten, BPM = simulated_instruments(timing_profiles(calibration_file))
+    else:
+        RF = RFSignalGenerators.Rigol3030DSG_RFSigGen(
+            ipaddress="172.23.252.51",
+            port=5555,
+            timeout=1,
+            limit=-40)
+
+        GS = Gate_Source.Rigol3030DSG_GateSource(
+            ipaddress="172.23.252.51",
+            port=5555,
+            timeout=1)
+
+        ProgAtten = ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten(
+            ipaddress="172.23.244.105",
+            port=23,
+            timeout=1)
+
+        BPM = BPMDevice.SparkERXR_EPICS_BPMDevice(
+            database="libera",
+            daq_type="fa")
+
+    report = Latex_Report.Tex_Report("BPMTestReport")
+    run_tests(RF, GS, ProgAtten, BPM, report, subdirectory)
+    report.add_timing_appendix(Instrument_Transport.latency_log.summary())  # Where the time went in each test
+    report.create_report()
+    Instrument_Transport.stop_session()
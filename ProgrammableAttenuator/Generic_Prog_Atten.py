@@ -23,3 +23,7 @@ class Generic_Prog_Atten():
     @abstractmethod
     def get_channel_attenuation(self, channel):
         pass
+
+    @abstractmethod
+    def set_all_channels(self, a, b, c, d):
+        pass
@@ -1,5 +1,5 @@
-from ProgrammableAttenuator import *
-import telnetlib
+from Generic_Prog_Atten import *
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
 import numpy as np
@@ -10,11 +10,11 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
     def __init__(self, ipaddress, port, timeout):
         self.DeviceID = ""
         self.timeout = timeout  # timeout for the telnet comms
-        self.tn = telnetlib.Telnet(ipaddress, port, self.timeout)  # connects to the telnet device
+        self.tn = Instrument_Transport.get_transport(ipaddress, port, self.timeout)  # Shares one connection per instrument
         print "Connected to "+ self.get_device_ID()  # gets the device of the telnet device, makes sure its the right one
 
     def __del__(self):
-        self.tn.close()
+        self.tn.release()  # Closes the connection once no other driver is using it
         print "Closed connection to "+ self.DeviceID
 
     def _telnet_query(self, message):
@@ -26,8 +26,10 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
         Returns:
             str: Reply message from the device
         """
-        self._telnet_write(message)
-        return self._telnet_read()
+        with self.tn.lock:  # Stops another driver on the same instrument writing before the reply is read
+            with Instrument_Transport.timed("telnet query", "MC_RC4DAT6G95_Prog_Atten"):
+                self._telnet_write(message)
+                return self._telnet_read()
 
     def _telnet_write(self, message):
         """Private method that will send a message over telnet to the device
@@ -116,3 +118,32 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
         reply = self._telnet_query(":CHAN:"+channel+":Att?")
         return float(reply)
 
+    def set_all_channels(self, a, b, c, d):
+        """Sets the attenuation of all four channels in one transaction
+
+        The set command and the ATT? readback are sent together before either reply is
+        read, so both are answered in a single round trip to the device.
+
+        Args:
+            a (float): Attenuation of channel A in dB
+            b (float): Attenuation of channel B in dB
+            c (float): Attenuation of channel C in dB
+            d (float): Attenuation of channel D in dB
+
+        Returns:
+            float list: The attenuation of each channel read back from the device
+        """
+        for attenuation in (a, b, c, d):
+            self._check_attenuation(attenuation)
+        message = ":SetAttPerChan:1:" + str(a) + "_2:" + str(b) + "_3:" + str(c) + "_4:" + str(d)
+        with self.tn.lock:  # Keeps the set and the readback together
+            with Instrument_Transport.timed("telnet query", "MC_RC4DAT6G95_Prog_Atten"):
+                self._telnet_write(message)
+                self._telnet_write("ATT?")  # Sent before the set is answered, so there is one round trip
+                set_reply = self._telnet_read()
+                replies = self._telnet_read()
+        if set_reply != "1":  # The device answers 1 once every channel has been set
+            raise Exception("Attenuation not set, the device replied " + set_reply)
+        replies = replies.split()
+        replies = map(float, replies)
+        return replies
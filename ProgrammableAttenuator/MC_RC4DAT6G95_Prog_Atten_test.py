@@ -0,0 +1,57 @@
+import unittest
+from mock import patch
+import ProgrammableAttenuator
+
+
+def mocked_atten_replies(message):
+    if message == "MN?":
+        return "MN=RC4DAT-6G-95"
+    elif message == "ATT?":
+        return "10.00 20.25 30.00 40.00"
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_query", side_effect=mocked_atten_replies)
+    @patch("telnetlib.Telnet")
+    def setUp(self, mock_telnet, mock_telnet_query):
+        # Stuff you run before each test
+        self.Atten_test_inst = ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten("0", 0, 0)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        del self.Atten_test_inst  # Releases the transport, so the next test opens a new one
+
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_read", side_effect=["1", "10.00 20.25 30.00 40.00"])
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_write")
+    def test_set_all_channels_sends_set_and_readback_together(self, mock_telnet_write, mock_telnet_read):
+        self.assertEqual(self.Atten_test_inst.set_all_channels(10, 20.3, 30, 40), [10.0, 20.25, 30.0, 40.0])
+        self.assertEqual(mock_telnet_write.call_args_list,
+                         [((":SetAttPerChan:1:10_2:20.3_3:30_4:40",),), (("ATT?",),)])
+        self.assertEqual(mock_telnet_read.call_count, 2)  # Both replies are read after both commands are sent
+
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_read", side_effect=["0", "0.00 0.00 0.00 0.00"])
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_write")
+    def test_set_all_channels_if_device_refuses(self, mock_telnet_write, mock_telnet_read):
+        self.assertRaises(Exception, self.Atten_test_inst.set_all_channels, 10, 20, 30, 40)
+
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_write")
+    def test_set_all_channels_if_invalid_input_used(self, mock_telnet_write):
+        self.assertRaises(TypeError, self.Atten_test_inst.set_all_channels, "10", 20, 30, 40)
+        self.assertRaises(ValueError, self.Atten_test_inst.set_all_channels, 10, 96, 30, 40)
+        self.assertRaises(ValueError, self.Atten_test_inst.set_all_channels, 10, 20, 30, -1)
+        self.assertFalse(mock_telnet_write.called)  # Nothing is sent unless every value is valid
+
+    @patch("ProgrammableAttenuator.MC_RC4DAT6G95_Prog_Atten._telnet_query", side_effect=mocked_atten_replies)
+    def test_get_global_attenuation(self, mock_telnet_query):
+        self.assertEqual(self.Atten_test_inst.get_global_attenuation(), [10.0, 20.25, 30.0, 40.0])
+        mock_telnet_query.assert_called_with("ATT?")
+
+if __name__ == "__main__":
+    unittest.main()
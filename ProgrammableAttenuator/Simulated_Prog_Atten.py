@@ -1,12 +1,14 @@
-from ProgrammableAttenuator import *
+from Generic_Prog_Atten import *
 import telnetlib
 from pkg_resources import require
 require("numpy")
 import numpy as np
+import Instrument_Transport
 
 class Simulated_Prog_Atten(Generic_Prog_Atten):
 
-    def __init__(self, ipaddress, port, timeout):
+    def __init__(self, ipaddress, port, timeout, timing=None):
+        self.timing = timing  # How long the virtual device takes to respond, None to respond straight away
         self.A = 0
         self.B = 0
         self.C = 0
@@ -33,22 +35,36 @@ class Simulated_Prog_Atten(Generic_Prog_Atten):
             raise TypeError
 
     def get_device_ID(self):
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return "Simulated programmable attenuator device"
 
     def set_global_attenuation(self, attenuation):
         self._check_attenuation(attenuation)
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.A = attenuation
         self.B = attenuation
         self.C = attenuation
         self.D = attenuation
 
+    def set_all_channels(self, a, b, c, d):
+        for attenuation in (a, b, c, d):
+            self._check_attenuation(attenuation)
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
+        self.A = a
+        self.B = b
+        self.C = c
+        self.D = d
+        return self.get_global_attenuation()
+
     def get_global_attenuation(self):
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return (self.A, self.B, self.C, self.D)
 
     def set_channel_attenuation(self, channel, attenuation):
 
         self._check_attenuation(attenuation)
         self._check_channel(channel)
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
 
         if channel.upper() == "A":
             self.A = attenuation
@@ -61,6 +77,7 @@ class Simulated_Prog_Atten(Generic_Prog_Atten):
 
     def get_channel_attenuation(self, channel):
         self._check_channel(channel)
+        Instrument_Transport.simulated_delay(self.timing, "command")
         if channel.upper() == "A":
             return self.A
         elif channel.upper() == "B":
@@ -0,0 +1,33 @@
+import unittest
+from Simulated_Prog_Atten import *
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.AttenSim = Simulated_Prog_Atten("0", 0, 0)
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    def test_set_all_channels(self):
+        self.assertEqual(self.AttenSim.set_all_channels(10, 20.5, 30, 40), (10, 20.5, 30, 40))
+        self.assertEqual(self.AttenSim.get_global_attenuation(), (10, 20.5, 30, 40))
+        self.assertEqual(self.AttenSim.get_channel_attenuation("B"), 20.5)
+
+    def test_set_all_channels_if_invalid_input_used(self):
+        self.assertRaises(TypeError, self.AttenSim.set_all_channels, "10", 20, 30, 40)
+        self.assertRaises(ValueError, self.AttenSim.set_all_channels, 10, 96, 30, 40)
+        self.assertRaises(ValueError, self.AttenSim.set_all_channels, 10, 20, 30, -1)
+        self.assertEqual(self.AttenSim.get_global_attenuation(), (0, 0, 0, 0))  # Nothing set unless every value is valid
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,2 +1,7 @@
 from Generic_Prog_Atten import *
-from MC_RC4DAT6G95_Prog_Atten import *
+import Instrument_Transport
+
+# Drivers are only imported when they are first used
+Instrument_Transport.lazy_package(__name__, {
+    "MC_RC4DAT6G95_Prog_Atten": "MC_RC4DAT6G95_Prog_Atten",
+    "Simulated_Prog_Atten": "Simulated_Prog_Atten"})
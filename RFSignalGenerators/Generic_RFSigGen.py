@@ -1,11 +1,15 @@
 from abc import ABCMeta, abstractmethod
+from pkg_resources import require
+require("numpy")
+import numpy as np
 
 class Generic_RFSigGen():
     """Generic RF signal generator class used for hardware abstraction.
     
     All of the methods listed here are abstract and will be overridden by child classes, 
     this will abstract hardware as the methods here are called, but the functionality is 
-    implemented by the individual children.
+    implemented by the individual children. The power sweep methods have a default that 
+    steps the sweep in software, children with a hardware sweep engine can override them.
 
     Attributes:
         Output_Power (float/str): The output power of the RF SigGen. As a float default units will be 
@@ -21,6 +25,8 @@ class Generic_RFSigGen():
     Frequency = "0DBM"
     Output_State = False
     DeviceID = 'Abstract Device Class'
+    sweep_powers = None
+    sweep_index = -1
 
     def _split_num_char(self, s):
         """Private method to split up a numeric and characters. 
@@ -161,7 +167,57 @@ class Generic_RFSigGen():
         """
         pass
 
+    def setup_power_sweep(self, powers, dwell_time=0):
+        """Method that loads a list of output powers to be stepped through.
 
+        The default implementation only stores the list, each call to next_sweep_point will then
+        set the next power with set_output_power. Powers above the output limit are capped.
 
+        Args:
+            powers (float list): Output powers to step through in dBm.
+            dwell_time (float): Minimum time in seconds spent at each point, used by hardware
+                sweep engines.
+        Returns:
+            int: The number of points in the sweep.
+        """
+        powers = np.asarray(powers)
+        # checks the powers and dwell time are numerics
+        if powers.ndim != 1 or len(powers) == 0 or not np.issubdtype(powers.dtype, np.number):
+            raise TypeError
+        elif type(dwell_time) != float and type(dwell_time) != int and np.float64 != np.dtype(dwell_time):
+            raise TypeError
+        elif dwell_time < 0:
+            raise ValueError
+
+        self.sweep_powers = powers.astype(float)
+        self.sweep_index = -1  # Nothing has been output yet
+        return len(self.sweep_powers)
+
+    def next_sweep_point(self):
+        """Method that steps the power sweep on to its next point.
+
+        Args:
 
+        Returns:
+            float: The current power value as a float in dBm.
+            str: The current output power concatenated with the units.
+        """
+        if self.sweep_powers is None:
+            raise Exception("No power sweep has been set up")
+        elif self.sweep_index + 1 >= len(self.sweep_powers):
+            raise Exception("Power sweep has already finished")
+        self.sweep_index += 1
+        return self.set_output_power(self.sweep_powers[self.sweep_index])
 
+    def stop_power_sweep(self):
+        """Method that ends the power sweep.
+
+        The output is left at the last power that was stepped to.
+
+        Args:
+
+        Returns:
+
+        """
+        self.sweep_powers = None
+        self.sweep_index = -1
@@ -1,5 +1,5 @@
 from Generic_RFSigGen import *
-import telnetlib
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
 import numpy as np
@@ -11,8 +11,18 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
     This class is for communicating with the Rigol3030 over telnet. The specific API calls abstract the SCPI 
     commands needed to speak with the instrument. Each of these calls is an override of the Generic_RFSigGen.
 
+    The last commanded values are kept in a shadow state so that getters, and the readback at the end of
+    each setter, can be answered without a round trip. How often the instrument is actually asked is set
+    by verify_every, the shadow state can also be checked against the instrument with verify_state.
+
     Attributes:  
         *Inherited from parent.
+        verify_every (int): 1 to check every call with the instrument, N to check every Nth call, 
+            0 to only check when verify_state is called. 
+        shadow_state (dict): Last known "power", "frequency", "output" and "limit" values, in the 
+            form the getters return them. 
+        hardware_sweep (bool): True if the current power sweep runs on the instrument's step 
+            sweep engine, False if it is stepped in software.
     """
 
     #Private Methods
@@ -25,8 +35,10 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         Returns:
             str: Reply message from the Rigol3030
         """
-        self._telnet_write(message)
-        return self._telnet_read()
+        with self.tn.lock:  # Stops another driver on the same instrument writing before the reply is read
+            with Instrument_Transport.timed("telnet query", "Rigol3030DSG_RFSigGen"):
+                self._telnet_write(message)
+                return self._telnet_read()
 
     def _telnet_write(self, message):
         """Private method that will send a message over telnet to the Rigol3030 
@@ -53,21 +65,57 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         """
         return self.tn.read_until("\n", self.timeout).rstrip('\n')  # Telnet reply, with termination chars removed
 
+    def _update_output_state(self, reply):
+        """Private method that records the output state from an "OUTP?" reply
+
+        Args:
+            reply (str): Reply to the "OUTP?" query
+
+        Returns:
+            bool: Returns True if the output is enabled, False if it is not.
+        """
+        if reply == "1":
+            self.Output_State = True  # output must be on
+        else:
+            self.Output_State = False  # output must be off
+        return self.Output_State
+
+    def _verify_now(self):
+        """Private method that decides if a call should be checked with the instrument
+
+        Args:
+
+        Returns:
+            bool: True if the instrument should be queried, False if the shadow state can be used
+        """
+        self._calls += 1
+        return self.verify_every > 0 and self._calls % self.verify_every == 0
+
     #Constructor and Deconstructor
 
-    def __init__(self, ipaddress, port = 5555, timeout = 1, limit=-40):
+    def __init__(self, ipaddress, port = 5555, timeout = 1, limit=-40, verify_every=1):
         """Initialises and opens the connection to the Rigol3030 over telnet and informs the user 
 
         Args:
             ipaddress (str): The IP address of the Rigol3030 
             port (int/str): The port number for the messages to be sent on (default 5555)
             timeout (float): The timeout for telnet commands in seconds (default 1)
+            verify_every (int): 1 to check every call with the instrument, N to check every Nth
+                call, 0 to only check when verify_state is called (default 1)
             
         Returns:
             
         """
+        if type(verify_every) != int:
+            raise TypeError
+        elif verify_every < 0:
+            raise ValueError
+        self.verify_every = verify_every
+        self.shadow_state = {}  # Nothing is known about the instrument yet
+        self._calls = 0  # Number of calls made, used to decide when to verify
+        self.hardware_sweep = False  # True when a sweep has been loaded into the sweep engine
         self.timeout = timeout  # timeout for the telnet comms
-        self.tn = telnetlib.Telnet(ipaddress, port, self.timeout)  # connects to the telnet device
+        self.tn = Instrument_Transport.get_transport(ipaddress, port, self.timeout)  # Shares one connection per instrument
         self.get_device_ID()  # gerts the device of the telnet device, makes sure its the right one
         self.turn_off_RF()  # turn off the RF output
         self.set_output_power_limit(limit)  # set the RF output limit
@@ -77,8 +125,10 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
     def __del__(self):
         """Closes the telnet connection to the Rigol3030
         """
+        if not hasattr(self, "tn"):
+            return  # the constructor failed before a connection was opened
         self.turn_off_RF()  # make sure the RF output if off
-        self.tn.close()  # close the telnet link
+        self.tn.release()  # Closes the connection once no other driver is using it
         print("Closed connection to " + self.DeviceID)  # tell the user the telnet link has closed
 
     #API Calls
@@ -101,6 +151,7 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         """Override method that will return the output power.
         
         Uses the "commands LEV?" amd "UNIT:POW?" to get the current output power level and units. 
+        The shadow state is returned instead if this call does not need verifying.
         
         Args:
         
@@ -108,14 +159,21 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
             float: The current power value as a float in dBm
             str: The current output power concatenated with the units.
         """
+        if "power" in self.shadow_state and not self._verify_now():
+            return self.shadow_state["power"]
 
-        self.Output_Power = self._telnet_query("LEV?") + self._telnet_query("UNIT:POW?")  # get the power & power units
-        return float(self._split_num_char(self.Output_Power)[0]), self.Output_Power
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.query("LEV?")  # get the power
+            batch.query("UNIT:POW?")  # get the power units
+        self.Output_Power = batch.replies[0] + batch.replies[1]
+        self.shadow_state["power"] = float(self._split_num_char(self.Output_Power)[0]), self.Output_Power
+        return self.shadow_state["power"]
 
     def get_frequency(self):
         """Override method that will get the output frequency of the SigGen
         
-        Uses the SCPI command "FREQ?" to get the set frequency. 
+        Uses the SCPI command "FREQ?" to get the set frequency. The shadow state is returned 
+        instead if this call does not need verifying.
         
         Args:
         
@@ -123,14 +181,18 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
             float: The current frequency value as a float and assumed units. 
             str: The current output frequency concatenated with the units.
         """
+        if "frequency" in self.shadow_state and not self._verify_now():
+            return self.shadow_state["frequency"]
 
         self.Frequency = self._telnet_query("FREQ?")  # get the device frequency
-        return float(self._split_num_char(self.Frequency)[0]), self.Frequency
+        self.shadow_state["frequency"] = float(self._split_num_char(self.Frequency)[0]), self.Frequency
+        return self.shadow_state["frequency"]
 
     def set_frequency(self, frequency):
         """Override method that will set the output frequency.
         
-        SCPI command "FREQ" is used to set the output frequency level. 
+        SCPI command "FREQ" is used to set the output frequency level. The frequency is read 
+        back in the same message if this call needs verifying.
         
         Args:
             frequency (float): Desired value of the output frequency in MHz.
@@ -145,15 +207,23 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         elif frequency < 0:
             raise ValueError
 
-        self.Frequency = frequency
-        self._telnet_write("FREQ " + str(self.Frequency) + "MHz")  # Write the frequency value in MHz
-        return self.get_frequency()
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("FREQ " + str(frequency) + "MHz")  # Write the frequency value in MHz
+            if self._verify_now():
+                batch.query("FREQ?")  # read back the frequency in the same message
+        if batch.replies:
+            self.Frequency = batch.replies[0]
+        else:
+            self.Frequency = str(frequency) + "MHz"  # Trust the commanded value
+        self.shadow_state["frequency"] = float(self._split_num_char(self.Frequency)[0]), self.Frequency
+        return self.shadow_state["frequency"]
 
     def set_output_power(self, power):
         """Override method that will set the output power.
         
         The SCPI command "UNIT:POW" is used to set the units of the power output, then the 
-        command "LEV" is used to set the output level in those units. 
+        command "LEV" is used to set the output level in those units. The power is read back 
+        in the same message if this call needs verifying.
 
         Args:
             power (float): Desired value of the output power in dBm.  
@@ -168,11 +238,38 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
             power = self.limit
             # tell the user the limit has been reached and cap the output level
             warnings.warn('Power limit has been reached, output will be capped')
-        self.Output_Power = power
 
-        self._telnet_write("UNIT:POW dBm")  # make sure the units are dBm
-        self._telnet_write("LEV " + str(power))  # write the new output power
-        return self.get_output_power()
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("UNIT:POW dBm")  # make sure the units are dBm
+            batch.write("LEV " + str(power))  # write the new output power
+            if self._verify_now():
+                batch.query("LEV?")  # read back the power and units in the same message
+                batch.query("UNIT:POW?")
+        if batch.replies:
+            self.Output_Power = batch.replies[0] + batch.replies[1]
+        else:
+            self.Output_Power = str(power) + "DBM"  # Trust the commanded value
+        self.shadow_state["power"] = float(self._split_num_char(self.Output_Power)[0]), self.Output_Power
+        return self.shadow_state["power"]
+
+    def _set_output(self, state):
+        """Private method that turns the output on or off
+
+        Args:
+            state (str): "ON" or "OFF"
+        Returns:
+            bool: Returns True if the output is enabled, False if it is not. 
+        """
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("OUTP " + state)  # turns the output on or off
+            if self._verify_now():
+                batch.query("OUTP?")  # checks the output state in the same message
+        if batch.replies:
+            self.shadow_state["output"] = self._update_output_state(batch.replies[0])
+        else:
+            self.Output_State = state == "ON"  # Trust the commanded state
+            self.shadow_state["output"] = self.Output_State
+        return self.shadow_state["output"]
 
     def turn_on_RF(self):
         """Override method that will turn on the RF device output.
@@ -184,8 +281,7 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         Returns:
             bool: Returns True if the output is enabled, False if it is not. 
         """
-        self._telnet_write("OUTP ON")  # turns on the output
-        return self.get_output_state()
+        return self._set_output("ON")
 
     def turn_off_RF(self):
         """Override method that will turn off the RF device output.
@@ -197,27 +293,24 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         Returns:
             bool: Returns True if the output is enabled, False if it is not.
         """
-        self._telnet_write("OUTP OFF")  # turns off the output
-        return self.get_output_state()
+        return self._set_output("OFF")
 
     def get_output_state(self):
         """Override method that will get the current output state. 
     
         This method send the SCPI command "OUTP?" to request the output state from
-        the Rigol3030. 
+        the Rigol3030. The shadow state is returned instead if this call does not need 
+        verifying.
         
         Args:
         
         Returns:
             bool: Returns True if the output is enabled, False if it is not. 
         """
-        # checks output state
-        if self._telnet_query("OUTP?") == "1":
-            self.Output_State = True  # output must be on
-            return True
-        else:
-            self.Output_State = False  # output must be off
-            return False
+        if "output" in self.shadow_state and not self._verify_now():
+            return self.shadow_state["output"]
+        self.shadow_state["output"] = self._update_output_state(self._telnet_query("OUTP?"))  # checks output state
+        return self.shadow_state["output"]
 
     def set_output_power_limit(self, limit):
         """Override method that will set a hardware limit for the output power
@@ -230,19 +323,155 @@ class Rigol3030DSG_RFSigGen(Generic_RFSigGen):
         # checks the input is a numeric
         if type(limit) != float and type(limit) != int and np.float64 != np.dtype(limit):
             raise TypeError
-        self.limit = limit
-        self._telnet_write("UNIT:POW dBm")  # makes sure the limit units are in dBm
-        self._telnet_write("LEV:LIM "+ str(limit))  # sets the output level
-        return self.get_output_power_limit()
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("UNIT:POW dBm")  # makes sure the limit units are in dBm
+            batch.write("LEV:LIM "+ str(limit))  # sets the output level
+            if self._verify_now():
+                batch.query("LEV:LIM?")  # reads back the limit and the units in the same message
+                batch.query("UNIT:POW?")
+        if batch.replies:
+            self.limit = float(batch.replies[0])
+            self.shadow_state["limit"] = self.limit, batch.replies[0] + batch.replies[1]
+        else:
+            self.limit = limit  # Trust the commanded value
+            self.shadow_state["limit"] = self.limit, str(limit) + "DBM"
+        return self.shadow_state["limit"]
 
     def get_output_power_limit(self):
         """Override method that will get the hardware limit for the output power
         
+        The shadow state is returned instead if this call does not need verifying.
+
         Args:
 
         Returns:
             float: The power limit 
         """
-        self.limit = float(self._telnet_query("LEV:LIM?"))  # gets the output limit
-        str_limit = self._telnet_query("LEV:LIM?") + self._telnet_query("UNIT:POW?")  # gets the limit and the units
-        return self.limit, str_limit
\ No newline at end of file
+        if "limit" in self.shadow_state and not self._verify_now():
+            return self.shadow_state["limit"]
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.query("LEV:LIM?")  # gets the output limit
+            batch.query("UNIT:POW?")  # gets the units
+        self.limit = float(batch.replies[0])
+        self.shadow_state["limit"] = self.limit, batch.replies[0] + batch.replies[1]
+        return self.shadow_state["limit"]
+
+    def verify_state(self):
+        """Checks the shadow state against the instrument
+
+        Everything in the shadow state is read back from the instrument in one message. 
+        Any value that does not match what was commanded raises a warning, and the shadow 
+        state is updated to what the instrument reports. 
+
+        Args:
+
+        Returns:
+            bool: True if the instrument matched the shadow state, False if it did not
+        """
+        expected = dict(self.shadow_state)
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.query("LEV?")
+            batch.query("UNIT:POW?")
+            batch.query("FREQ?")
+            batch.query("OUTP?")
+            batch.query("LEV:LIM?")
+        self.Output_Power = batch.replies[0] + batch.replies[1]
+        self.Frequency = batch.replies[2]
+        self.limit = float(batch.replies[4])
+        self.shadow_state = {
+            "power": (float(self._split_num_char(self.Output_Power)[0]), self.Output_Power),
+            "frequency": (float(self._split_num_char(self.Frequency)[0]), self.Frequency),
+            "output": self._update_output_state(batch.replies[3]),
+            "limit": (self.limit, batch.replies[4] + batch.replies[1])}
+
+        matched = True
+        for key in expected:
+            if key == "output":
+                same = expected[key] == self.shadow_state[key]
+            else:
+                same = np.isclose(expected[key][0], self.shadow_state[key][0])  # Compare the numeric values
+            if not same:
+                matched = False
+                warnings.warn('RF source ' + key + ' does not match the commanded value')
+        return matched
+
+    def setup_power_sweep(self, powers, dwell_time=0):
+        """Override method that loads a list of output powers to be stepped through.
+
+        Evenly spaced power lists are loaded into the Rigol3030 level step sweep, with each point 
+        advanced by a bus trigger ("*TRG"). Lists that are not evenly spaced, or that go above the 
+        output limit, are stepped in software by the parent class.
+
+        Args:
+            powers (float list): Output powers to step through in dBm.
+            dwell_time (float): Minimum time in seconds spent at each point.
+        Returns:
+            int: The number of points in the sweep.
+        """
+        points = Generic_RFSigGen.setup_power_sweep(self, powers, dwell_time)  # checks and stores the list
+        steps = np.diff(self.sweep_powers)
+        self.hardware_sweep = (points > 1 and np.allclose(steps, steps[0])
+                               and np.all(self.sweep_powers <= self.limit))
+        if not self.hardware_sweep:
+            return points
+
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            batch.write("UNIT:POW dBm")  # make sure the sweep levels are in dBm
+            batch.write("SWE:MODE SING")  # run through the list once
+            batch.write("SWE:STAT LEV")  # sweep the output level only
+            batch.write("SWE:TYPE STEP")  # evenly spaced steps between start and stop
+            batch.write("SWE:STEP:STAR:LEV " + str(self.sweep_powers[0]))
+            batch.write("SWE:STEP:STOP:LEV " + str(self.sweep_powers[-1]))
+            batch.write("SWE:STEP:POIN " + str(points))
+            batch.write("SWE:STEP:DWEL " + str(dwell_time) + "s")
+            batch.write("SWE:POIN:TRIG:TYPE BUS")  # each point waits for a "*TRG"
+        return points
+
+    def next_sweep_point(self):
+        """Override method that steps the power sweep on to its next point.
+
+        The first call starts the sweep with "SWE:EXEC", which outputs the first point, after 
+        that each call sends "*TRG". The level is queried in the same message, so the call 
+        waits for the instrument to take the step and the power it reports is returned.
+
+        Args:
+
+        Returns:
+            float: The current power value as a float in dBm.
+            str: The current output power concatenated with the units.
+        """
+        if not self.hardware_sweep:
+            return Generic_RFSigGen.next_sweep_point(self)
+        elif self.sweep_index + 1 >= len(self.sweep_powers):
+            raise Exception("Power sweep has already finished")
+
+        self.sweep_index += 1
+        with Instrument_Transport.SCPI_Batch(self) as batch:
+            if self.sweep_index == 0:
+                batch.write("SWE:EXEC")  # start the sweep at the first point
+            else:
+                batch.write("*TRG")  # step on to the next point
+            batch.query("LEV?")  # get the power the step has set
+            batch.query("UNIT:POW?")  # get the power units
+        self.Output_Power = batch.replies[0] + batch.replies[1]
+        self.shadow_state["power"] = float(self._split_num_char(self.Output_Power)[0]), self.Output_Power
+        return self.shadow_state["power"]
+
+    def stop_power_sweep(self):
+        """Override method that ends the power sweep.
+
+        The sweep engine is turned off and the output level is set to the last point, so the 
+        output stays where the sweep left it.
+
+        Args:
+
+        Returns:
+
+        """
+        if self.hardware_sweep:
+            with Instrument_Transport.SCPI_Batch(self) as batch:
+                batch.write("SWE:STAT OFF")  # turn off the sweep engine
+                if self.sweep_index >= 0:
+                    batch.write("LEV " + str(self.sweep_powers[self.sweep_index]))  # hold the last point
+            self.hardware_sweep = False
+        Generic_RFSigGen.stop_power_sweep(self)
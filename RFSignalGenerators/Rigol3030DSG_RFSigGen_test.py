@@ -13,6 +13,16 @@ frequency = "499.6817682MHz"
 
 def mocked_rigol_replies(input):
     global output, power_units, power, frequency
+    if ";" in input:
+        # Batched message, handle each command in turn and join the answers to the queries
+        replies = []
+        for command in input.split(";"):
+            command = command.lstrip(":")
+            if "?" in command:
+                replies.append(mocked_rigol_replies(command))
+            else:
+                mocked_rigol_writes(command)
+        return ";".join(replies)
     if input == "LEV?":
         return power
     elif input == "UNIT:POW?":
@@ -28,6 +38,9 @@ def mocked_rigol_replies(input):
 
 def mocked_rigol_writes(input):
     global output, power_units, power, frequency
+    if ";" in input:
+        for command in input.split(";"):
+            mocked_rigol_writes(command.lstrip(":"))
     if input == "OUTP OFF":
         output = "0"
     elif input == "OUTP ON":
@@ -49,12 +62,16 @@ class ExpectedDataTest(unittest.TestCase):
     @patch("telnetlib.Telnet")
     def setUp(self, mock_telnet, mock_telnet_read, mock_telnet_write):
         # Stuff you run before each test
+        global output
         self.RF_test_inst = RFSignalGenerators.Rigol3030DSG_RFSigGen("0", 0, 0)
+        output = "1"  # The constructor turns the output off, so start each test with it back on
         unittest.TestCase.setUp(self)
 
-    def tearDown(self):
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write")
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def tearDown(self, mock_telnet_query, mock_telnet_write):
         # Stuff you want to run after each test
-        pass
+        del self.RF_test_inst  # Releases the transport, so the next test opens a new one
 
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write")
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_read")
@@ -63,8 +80,8 @@ class ExpectedDataTest(unittest.TestCase):
         self.assertRaises(TypeError, self.RF_test_inst.set_frequency, "100")
 
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write")
-    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_read")
-    def test_set_power_if_invalid_input_types_used(self, mock_telnet_read, mock_telnet_write):
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def test_set_power_if_invalid_input_types_used(self, mock_telnet_query, mock_telnet_write):
         self.assertRaises(TypeError, self.RF_test_inst.set_output_power, "0")
         self.assertWarns(UserWarning, self.RF_test_inst.set_output_power, -39)
 
@@ -92,13 +109,13 @@ class ExpectedDataTest(unittest.TestCase):
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
     def test_turn_off_output_state(self, mock_telnet_query, mock_telnet_write):
         self.assertEqual(self.RF_test_inst.turn_off_RF(), False)
-        self.assertTrue(mock_telnet_write.called)
+        mock_telnet_query.assert_called_with("OUTP OFF;:OUTP?")
 
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
     def test_turn_on_output_state(self, mock_telnet_query, mock_telnet_write):
         self.assertEqual(self.RF_test_inst.turn_on_RF(), True)
-        self.assertTrue(mock_telnet_write.called)
+        mock_telnet_query.assert_called_with("OUTP ON;:OUTP?")
 
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
     @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
@@ -110,6 +127,77 @@ class ExpectedDataTest(unittest.TestCase):
     def test_get_output_power_limit(self, mock_telnet_query, mock_telnet_write):
         self.assertEqual(self.RF_test_inst.get_output_power_limit(), (-40, "-40.00DBM"))
 
+    ################################Shadow state################################
+    def test_verify_every_if_invalid_input_types_used(self):
+        self.assertRaises(TypeError, RFSignalGenerators.Rigol3030DSG_RFSigGen, "0", 0, 0, -40, 1.5)
+        self.assertRaises(ValueError, RFSignalGenerators.Rigol3030DSG_RFSigGen, "0", 0, 0, -40, -1)
+
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def test_shadow_state_answers_without_query(self, mock_telnet_query, mock_telnet_write):
+        self.RF_test_inst.verify_every = 0
+        self.assertEqual(self.RF_test_inst.set_frequency(500), (500.0, "500MHz"))
+        self.assertEqual(self.RF_test_inst.get_frequency(), (500.0, "500MHz"))
+        self.assertEqual(self.RF_test_inst.turn_on_RF(), True)
+        self.assertEqual(self.RF_test_inst.get_output_state(), True)
+        self.assertFalse(mock_telnet_query.called)
+
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def test_shadow_state_verified_every_nth_call(self, mock_telnet_query, mock_telnet_write):
+        self.RF_test_inst.verify_every = 3
+        self.RF_test_inst._calls = 0
+        for i in range(6):
+            self.RF_test_inst.get_output_state()
+        self.assertEqual(mock_telnet_query.call_count, 2)
+
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def test_verify_state_warns_on_mismatch(self, mock_telnet_query, mock_telnet_write):
+        self.RF_test_inst.verify_every = 0
+        self.RF_test_inst.set_frequency(500)  # The mocked instrument still reports 499.6817682MHz
+        self.assertWarns(UserWarning, self.RF_test_inst.verify_state)
+        self.assertEqual(self.RF_test_inst.get_frequency(), (499.6817682, "499.6817682MHz"))
+        self.assertEqual(self.RF_test_inst.verify_state(), True)
+
+    ################################Power sweep################################
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def test_power_sweep_uses_step_sweep_engine(self, mock_telnet_query, mock_telnet_write):
+        self.assertEqual(self.RF_test_inst.setup_power_sweep([-100, -90, -80], 0.1), 3)
+        self.assertTrue(self.RF_test_inst.hardware_sweep)
+        message = mock_telnet_write.call_args[0][0]
+        self.assertIn("SWE:STEP:STAR:LEV -100.0", message)
+        self.assertIn("SWE:STEP:STOP:LEV -80.0", message)
+        self.assertIn("SWE:STEP:POIN 3", message)
+        self.assertIn("SWE:POIN:TRIG:TYPE BUS", message)
+
+        mock_telnet_query.side_effect = ["-100.00;DBM", "-90.00;DBM", "-80.00;DBM"]
+        self.assertEqual(self.RF_test_inst.next_sweep_point(), (-100.0, "-100.00DBM"))
+        mock_telnet_query.assert_called_with("SWE:EXEC;:LEV?;:UNIT:POW?")
+        self.assertEqual(self.RF_test_inst.next_sweep_point(), (-90.0, "-90.00DBM"))
+        mock_telnet_query.assert_called_with("*TRG;:LEV?;:UNIT:POW?")
+        self.RF_test_inst.next_sweep_point()
+        self.assertRaises(Exception, self.RF_test_inst.next_sweep_point)
+
+        self.RF_test_inst.stop_power_sweep()
+        mock_telnet_write.assert_called_with("SWE:STAT OFF;:LEV -80.0")
+        self.assertFalse(self.RF_test_inst.hardware_sweep)
+
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_write", side_effect=mocked_rigol_writes)
+    @patch("RFSignalGenerators.Rigol3030DSG_RFSigGen._telnet_query", side_effect=mocked_rigol_replies)
+    def test_power_sweep_uneven_list_stepped_in_software(self, mock_telnet_query, mock_telnet_write):
+        self.RF_test_inst.setup_power_sweep([-100, -90, -50])
+        self.assertFalse(self.RF_test_inst.hardware_sweep)
+        self.RF_test_inst.next_sweep_point()
+        mock_telnet_query.assert_called_with("UNIT:POW dBm;:LEV -100.0;:LEV?;:UNIT:POW?")
+
+    def test_power_sweep_if_invalid_input_types_used(self):
+        self.assertRaises(TypeError, self.RF_test_inst.setup_power_sweep, ["-100", "-90"])
+        self.assertRaises(TypeError, self.RF_test_inst.setup_power_sweep, [])
+        self.assertRaises(ValueError, self.RF_test_inst.setup_power_sweep, [-100, -90], -1)
+        self.assertRaises(Exception, self.RF_test_inst.next_sweep_point)
+
     def assertWarns(self, warning, callable, *args, **kwds):
         with warnings.catch_warnings(record=True) as warning_list:
             warnings.simplefilter('always')
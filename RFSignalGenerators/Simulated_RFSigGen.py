@@ -3,6 +3,7 @@ from pkg_resources import require
 require("numpy")
 import numpy as np
 import warnings
+import Instrument_Transport
 
 class CustomException(Exception):
     pass
@@ -13,19 +14,25 @@ class Simulated_RFSigGen(Generic_RFSigGen):
     This class is for simulating an RF signal generator device. It is designed 
     to override all of the abstract methods in it's parent. 
 
+    If it is given a timing profile, each command takes as long as it would on a real
+    RF source, and changes to the output wait for it to settle.
+
     Attributes:
         *Inherited from parent.
+        timing (Timing_Profile): How long the device takes to answer and settle, None to answer straight away
     """
 
     # Constructor and Deconstructor.
-    def __init__(self, limit = -40):
+    def __init__(self, limit = -40, timing=None):
         """Informs the user when the simulated device has been created in memory.
         
         The simulated device for the RF sig gen does not need any arguments. It's main 
         purpose is to repeat values that have been given to it with the 'set' methods. 
         
         Args:
-            
+            limit (float): Highest output power allowed in dBm
+            timing (Timing_Profile): How long the device takes to answer and settle, None 
+                to answer straight away
         Returns:
         
         """
@@ -34,6 +41,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         self.Frequency = 0  # Default frequency is zero
         self.Output_State = False  # Default output state is off/False
         self.limit = limit  # Sets the limit of the device
+        self.timing = timing  # How long the virtual device takes to respond
         print("Constructed " + self.DeviceID)
 
     def __del__(self):
@@ -59,6 +67,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         Returns:
             str: The DeviceID of the SigGen.
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.DeviceID  # Gets the device ID
 
     def get_output_power(self):
@@ -70,6 +79,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
             str: The current output power concatenated with the units.
             float: The current power value as a float and assumed units. 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.Output_Power, str(self.Output_Power) + "dBm"  # Gets the output power
 
     def set_output_power(self, power):
@@ -91,6 +101,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
             # Warns the user the limit has been reached
             warnings.warn('Power limit has been reached, output will be capped')
 
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.Output_Power = power # Sets the virtual output power
         return self.get_output_power()
 
@@ -103,6 +114,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
             str: The current output frequency concatenated with the units.
             float: The current frequency value as a float and assumed units. 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.Frequency, str(self.Frequency)+"MHz"  # Gets the virtual frequency
 
     def set_frequency(self,frequency):
@@ -122,6 +134,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         elif frequency < 0:
             raise ValueError
 
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.Frequency = frequency  # Sets the virtual frequency
         return self.get_frequency()
 
@@ -133,6 +146,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         Returns:
             bool: Returns True if the output is enabled, False if it is not. 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.Output_State = True  # Sets the virtual output state to on
         return self.Output_State
 
@@ -144,6 +158,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         Returns:
             bool: Returns True if the output is enabled, False if it is not.
         """
+        Instrument_Transport.simulated_delay(self.timing, "command", "settle")
         self.Output_State = False  # Sets the virtual output state to off
         return self.Output_State
 
@@ -155,6 +170,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         Returns:
             bool: Returns True if the output is enabled, False if it is not. 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.Output_State
 
     def set_output_power_limit(self, limit):
@@ -168,6 +184,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         # checks if the input is a numeric
         if type(limit) != float and type(limit) != int and np.float64 != np.dtype(limit):
             raise TypeError
+        Instrument_Transport.simulated_delay(self.timing, "command")
         self.limit = limit  # Sets the virtual output limit
         return self.get_output_power_limit()
 
@@ -179,5 +196,6 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         Returns:
             float: The power limit 
         """
+        Instrument_Transport.simulated_delay(self.timing, "command")
         return self.limit, str(self.limit)+"dBm"   # returns the output limit in dB
 
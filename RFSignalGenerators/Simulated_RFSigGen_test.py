@@ -72,7 +72,26 @@ class ExpectedDataTest(unittest.TestCase):
 
             self.assertTrue(any(item.category == warning for item in warning_list))
 
-
+    def test_power_sweep_steps_through_list(self):
+        self.assertEqual(self.RFSim.setup_power_sweep([-80, -60, -50]), 3)
+        for power in (-80, -60, -50):
+            self.assertEqual(self.RFSim.next_sweep_point(), (power, str(float(power)) + "dBm"))
+        self.assertRaises(Exception, self.RFSim.next_sweep_point)
+        self.RFSim.stop_power_sweep()
+        self.assertEqual(self.RFSim.get_output_power()[0], -50)
+        self.assertRaises(Exception, self.RFSim.next_sweep_point)
+
+    def test_power_sweep_if_invalid_input_types_used(self):
+        self.assertRaises(TypeError, self.RFSim.setup_power_sweep, "-80")
+        self.assertRaises(TypeError, self.RFSim.setup_power_sweep, [-80], "1")
+
+    def test_timing_profile_spent_on_each_command(self):
+        clock = Instrument_Transport.Virtual_Clock(True)
+        start = clock.time()
+        RFSim = Simulated_RFSigGen(timing=Instrument_Transport.Timing_Profile(latency=10, settle_time=100, clock=clock))
+        RFSim.set_output_power(-50)  # set and settle, then the power is read back
+        RFSim.get_frequency()
+        self.assertAlmostEqual(clock.time() - start, 130, places=2)
 
 if __name__ == "__main__":
         unittest.main()
@@ -1,2 +1,7 @@
-from Rigol3030DSG_RFSigGen import *
-from Simulated_RFSigGen import *
+import Instrument_Transport
+
+# Drivers are only imported when they are first used
+Instrument_Transport.lazy_package(__name__, {
+    "Generic_RFSigGen": "Generic_RFSigGen",
+    "Rigol3030DSG_RFSigGen": "Rigol3030DSG_RFSigGen",
+    "Simulated_RFSigGen": "Simulated_RFSigGen"})
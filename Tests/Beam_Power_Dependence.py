@@ -1,10 +1,11 @@
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
-require("cothread")
 require("matplotlib")
 import numpy as np
 import matplotlib.pyplot as plt
-import time
+from Sweep_Engine import *
+from Sweep_Store import *
 
 
 def Beam_Power_Dependence(
@@ -33,7 +34,7 @@ def Beam_Power_Dependence(
         end_power (float): Final output power for the tests, default value is 0 dBm.
             The input values are floats and dBm assumed. 
         samples (int): Number of samples take is this value + 1.
-        settling_time (float): Time in seconds, that the program will wait in between 
+        settling_time (float): Longest time in seconds, that the program will wait for the BPM to settle in between 
             setting an  output power on the RF, and reading the values of the BPM. 
         ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
             to. If no report is sent to the test then it will just display the results in 
@@ -63,7 +64,7 @@ def Beam_Power_Dependence(
         end\_power (float): Final output power for the tests, default value is 0 dBm.
             The input values are floats and dBm assumed. \\
         samples (int): Number of samples take is this value + 1.\\
-        settling\_time (float): Time in seconds, that the program will wait in between 
+        settling\_time (float): Longest time in seconds, that the program will wait for the BPM to settle in between 
             setting an  output power on the RF, and reading the values of the BPM. \\
         ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
             to. If no report is sent to the test then it will just display the results in 
@@ -84,6 +85,7 @@ def Beam_Power_Dependence(
     test_name = test_name.rsplit("Tests.")[1]
     test_name = test_name.replace("_", " ")
     print("Starting test \"" + test_name + "\"")
+    Instrument_Transport.latency_log.start_test(test_name)  # Instrument calls from here on are timed against this test
 
     # Get the device names for the report
     device_names = []
@@ -103,30 +105,38 @@ def Beam_Power_Dependence(
     RFObject.set_frequency(frequency)
     RFObject.set_output_power(start_power)
     RFObject.turn_on_RF()
-    time.sleep(settling_time)
-
-    # Build up the arrays where the final values will be saved
-    X_pos = np.array([])
-    Y_pos = np.array([])
-    beam_current = np.array([])
-    output_power = np.array([])
-    input_power = np.array([])
-    ADC_sum = np.array([])
-
-    # Perform the test
-    for index in power:
-        RFObject.set_output_power(index)  # Set next output power value
-        time.sleep(settling_time)  # Wait for signal to settle
-        beam_current = np.append(beam_current, BPMObject.get_beam_current())  # record beam current
-        X_pos = np.append(X_pos, BPMObject.get_X_position())  # record X pos
-        Y_pos = np.append(Y_pos, BPMObject.get_Y_position())  # record Y pos
-        output_power = np.append(output_power, RFObject.get_output_power()[0])
-        input_power = np.append(input_power, BPMObject.get_input_power())
-        ADC_sum = np.append(ADC_sum, BPMObject.get_ADC_sum())
+    Instrument_Transport.station_clock.sleep(settling_time)
+
+    # The raw data and journal are saved next to the plots, with the test details as a header
+    data_file = sub_directory + __name__.rsplit(".")[-1]
+    header = [test_name, device_names, parameter_names]
+
+    # Perform the test, the power list is loaded into the RF sweep once and stepped point by point
+    plan = Sweep_Plan(
+        points=power,
+        setpoints=[("power_setpoint", lambda step: RFObject.next_sweep_point()[0])],  # Step on to the next power
+        measurements=[("output_power", lambda step: RFObject.get_output_power()[0])] +  # Power the source reports
+                     BPM_measurements(BPMObject),
+        settle=BPM_settle(BPMObject, settling_time, clock=Instrument_Transport.station_clock.time,
+                          sleep=Instrument_Transport.station_clock.sleep),
+        start=lambda first: RFObject.setup_power_sweep(power[first:], settling_time),  # Only the points still to do
+        finish=RFObject.stop_power_sweep,
+        journal=Sweep_Journal(data_file + ".journal", header),  # Lets a stopped test carry on
+        store=Sweep_Store(data_file, header))  # Keeps the full resolution data
+    results = plan.run(Sequential_Executor(sleep=Instrument_Transport.station_clock.sleep,
+                                           clock=Instrument_Transport.station_clock.time,
+                                           latency_log=Instrument_Transport.latency_log))
+    X_pos = results["X_position"]
+    Y_pos = results["Y_position"]
+    beam_current = results["beam_current"]
+    output_power = results["output_power"]
+    input_power = results["input_power"]
+    ADC_sum = results["ADC_sum"]
 
     #turn off the RF
     RFObject.turn_off_RF()
 
+    report_start = Instrument_Transport.station_clock.time()  # Plotting and reporting are timed as the report phase
     # add the test details to the report
     ReportObject.setup_test(test_name, intro_text, device_names, parameter_names)
 
@@ -159,5 +169,7 @@ def Beam_Power_Dependence(
         ReportObject.add_figure_to_test(sub_directory + index[4], "")
 
     # return the full data sets
+    Instrument_Transport.latency_log.record("phase", "report", Instrument_Transport.station_clock.time() - report_start)
+
     return output_power, input_power, beam_current, X_pos, Y_pos
 
@@ -1,15 +1,15 @@
 import RFSignalGenerators
 import BPMDevice
 import ProgrammableAttenuator
+import Instrument_Transport
 from pkg_resources import require
 
 require("numpy")
-require("cothread")
 require("matplotlib")
 import numpy as np
 import matplotlib.pyplot as plt
-import time
-import itertools
+from Sweep_Engine import *
+from Sweep_Store import *
 
 def calc_x_pos(a,b,c,d):
     diff = ((a+d)-(b+c))
@@ -25,6 +25,34 @@ def calc_y_pos(a,b,c,d):
     y = ky*(diff/total)
     return y
 
+def reflected_gray_order(values, repeat):
+    """Orders every combination of the values so that neighbouring points differ in one place
+
+    This is the reflected n-ary Gray code, so it visits the same points as 
+    itertools.product(values, repeat=repeat) but each step only moves one position by 
+    one value, which means only one attenuator channel has to be written per point.
+
+    Args:
+        values (list): Values that each position can take.
+        repeat (int): Number of positions in each point.
+
+    Returns:
+        generator: Tuples of length repeat, one for each combination of the values.
+    """
+    steps = len(values)
+    for count in range(steps ** repeat):
+        digits = []
+        for position in range(repeat):
+            digits.insert(0, count % steps)  # base steps digits of the count, most significant first
+            count //= steps
+        point = []
+        prefix = 0
+        for digit in digits:
+            # a digit counts backwards when the count made by the digits before it is odd
+            point.append(values[steps - 1 - digit] if prefix % 2 == 1 else values[digit])
+            prefix = prefix * steps + digit
+        yield tuple(point)
+
 def Beam_position_attenuation_permutation_test(
              RFObject,
              BPMObject,
@@ -56,8 +84,8 @@ def Beam_position_attenuation_permutation_test(
             attenuator_max (float): max value for the attenuators
             attenuator_min (float): min value for the attenuators
             attenuator_steps (float): steps between the min and max values
-            settling_time (float): time in seconds to wait between changing an attenuator value and 
-                taking a reading from the BPM. 
+            settling_time (float): longest time in seconds to wait for the BPM to settle between changing an 
+                attenuator value and taking a reading from the BPM. 
             ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
                 to. If no report is sent to the test then it will just display the results in 
                 a graph. 
@@ -87,8 +115,8 @@ def Beam_position_attenuation_permutation_test(
         attenuator\_max (float): max value for the attenuators\\
         attenuator\_min (float): min value for the attenuators\\
         attenuator\_steps (float): steps between the min and max values\\
-        settling\_time (float): time in seconds to wait between changing an attenuator value and 
-            taking a reading from the BPM. \\
+        settling\_time (float): longest time in seconds to wait for the BPM to settle between changing an 
+            attenuator value and taking a reading from the BPM. \\
         ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
             to. If no report is sent to the test then it will just display the results in 
             a graph. \\
@@ -105,32 +133,33 @@ def Beam_position_attenuation_permutation_test(
     test_name = test_name.rsplit("Tests.")[1]
     test_name = test_name.replace("_", " ")
     print("Starting test \"" + test_name + "\"")
+    Instrument_Transport.latency_log.start_test(test_name)  # Instrument calls from here on are timed against this test
 
     RFObject.set_output_power(rf_power)
     RFObject.set_frequency(rf_frequency)
     RFObject.turn_on_RF()
 
-    predicted_x = []
-    predicted_y = []
-    measured_x = []
-    measured_y = []
-
     attenuation_map = np.linspace(attenuator_min,attenuator_max,attenuator_steps)
 
-    attenuation_map = itertools.product(attenuation_map, repeat=4)
-
-    count = 0
-
-    for index in attenuation_map:
-        ProgAttenObject.set_channel_attenuation("A", index[0])
-        ProgAttenObject.set_channel_attenuation("B", index[1])
-        ProgAttenObject.set_channel_attenuation("C", index[2])
-        ProgAttenObject.set_channel_attenuation("D", index[3])
-        time.sleep(settling_time)
-        measured_x.append(BPMObject.get_X_position())
-        measured_y.append(BPMObject.get_Y_position())
-        power_out = RFObject.get_output_power()[0]
-        power_out = power_out - 6  # Reduce signal by a factor of four as it goes through a 4 way splitter
+    attenuation_map = reflected_gray_order(attenuation_map, repeat=4)
+
+    previous = [None]  # The attenuation of each channel at the last point
+
+    def set_attenuation(step):
+        index = step["point"]
+        if previous[0] is None:
+            ProgAttenObject.set_all_channels(index[0], index[1], index[2], index[3])
+        else:
+            # Only write the channels that have changed since the last point
+            for channel, new_value, old_value in zip(["A", "B", "C", "D"], index, previous[0]):
+                if new_value != old_value:
+                    ProgAttenObject.set_channel_attenuation(channel, new_value)
+        previous[0] = index
+        return index
+
+    def predict_powers(step):
+        index = step["point"]
+        power_out = step["power_out"] - 6  # Reduce signal by a factor of four as it goes through a 4 way splitter
         predicted_a = power_out - index[0]
         predicted_b = power_out - index[1]
         predicted_c = power_out - index[2]
@@ -139,14 +168,7 @@ def Beam_position_attenuation_permutation_test(
         predicted_b = 10 ** (predicted_b / 10.0)
         predicted_c = 10 ** (predicted_c / 10.0)
         predicted_d = 10 ** (predicted_d / 10.0)
-        predicted_x.append(calc_x_pos(predicted_a, predicted_b, predicted_c, predicted_d))
-        predicted_y.append(calc_y_pos(predicted_a, predicted_b, predicted_c, predicted_d))
-        count = count + 1
-
-    plt.scatter(measured_x, measured_y, s=50)
-    plt.scatter(predicted_x, predicted_y, s=100, c='r', marker=u'+')
-    plt.xlim(-11, 11)
-    plt.ylim(-11, 11)
+        return predicted_a, predicted_b, predicted_c, predicted_d
 
     # Readies devices that are used in the test so that they can be added to the report
     device_names = []
@@ -162,6 +184,38 @@ def Beam_position_attenuation_permutation_test(
     parameter_names.append("Minimum Attenuation: " + str(attenuator_min)+"dB")
     parameter_names.append("Steps between min and max attenuations: " + str(attenuator_steps))
     parameter_names.append("Settling time: " + str(settling_time)+"s")
+
+    # The raw data and journal are saved next to the plots, with the test details as a header
+    data_file = sub_directory + __name__.rsplit(".")[-1]
+    header = [test_name, device_names, parameter_names]
+    plan = Sweep_Plan(
+        points=attenuation_map,
+        setpoints=[("attenuation", set_attenuation)],
+        measurements=BPM_measurements(BPMObject, ["X_position", "Y_position"],
+                                      {"X_position": "measured_x", "Y_position": "measured_y"}) + [
+                      ("power_out", lambda step: RFObject.get_output_power()[0]),
+                      ("predicted_powers", predict_powers),
+                      ("predicted_x", lambda step: calc_x_pos(*step["predicted_powers"])),
+                      ("predicted_y", lambda step: calc_y_pos(*step["predicted_powers"]))],
+        settle=BPM_settle(BPMObject, settling_time, clock=Instrument_Transport.station_clock.time,
+                          sleep=Instrument_Transport.station_clock.sleep,
+                          quantities=("X_position", "Y_position"), absolute_tolerance=0.001),
+        journal=Sweep_Journal(data_file + ".journal", header),  # Lets a stopped test carry on
+        store=Sweep_Store(data_file, header))  # Keeps the full resolution data
+    results = plan.run(Sequential_Executor(sleep=Instrument_Transport.station_clock.sleep,
+                                           clock=Instrument_Transport.station_clock.time,
+                                           latency_log=Instrument_Transport.latency_log))
+    measured_x = results["measured_x"]
+    measured_y = results["measured_y"]
+    predicted_x = results["predicted_x"]
+    predicted_y = results["predicted_y"]
+
+    report_start = Instrument_Transport.station_clock.time()  # Plotting and reporting are timed as the report phase
+    plt.scatter(measured_x, measured_y, s=50)
+    plt.scatter(predicted_x, predicted_y, s=100, c='r', marker=u'+')
+    plt.xlim(-11, 11)
+    plt.ylim(-11, 11)
+
     plt.xlabel("Horizontal Beam Position (mm)")
     plt.ylabel("Vertical Beam Position (mm)")
     plt.grid(True)
@@ -175,5 +229,7 @@ def Beam_position_attenuation_permutation_test(
         ReportObject.setup_test("beam_position_attenuation_permutation", intro_text, device_names, parameter_names)
         ReportObject.add_figure_to_test(sub_directory+"beam_position_attenuation_permutation")
 
+    Instrument_Transport.latency_log.record("phase", "report", Instrument_Transport.station_clock.time() - report_start)
+
     return measured_x, measured_y, predicted_x, predicted_y
 
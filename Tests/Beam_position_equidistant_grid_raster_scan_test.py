@@ -1,10 +1,11 @@
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
-require("cothread")
 require("matplotlib")
 import numpy as np
 import matplotlib.pyplot as plt
-import time
+from Sweep_Engine import *
+from Sweep_Store import *
 import itertools
 
 
@@ -57,8 +58,8 @@ def Beam_position_equidistant_grid_raster_scan_test(
             nominal_attenuation (float): starting attenuation values of each attenuator, in dB
             x_points (int): number of samples in the X plane
             y_points (int) number of samples in the Y plane 
-            settling_time (float): time in seconds to wait between changing an attenuator value and 
-                taking a reading from the BPM. 
+            settling_time (float): longest time in seconds to wait for the BPM to settle between changing an 
+                attenuator value and taking a reading from the BPM. 
             ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
                 to. If no report is sent to the test then it will just display the results in 
                 a graph. 
@@ -87,8 +88,8 @@ def Beam_position_equidistant_grid_raster_scan_test(
         nominal\_attenuation (float): starting attenuation values of each attenuator, in dB\\
         x\_points (int): number of samples in the X plane\\
         y\_points (int) number of samples in the Y plane \\
-        settling\_time (float): time in seconds to wait between changing an attenuator value and 
-            taking a reading from the BPM. \\
+        settling\_time (float): longest time in seconds to wait for the BPM to settle between changing an 
+            attenuator value and taking a reading from the BPM. \\
         ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
             to. If no report is sent to the test then it will just display the results in 
             a graph. \\
@@ -105,16 +106,12 @@ def Beam_position_equidistant_grid_raster_scan_test(
     test_name = test_name.rsplit("Tests.")[1]
     test_name = test_name.replace("_", " ")
     print("Starting test \"" + test_name + "\"")
+    Instrument_Transport.latency_log.start_test(test_name)  # Instrument calls from here on are timed against this test
 
     RFObject.set_output_power(rf_power)
     RFObject.set_frequency(rf_frequency)
     RFObject.turn_on_RF()
 
-    predicted_x = []
-    predicted_y = []
-    measured_x = []
-    measured_y = []
-
     ###########################################################
     gradient = np.linspace(0.0001, 2, x_points)
     inv_gradient = gradient[::-1]
@@ -134,7 +131,8 @@ def Beam_position_equidistant_grid_raster_scan_test(
         d_total = np.append(d_total, (d - index) + offset)
     #############################################################
 
-    for A, B, C, D in zip(a_total, b_total, c_total, d_total):
+    def set_beam_position(step):
+        A, B, C, D = step["point"]  # The four values given for this point
         # Steps here go as follows:
         # - Take the four values given to the loop, and split them into ratios that will sum into 1
         # - Set a nominal attenuation on the attenuator, so amplification can be simulated if needed
@@ -185,28 +183,8 @@ def Beam_position_equidistant_grid_raster_scan_test(
         D = nominal_attenuation - quarter_round(10*np.log10(D_pwr / power_split))
 
         # Set the attenuation as the values just calculated.
-        ProgAttenObject.set_channel_attenuation("A", A)
-        ProgAttenObject.set_channel_attenuation("B", B)
-        ProgAttenObject.set_channel_attenuation("C", C)
-        ProgAttenObject.set_channel_attenuation("D", D)
-
-        ######################################
-        time.sleep(settling_time)  # Let the attenuator values settle
-        ######################################
-        measured_x.append(BPMObject.get_X_position())  # Take a reading of X position
-        measured_y.append(BPMObject.get_Y_position())  # Take a reading of Y position
-
-        # Given the power values of each input, calculate the expected position
-        predicted_x.append(calc_x_pos(A_pwr, B_pwr, C_pwr, D_pwr))
-        predicted_y.append(calc_y_pos(A_pwr, B_pwr, C_pwr, D_pwr))
-
-
-
-
-    plt.scatter(measured_x, measured_y, s=10)
-    plt.scatter(predicted_x, predicted_y, s=20, c='r', marker=u'+')
-    plt.xlim(-10.5, 10.5)
-    plt.ylim(-10.5, 10.5)
+        ProgAttenObject.set_all_channels(A, B, C, D)
+        return A_pwr, B_pwr, C_pwr, D_pwr  # The power into each BPM input
 
     # Readies devices that are used in the test so that they can be added to the report
     device_names = []
@@ -222,6 +200,38 @@ def Beam_position_equidistant_grid_raster_scan_test(
     parameter_names.append("Number of X points: " + str(x_points))
     parameter_names.append("Nunber of Y points: " + str(y_points))
     parameter_names.append("Settling time: "+str(settling_time)+"s")
+
+    # The raw data and journal are saved next to the plots, with the test details as a header
+    data_file = sub_directory + __name__.rsplit(".")[-1]
+    header = [test_name, device_names, parameter_names]
+    plan = Sweep_Plan(
+        points=zip(a_total, b_total, c_total, d_total),
+        setpoints=[("input_powers", set_beam_position)],
+        # Take a reading of the X and Y position
+        measurements=BPM_measurements(BPMObject, ["X_position", "Y_position"],
+                                      {"X_position": "measured_x", "Y_position": "measured_y"}) + [
+                      # Given the power values of each input, calculate the expected position
+                      ("predicted_x", lambda step: calc_x_pos(*step["input_powers"])),
+                      ("predicted_y", lambda step: calc_y_pos(*step["input_powers"]))],
+        settle=BPM_settle(BPMObject, settling_time, clock=Instrument_Transport.station_clock.time,
+                          sleep=Instrument_Transport.station_clock.sleep,  # Let the attenuator values settle
+                          quantities=("X_position", "Y_position"), absolute_tolerance=0.001),
+        journal=Sweep_Journal(data_file + ".journal", header),  # Lets a stopped test carry on
+        store=Sweep_Store(data_file, header))  # Keeps the full resolution data
+    results = plan.run(Sequential_Executor(sleep=Instrument_Transport.station_clock.sleep,
+                                           clock=Instrument_Transport.station_clock.time,
+                                           latency_log=Instrument_Transport.latency_log))
+    measured_x = results["measured_x"]
+    measured_y = results["measured_y"]
+    predicted_x = results["predicted_x"]
+    predicted_y = results["predicted_y"]
+
+    report_start = Instrument_Transport.station_clock.time()  # Plotting and reporting are timed as the report phase
+    plt.scatter(measured_x, measured_y, s=10)
+    plt.scatter(predicted_x, predicted_y, s=20, c='r', marker=u'+')
+    plt.xlim(-10.5, 10.5)
+    plt.ylim(-10.5, 10.5)
+
     plt.xlabel("Horizontal Beam Position (mm)")
     plt.ylabel("Vertical Beam Position (mm)")
     plt.grid(True)
@@ -235,6 +245,8 @@ def Beam_position_equidistant_grid_raster_scan_test(
         ReportObject.setup_test(test_name, intro_text, device_names, parameter_names)
         ReportObject.add_figure_to_test(sub_directory+"Beam_position_equidistant_grid_raster_scan_test")
 
+    Instrument_Transport.latency_log.record("phase", "report", Instrument_Transport.station_clock.time() - report_start)
+
     return measured_x, measured_y, predicted_x, predicted_y
 
 
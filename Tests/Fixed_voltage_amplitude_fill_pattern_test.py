@@ -1,13 +1,14 @@
 import RFSignalGenerators
 import BPMDevice
 import Gate_Source
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
-require("cothread")
 require("matplotlib")
 import numpy as np
 import matplotlib.pyplot as plt
-import time
+from Sweep_Engine import *
+from Sweep_Store import *
 
 
 def Fixed_voltage_amplitude_fill_pattern_test(
@@ -42,7 +43,7 @@ def Fixed_voltage_amplitude_fill_pattern_test(
             samples (int): Number of samples take is this value + 1.
             pulse_period (float): The pulse period for the modulation signal, i.e. the bunch length, 
                 this is a float that is in micro seconds.
-            settling_time (float): Time in seconds, that the program will wait in between 
+            settling_time (float): Longest time in seconds, that the program will wait for the BPM to settle in between 
                 setting an  output power on the RF, and reading the values of the BPM. 
             ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
                 to. If no report is sent to the test then it will just display the results in 
@@ -73,7 +74,7 @@ def Fixed_voltage_amplitude_fill_pattern_test(
             power (float): Starting output power for the tests, default value is -100 dBm. The input values are floats and dBm is assumed. \\
             samples (int): Number of samples take is this value + 1.\\
             pulse\_period (float): The pulse period for the modulation signal, i.e. the bunch length, this is a float that is in micro seconds.\\
-            settling\_time (float): Time in seconds, that the program will wait in between setting an  output power on the RF, and reading the values of the BPM. \\
+            settling\_time (float): Longest time in seconds, that the program will wait for the BPM to settle in between setting an  output power on the RF, and reading the values of the BPM. \\
             ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded to. If no report is sent to the test then it will just display the results in a graph. \\
             sub\_directory (str): String that can change where the graphs will be saved to\\~\\  
         Returns:\\
@@ -95,17 +96,11 @@ def Fixed_voltage_amplitude_fill_pattern_test(
     RFObject.turn_on_RF()
     GateSourceObject.turn_on_modulation()
 
-    dutycycle = np.array([])
-    bpm_power = np.array([])
-    bpm_Xpos = np.array([])
-    bpm_Ypos = np.array([])
-    bpm_current = np.array([])
-    ADC_sum = np.array([])
-
     test_name = __name__
     test_name = test_name.rsplit("Tests.")[1]
     test_name = test_name.replace("_", " ")
     print("Starting test \"" + test_name + "\"")
+    Instrument_Transport.latency_log.start_test(test_name)  # Instrument calls from here on are timed against this test
 
     device_names = []
     device_names.append(RFObject.get_device_ID())
@@ -119,20 +114,34 @@ def Fixed_voltage_amplitude_fill_pattern_test(
     parameter_names.append("Samples: " + str(samples))
     parameter_names.append("Settling time: " + str(settling_time) + "s")
 
-    time.sleep(settling_time)
-    for index in cycle:
-        dutycycle = np.append(dutycycle, GateSourceObject.set_pulse_dutycycle(index))
-        time.sleep(settling_time)
-        bpm_power = np.append(bpm_power, BPMObject.get_input_power())
-        bpm_current = np.append(bpm_current, BPMObject.get_beam_current())
-        bpm_Xpos = np.append(bpm_Xpos, BPMObject.get_X_position())
-        bpm_Ypos = np.append(bpm_Ypos, BPMObject.get_Y_position())
-        ADC_sum = np.append(ADC_sum, BPMObject.get_ADC_sum())
+    # The raw data and journal are saved next to the plots, with the test details as a header
+    data_file = sub_directory + __name__.rsplit(".")[-1]
+    header = [test_name, device_names, parameter_names]
+
+    Instrument_Transport.station_clock.sleep(settling_time)
+    plan = Sweep_Plan(
+        points=cycle,
+        setpoints=[("dutycycle", lambda step: GateSourceObject.set_pulse_dutycycle(step["point"]))],
+        measurements=BPM_measurements(BPMObject, ["input_power", "beam_current", "X_position", "Y_position", "ADC_sum"]),
+        settle=BPM_settle(BPMObject, settling_time, clock=Instrument_Transport.station_clock.time,
+                          sleep=Instrument_Transport.station_clock.sleep),
+        journal=Sweep_Journal(data_file + ".journal", header),  # Lets a stopped test carry on
+        store=Sweep_Store(data_file, header))  # Keeps the full resolution data
+    results = plan.run(Sequential_Executor(sleep=Instrument_Transport.station_clock.sleep,
+                                           clock=Instrument_Transport.station_clock.time,
+                                           latency_log=Instrument_Transport.latency_log))
+    dutycycle = results["dutycycle"]
+    bpm_power = results["input_power"]
+    bpm_current = results["beam_current"]
+    bpm_Xpos = results["X_position"]
+    bpm_Ypos = results["Y_position"]
+    ADC_sum = results["ADC_sum"]
 
 
     RFObject.turn_off_RF()
     GateSourceObject.turn_off_modulation()
 
+    report_start = Instrument_Transport.station_clock.time()  # Plotting and reporting are timed as the report phase
     ReportObject.setup_test(test_name, intro_text, device_names, parameter_names)
 
     caption = "Changing gate duty cycle, with fixed RF amplitude "
@@ -166,5 +175,7 @@ def Fixed_voltage_amplitude_fill_pattern_test(
         ReportObject.add_figure_to_test(sub_directory + index[4], "")
 
     # return the full data sets
+    Instrument_Transport.latency_log.record("phase", "report", Instrument_Transport.station_clock.time() - report_start)
+
     return dutycycle, bpm_power, bpm_current, bpm_Xpos, bpm_Ypos,
 
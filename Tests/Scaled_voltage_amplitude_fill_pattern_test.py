@@ -1,13 +1,14 @@
 import RFSignalGenerators
 import BPMDevice
 import Gate_Source
+import Instrument_Transport
 from pkg_resources import require
 require("numpy")
-require("cothread")
 require("matplotlib")
 import numpy as np
 import matplotlib.pyplot as plt
-import time
+from Sweep_Engine import *
+from Sweep_Store import *
 
 
 def Scaled_voltage_amplitude_fill_pattern_test(
@@ -42,7 +43,7 @@ def Scaled_voltage_amplitude_fill_pattern_test(
             samples (int): Number of samples take is this value + 1.
             pulse_period (float): The pulse period for the modulation signal, i.e. the bunch length, 
                 this is a float that is in micro seconds.
-            settling_time (float): Time in seconds, that the program will wait in between 
+            settling_time (float): Longest time in seconds, that the program will wait for the BPM to settle in between 
                 setting an  output power on the RF, and reading the values of the BPM. 
             ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded 
                 to. If no report is sent to the test then it will just display the results in 
@@ -72,7 +73,7 @@ def Scaled_voltage_amplitude_fill_pattern_test(
             desired\_power (float): Starting output power for the tests, default value is -40 dBm. The input values are floats and dBm is assumed. \\
             samples (int): Number of samples take is this value + 1.\\
             pulse\_period (float): The pulse period for the modulation signal, i.e. the bunch length, this is a float that is in micro seconds. \\
-            settling\_time (float): Time in seconds, that the program will wait in between setting an  output power on the RF, and reading the values of the BPM. \\
+            settling\_time (float): Longest time in seconds, that the program will wait for the BPM to settle in between setting an  output power on the RF, and reading the values of the BPM. \\
             ReportObject (LaTeX Report Obj): Specific report that the test results will be recorded to. If no report is sent to the test then it will just display the results in a graph. \\
             sub\_directory (str): String that can change where the graphs will be saved to \\~\\ 
         Returns:\\
@@ -88,6 +89,7 @@ def Scaled_voltage_amplitude_fill_pattern_test(
     test_name = test_name.rsplit("Tests.")[1]
     test_name = test_name.replace("_", " ")
     print("Starting test \"" + test_name + "\"")
+    Instrument_Transport.latency_log.start_test(test_name)  # Instrument calls from here on are timed against this test
 
     device_names = []
     device_names.append(RFObject.get_device_ID())
@@ -109,29 +111,38 @@ def Scaled_voltage_amplitude_fill_pattern_test(
     parameter_names.append("Samples: " + str(samples))
     parameter_names.append("Settling time: "+ str(settling_time)+"s")
 
-    dutycycle = np.array([])
-    bpm_power = np.array([])
-    bpm_Xpos = np.array([])
-    bpm_Ypos = np.array([])
-    bpm_current = np.array([])
-    rf_output = np.array([])
-    ADC_sum = np.array([])
-
-
-    time.sleep(settling_time)
-    for index in cycle:
-        current_cycle = GateSourceObject.set_pulse_dutycycle(index)
-        dutycycle = np.append(dutycycle, current_cycle)
-        log_cycle = 20*np.log10(current_cycle)
-        RFObject.set_output_power(desired_power + np.absolute(log_cycle))
-        time.sleep(settling_time)
-        rf_output = np.append(rf_output, RFObject.get_output_power()[0])
-        bpm_power = np.append(bpm_power, BPMObject.get_input_power())
-        bpm_current = np.append(bpm_current, BPMObject.get_beam_current())
-        bpm_Xpos = np.append(bpm_Xpos, BPMObject.get_X_position())
-        bpm_Ypos = np.append(bpm_Ypos, BPMObject.get_Y_position())
-        ADC_sum = np.append(ADC_sum, BPMObject.get_ADC_sum())
-
+    def scale_power(step):
+        # Raise the RF power to make up for the time the gate is off
+        log_cycle = 20*np.log10(step["dutycycle"])
+        return RFObject.set_output_power(desired_power + np.absolute(log_cycle))[0]  # Record the power that was set
+
+    # The raw data and journal are saved next to the plots, with the test details as a header
+    data_file = sub_directory + __name__.rsplit(".")[-1]
+    header = [test_name, device_names, parameter_names]
+
+    Instrument_Transport.station_clock.sleep(settling_time)
+    plan = Sweep_Plan(
+        points=cycle,
+        setpoints=[("dutycycle", lambda step: GateSourceObject.set_pulse_dutycycle(step["point"])),
+                   ("scaled_power", scale_power)],
+        measurements=[("rf_output", lambda step: RFObject.get_output_power()[0])] +
+                     BPM_measurements(BPMObject, ["input_power", "beam_current", "X_position", "Y_position", "ADC_sum"]),
+        settle=BPM_settle(BPMObject, settling_time, clock=Instrument_Transport.station_clock.time,
+                          sleep=Instrument_Transport.station_clock.sleep),
+        journal=Sweep_Journal(data_file + ".journal", header),  # Lets a stopped test carry on
+        store=Sweep_Store(data_file, header))  # Keeps the full resolution data
+    results = plan.run(Sequential_Executor(sleep=Instrument_Transport.station_clock.sleep,
+                                           clock=Instrument_Transport.station_clock.time,
+                                           latency_log=Instrument_Transport.latency_log))
+    dutycycle = results["dutycycle"]
+    rf_output = results["rf_output"]
+    bpm_power = results["input_power"]
+    bpm_current = results["beam_current"]
+    bpm_Xpos = results["X_position"]
+    bpm_Ypos = results["Y_position"]
+    ADC_sum = results["ADC_sum"]
+
+    report_start = Instrument_Transport.station_clock.time()  # Plotting and reporting are timed as the report phase
     ReportObject.setup_test(test_name, intro_text, device_names, parameter_names)
 
     # make a caption and headings for a table of results
@@ -164,4 +175,6 @@ def Scaled_voltage_amplitude_fill_pattern_test(
         ReportObject.add_figure_to_test(sub_directory + index[4], "")
 
     # return the full data sets
+    Instrument_Transport.latency_log.record("phase", "report", Instrument_Transport.station_clock.time() - report_start)
+
     return dutycycle, rf_output, bpm_power, bpm_current, bpm_Xpos, bpm_Ypos
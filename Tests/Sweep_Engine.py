@@ -0,0 +1,449 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import json
+import os
+import time
+
+
+def BPM_measurements(BPMObject, names=None, columns=None):
+    """Builds the measurement list for the BPM values that the tests record
+
+    The first measurement takes one snapshot of the BPM and every measurement reads its
+    value from that snapshot, so all the values recorded at a step come from the same
+    acquisition and nothing read at an earlier step is used again.
+
+    Args:
+        BPMObject (BPMDevice Obj): Object to interface with the BPM hardware.
+        names (str list): Names of the values to measure, in the order they are read. By default
+            "beam_current", "X_position", "Y_position", "input_power" and "ADC_sum" are measured.
+        columns (dict): Name to record each value under, keyed by the name of the value. Values
+            that are not in it are recorded under their own name. Can be None
+    Returns:
+        list: (name, callable) pairs that can be given to a Sweep_Plan as measurements
+    """
+    if names is None:
+        names = ["beam_current", "X_position", "Y_position", "input_power", "ADC_sum"]
+    if columns is None:
+        columns = {}
+    taken = {}
+
+    def measure(step, name, first):
+        if first:
+            taken["snapshot"] = BPMObject.get_snapshot()  # One acquisition for the whole step
+        return taken["snapshot"][name]
+
+    # Each measurement is given the step, the snapshot does not need it
+    return [(columns.get(name, name), lambda step, name=name, first=(index == 0): measure(step, name, first))
+            for index, name in enumerate(names)]
+
+
+def BPM_settle(BPMObject, max_wait, **kwargs):
+    """Builds a settle function that waits for the BPM readings to stop changing
+
+    Args:
+        BPMObject (BPMDevice Obj): Object to interface with the BPM hardware.
+        max_wait (float): Longest time in seconds to wait at each point.
+        **kwargs: Passed on to the settle method of the BPM.
+    Returns:
+        callable: Settle function that can be given to a Sweep_Plan
+    """
+    return lambda step: BPMObject.settle(max_wait, **kwargs)
+
+
+class Sweep_Results():
+    """Columns of values recorded by a sweep, one row per step.
+
+    Each column is a preallocated numpy array, its type and shape are taken from the first
+    value recorded in it, with integers stored as floats. When the columns are full their capacity is doubled, so adding a
+    row takes the same time on average however long the sweep is. Columns are read back as
+    views of the filled rows, so no copy is made to plot or report them.
+
+    Attributes:
+        columns (dict): Preallocated numpy arrays, keyed by column name
+        names (str list): Column names in the order they were first recorded
+        length (int): Number of rows that have been filled
+        capacity (int): Number of rows the columns have room for
+    """
+
+    def __init__(self, capacity=None):
+        """Starts an empty set of results
+
+        Args:
+            capacity (int): Number of rows to make room for, the number of steps in the sweep
+                if it is known. If None, room is made for 16 rows to start with.
+        Returns:
+
+        """
+        if capacity is None:
+            capacity = 16
+        elif type(capacity) != int:
+            raise TypeError
+        elif capacity < 1:
+            capacity = 1
+        self.columns = {}
+        self.names = []
+        self.length = 0
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        """Gets one column of the results
+
+        Args:
+            name (str): Name of the column
+        Returns:
+            numpy array: View of the values recorded in that column, in step order
+        """
+        return self.columns[name][:self.length]
+
+    def _grow(self):
+        """Private method that doubles the number of rows the columns have room for
+
+        Args:
+
+        Returns:
+
+        """
+        self.capacity *= 2
+        for name in self.names:
+            column = self.columns[name]
+            grown = np.empty((self.capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.length] = column[:self.length]  # copy the filled rows across
+            self.columns[name] = grown
+
+    def append(self, step):
+        """Adds the values recorded in one step as a new row
+
+        The columns are made from the first row, every row after that has to record
+        the same names.
+
+        Args:
+            step (dict): Values recorded in the step, keyed by column name
+        Returns:
+
+        """
+        if self.length == 0 and len(self.names) == 0:
+            for name in step:
+                value = np.asarray(step[name])
+                dtype = value.dtype
+                if dtype.kind in "iu":
+                    dtype = np.float64  # stops later non integer values being truncated
+                self.columns[name] = np.empty((self.capacity,) + value.shape, dtype=dtype)
+                self.names.append(name)
+        elif set(step) != set(self.names):
+            raise ValueError("Step does not record the same values as the rest of the sweep")
+
+        if self.length == self.capacity:
+            self._grow()
+        for name in self.names:
+            self.columns[name][self.length] = step[name]
+        self.length += 1
+
+
+class Sweep_Journal():
+    """Keeps a record on disk of every step of a sweep as it completes.
+
+    The journal is a text file with one JSON object per line. The first line holds a header
+    that describes the sweep, such as the test name, devices and parameters, and every line
+    after that holds the values recorded in one step. Each line is flushed to disk before
+    the next step starts. If a sweep with the same header is started again the steps that
+    were already recorded are read back, so the sweep can carry on from the first step
+    that is missing.
+
+    Attributes:
+        path (str): Location of the journal file
+        header (variant): Description of the sweep, anything that can be written as JSON
+        completed (dict list): Values of the steps read back from an earlier run
+    """
+
+    def __init__(self, path, header):
+        """Opens the journal, reading back any steps already recorded for the same sweep
+
+        Args:
+            path (str): Location of the journal file
+            header (variant): Description of the sweep, anything that can be written as JSON
+        Returns:
+
+        """
+        self.path = path
+        self.header = json.loads(json.dumps(header))  # the header as it will be read back
+        self.completed = []
+        if os.path.exists(path):
+            self._read()
+        else:
+            self.file = open(path, "w")
+            self._write_line({"header": self.header})
+
+    def _read(self):
+        """Private method that reads back the steps recorded by an earlier run
+
+        A line cut short by the earlier run stopping is dropped from the file.
+
+        Args:
+
+        Returns:
+
+        """
+        self.file = open(self.path, "r+")
+        complete_length = 0
+        for line in iter(self.file.readline, ""):
+            if not line.endswith("\n"):
+                break  # the last write did not finish
+            entry = json.loads(line)
+            if complete_length == 0:
+                if entry.get("header") != self.header:
+                    self.file.close()
+                    raise Exception("Journal " + self.path + " was written by a different sweep")
+            else:
+                self.completed.append(entry)
+            complete_length = self.file.tell()
+        if complete_length == 0:
+            self.file.close()
+            raise Exception("Journal " + self.path + " has no header")
+        self.file.seek(complete_length)
+        self.file.truncate()
+
+    def _write_line(self, entry):
+        """Private method that writes one line to the journal and makes sure it is on disk
+
+        Args:
+            entry (dict): Values to write
+        Returns:
+
+        """
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, step):
+        """Adds a completed step to the journal
+
+        Args:
+            step (dict): Values recorded in the step
+        Returns:
+
+        """
+        entry = {}
+        for name in step:
+            entry[name] = np.asarray(step[name]).tolist()  # numpy values are stored as plain numbers and lists
+        self._write_line(entry)
+
+    def close(self, finished=False):
+        """Closes the journal
+
+        Args:
+            finished (bool): True if the sweep completed, in which case the journal is removed
+                so that running the same sweep again starts from the beginning.
+        Returns:
+
+        """
+        self.file.close()
+        if finished:
+            os.remove(self.path)
+
+
+class Sweep_Plan():
+    """Declares what a sweep does at each point, without doing it.
+
+    At each point the setpoints are applied in order, the plan waits for the settling
+    time, or calls the settle function if one is given, then the measurements are taken
+    in order. Setpoints and measurements are
+    (name, callable) pairs, each callable is given the step so far as a dict holding
+    "point" and every value already recorded in the step, and what it returns is
+    recorded under its name.
+
+    Attributes:
+        points (iterable): Values of the point at each step
+        setpoints ((str, callable) list): Calls that move the instruments to the point
+        measurements ((str, callable) list): Calls that read back the results at the point
+        settling_time (float): Time in seconds to wait between the setpoints and measurements
+        settle (callable): Called with the step in place of waiting for the settling time,
+            returns the time it spent settling. Can be None
+        start (callable): Called with the index of the first point that will be run, before
+            it is run. Can be None
+        finish (callable): Called with no arguments after the last step, can be None
+        journal (Sweep_Journal): Record of completed steps, steps it already holds are not run
+            again. Can be None
+        store (Sweep_Store): Where the full resolution values of every step are saved, can be None
+    """
+
+    def __init__(self, points, setpoints, measurements, settling_time=0, settle=None, start=None, finish=None,
+                 journal=None, store=None):
+        """Stores the plan
+
+        Args:
+            points (iterable): Values of the point at each step
+            setpoints ((str, callable) list): Calls that move the instruments to the point
+            measurements ((str, callable) list): Calls that read back the results at the point
+            settling_time (float): Time in seconds to wait between the setpoints and measurements
+            settle (callable): Called with the step in place of waiting for the settling time
+            start (callable): Called with the index of the first point that will be run
+            finish (callable): Called with no arguments after the last step
+            journal (Sweep_Journal): Record of completed steps
+            store (Sweep_Store): Where the values of every step are saved
+        Returns:
+
+        """
+        if type(settling_time) != float and type(settling_time) != int and np.float64 != np.dtype(settling_time):
+            raise TypeError
+        elif settling_time < 0:
+            raise ValueError
+        self.points = points
+        self.setpoints = list(setpoints)
+        self.measurements = list(measurements)
+        self.settling_time = settling_time
+        self.settle = settle
+        self.start = start
+        self.finish = finish
+        self.journal = journal
+        self.store = store
+
+    def run(self, executor=None):
+        """Runs the plan
+
+        Args:
+            executor (executor Obj): Object with a run(plan) method that performs the steps,
+                a Sequential_Executor is used if None is given.
+        Returns:
+            Sweep_Results: The values recorded at each step
+        """
+        if executor is None:
+            executor = Sequential_Executor()
+        return executor.run(self)
+
+
+class Sequential_Executor():
+    """Runs the steps of a Sweep_Plan one after the other.
+
+    Along with the values from the plan, the time each step started at, relative to the
+    first step, is recorded as "step_start", the time spent settling as "settle_time" and
+    the time the whole step took as "step_time". If a latency log is given, the set,
+    settle and measure parts of each step are timed in it and tagged with the step index.
+
+    Attributes:
+        sleep (callable): Function used to wait for the settling time
+        clock (callable): Function that returns the current time in seconds
+        latency_log (Latency_Log): Log the parts of each step are timed in, None to not time them
+    """
+
+    def __init__(self, sleep=time.sleep, clock=time.time, latency_log=None):
+        """Sets up the executor
+
+        Args:
+            sleep (callable): Function used to wait for the settling time
+            clock (callable): Function that returns the current time in seconds
+            latency_log (Latency_Log): Log the parts of each step are timed in, normally
+                Instrument_Transport.latency_log, None to not time them
+        Returns:
+
+        """
+        self.sleep = sleep
+        self.clock = clock
+        self.latency_log = latency_log
+
+    def _phase(self, phase):
+        """Private method that times one part of a step in the latency log
+
+        Args:
+            phase (str): "set", "settle" or "measure"
+        Returns:
+            context manager: Times the with block, or does nothing if there is no latency log
+        """
+        if self.latency_log is None:
+            return _Untimed()
+        return self.latency_log.phase_timed(phase)
+
+    def run_step(self, plan, point):
+        """Applies the setpoints, settles and takes the measurements at one point
+
+        Args:
+            plan (Sweep_Plan): Plan being run
+            point: Value of the point
+        Returns:
+            dict: The values recorded in the step
+        """
+        step = {"point": point}
+        with self._phase("set"):
+            for name, setpoint in plan.setpoints:
+                step[name] = setpoint(step)  # move the instruments
+        with self._phase("settle"):
+            if plan.settle is not None:
+                step["settle_time"] = plan.settle(step)  # wait until the readings stop changing
+            else:
+                if plan.settling_time > 0:
+                    self.sleep(plan.settling_time)  # wait for the signal to settle
+                step["settle_time"] = plan.settling_time
+        with self._phase("measure"):
+            for name, measurement in plan.measurements:
+                step[name] = measurement(step)  # read back the results
+        return step
+
+    def run(self, plan):
+        """Runs every step of the plan
+
+        Args:
+            plan (Sweep_Plan): Plan to run
+        Returns:
+            Sweep_Results: The values recorded at each step
+        """
+        if hasattr(plan.points, "__len__"):
+            results = Sweep_Results(len(plan.points))  # the number of steps is known, so make room for all of them
+        else:
+            results = Sweep_Results()
+        completed = []
+        if plan.journal is not None:
+            completed = plan.journal.completed  # steps recorded by an earlier run
+        points = iter(plan.points)
+        for step in completed:
+            if json.dumps(np.asarray(next(points)).tolist()) != json.dumps(step["point"]):
+                raise Exception("Journal does not match the points of the sweep")
+            results.append(step)  # already measured, so not run again
+        if plan.store is not None:
+            plan.store.reconcile(completed)  # keeps the steps saved by an earlier run that the journal holds
+
+        started = False
+        finished = False
+        first_step = None
+        try:
+            for point in points:
+                if not started:
+                    started = True
+                    if plan.start is not None:
+                        plan.start(len(completed))
+                step_start = self.clock()
+                if first_step is None:
+                    first_step = step_start
+                if self.latency_log is not None:
+                    self.latency_log.start_step(len(results))  # instrument calls are tagged with the step
+                step = self.run_step(plan, point)
+                step["step_start"] = step_start - first_step
+                step["step_time"] = self.clock() - step_start
+                results.append(step)
+                if plan.journal is not None:
+                    plan.journal.record(step)
+                if plan.store is not None:
+                    plan.store.record(step)
+            finished = True
+        finally:
+            if self.latency_log is not None:
+                self.latency_log.start_step(None)
+            if started and plan.finish is not None:
+                plan.finish()  # always leave the instruments in a known state
+            if plan.journal is not None:
+                plan.journal.close(finished)  # kept if the sweep stopped part way, so it can be resumed
+            if plan.store is not None:
+                plan.store.close()
+        return results
+
+
+class _Untimed():
+    """Context manager used by Sequential_Executor when there is no latency log"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
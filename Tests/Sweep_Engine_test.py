@@ -0,0 +1,155 @@
+import unittest
+import os
+import shutil
+import tempfile
+from mock import patch, MagicMock
+from Sweep_Engine import *
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.BPM = MagicMock()
+        self.BPM.get_snapshot.return_value = {"X_position": 1.5, "Y_position": -0.5}
+        self.sleep = MagicMock()
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        pass
+
+    def test_setpoints_and_measurements_recorded_in_order(self):
+        plan = Sweep_Plan(
+            points=[1, 2, 3],
+            setpoints=[("doubled", lambda step: 2 * step["point"]),
+                       ("tripled", lambda step: step["doubled"] + step["point"])],
+            measurements=BPM_measurements(self.BPM, ["X_position", "Y_position"]))
+        results = plan.run(Sequential_Executor(sleep=self.sleep))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(list(results["doubled"]), [2, 4, 6])
+        self.assertEqual(list(results["tripled"]), [3, 6, 9])
+        self.assertEqual(list(results["X_position"]), [1.5, 1.5, 1.5])
+        self.assertEqual(list(results["Y_position"]), [-0.5, -0.5, -0.5])
+        self.assertFalse(self.sleep.called)
+
+    def test_settling_time_waited_each_step(self):
+        plan = Sweep_Plan([1, 2], [], [], settling_time=0.2)
+        plan.run(Sequential_Executor(sleep=self.sleep))
+        self.assertEqual(self.sleep.call_args_list, [((0.2,),), ((0.2,),)])
+
+    def test_settle_used_in_place_of_settling_time(self):
+        self.BPM.settle.return_value = 0.05
+        plan = Sweep_Plan([1, 2], [], [], settling_time=0.2, settle=BPM_settle(self.BPM, 0.5, tolerance=0.1))
+        results = plan.run(Sequential_Executor(sleep=self.sleep))
+        self.assertFalse(self.sleep.called)
+        self.assertEqual(list(results["settle_time"]), [0.05, 0.05])
+        self.BPM.settle.assert_called_with(0.5, tolerance=0.1)
+
+    def test_bpm_measurements_take_one_snapshot_each_step(self):
+        plan = Sweep_Plan([1, 2], [], BPM_measurements(self.BPM, ["X_position", "Y_position"],
+                                                       {"X_position": "measured_x"}))
+        results = plan.run(Sequential_Executor(sleep=self.sleep))
+        self.assertEqual(self.BPM.get_snapshot.call_count, 2)
+        self.assertEqual(list(results["measured_x"]), [1.5, 1.5])
+        self.assertEqual(list(results["Y_position"]), [-0.5, -0.5])
+
+    def test_step_timing_recorded(self):
+        clock = MagicMock(side_effect=[10.0, 10.5, 11.0, 11.25])
+        results = Sweep_Plan([1, 2], [], []).run(Sequential_Executor(sleep=self.sleep, clock=clock))
+        self.assertEqual(list(results["step_start"]), [0.0, 1.0])
+        self.assertEqual(list(results["step_time"]), [0.5, 0.25])
+
+    def test_step_phases_timed_in_latency_log(self):
+        latency_log = MagicMock()
+        plan = Sweep_Plan([1, 2], [], BPM_measurements(self.BPM, ["X_position"]))
+        plan.run(Sequential_Executor(sleep=self.sleep, latency_log=latency_log))
+        self.assertEqual([call[0][0] for call in latency_log.phase_timed.call_args_list],
+                         ["set", "settle", "measure", "set", "settle", "measure"])
+        self.assertEqual([call[0][0] for call in latency_log.start_step.call_args_list], [0, 1, None])
+
+    def test_finish_called_if_step_fails(self):
+        start = MagicMock()
+        finish = MagicMock()
+        plan = Sweep_Plan([1], [("fails", MagicMock(side_effect=ValueError))], [], start=start, finish=finish)
+        self.assertRaises(ValueError, plan.run, Sequential_Executor(sleep=self.sleep))
+        start.assert_called_with(0)
+        self.assertTrue(finish.called)
+
+    def test_journal_resumes_from_first_missing_step(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "sweep.journal")
+            readings = MagicMock(side_effect=[1.0, 2.0, IOError, 3.0, 4.0])
+            start = MagicMock()
+            plan = Sweep_Plan([10, 20, 30, 40], [("x", lambda step: step["point"])], [("y", lambda step: readings())],
+                              start=start, journal=Sweep_Journal(path, ["test", 1]))
+            self.assertRaises(IOError, plan.run, Sequential_Executor(sleep=self.sleep))
+            self.assertTrue(os.path.exists(path))  # kept so the sweep can be resumed
+
+            plan.journal = Sweep_Journal(path, ["test", 1])
+            self.assertEqual(len(plan.journal.completed), 2)
+            results = plan.run(Sequential_Executor(sleep=self.sleep))
+            start.assert_called_with(2)
+            self.assertEqual(list(results["x"]), [10, 20, 30, 40])
+            self.assertEqual(list(results["y"]), [1.0, 2.0, 3.0, 4.0])
+            self.assertFalse(os.path.exists(path))  # removed once the sweep has finished
+        finally:
+            shutil.rmtree(directory)
+
+    def test_journal_for_different_sweep(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "sweep.journal")
+            Sweep_Journal(path, ["test", 1]).close()
+            self.assertRaises(Exception, Sweep_Journal, path, ["test", 2])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_journal_drops_unfinished_line(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "sweep.journal")
+            journal = Sweep_Journal(path, "test")
+            journal.record({"point": 1, "y": 2.0})
+            journal.file.write('{"point": 2, "y"')  # stopped part way through a write
+            journal.close()
+            journal = Sweep_Journal(path, "test")
+            self.assertEqual(journal.completed, [{"point": 1, "y": 2.0}])
+            journal.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_results_grow_past_capacity(self):
+        results = Sweep_Results(2)
+        for index in range(5):
+            results.append({"value": index, "pair": (index, -index)})
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results.capacity, 8)
+        self.assertEqual(list(results["value"]), [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(results["pair"].shape, (5, 2))
+
+    def test_results_columns_are_views(self):
+        results = Sweep_Plan(iter([0.5, 1.5]), [("x", lambda step: step["point"])], []).run(
+            Sequential_Executor(sleep=self.sleep))
+        column = results["x"]
+        self.assertIs(column.base, results.columns["x"])
+        self.assertEqual(list(column), [0.5, 1.5])
+
+    def test_results_if_step_changes_names(self):
+        results = Sweep_Results()
+        results.append({"x": 1})
+        self.assertRaises(ValueError, results.append, {"y": 1})
+        self.assertRaises(TypeError, Sweep_Results, 1.5)
+
+    def test_plan_if_invalid_input_types_used(self):
+        self.assertRaises(TypeError, Sweep_Plan, [1], [], [], "1")
+        self.assertRaises(ValueError, Sweep_Plan, [1], [], [], -1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+from pkg_resources import require
+require("numpy")
+import numpy as np
+import json
+import os
+try:
+    import h5py  # optional, without it the data is saved as a compressed NPZ file
+except ImportError:
+    h5py = None
+
+
+def load_sweep_data(path):
+    """Reads back the raw data saved by a Sweep_Store
+
+    HDF5 columns are returned as h5py datasets, these are only read from disk when they are
+    sliced, so long sweeps can be looked at without loading the whole file.
+
+    Args:
+        path (str): Location of the .h5 or .npz file
+    Returns:
+        variant: The header that was saved with the data
+        dict: Columns of the sweep, keyed by name
+    """
+    if path.endswith(".h5"):
+        if h5py is None:
+            raise Exception("h5py is needed to read " + path)
+        data = h5py.File(path, "r")
+        return json.loads(data.attrs["header"]), dict((name, data[name]) for name in data)
+    data = np.load(path)
+    header = json.loads(str(data["header"]))
+    return header, dict((name, data[name]) for name in data.files if name != "header")
+
+
+class Sweep_Store():
+    """Saves the full resolution values recorded by a sweep, along with a header.
+
+    If h5py is available each numeric column is a chunked, gzip compressed HDF5 dataset that
+    has each step appended to it as it is recorded. Without h5py each step is appended to a
+    ".part" file next to the NPZ file as it is recorded, and the compressed NPZ file is written
+    from it when the store is closed. Either way every step is on disk as soon as it is recorded.
+    Columns that are not numeric, such as values that are None, are not saved.
+
+    A file left by an earlier run of the same sweep is opened again rather than replaced, so
+    a resumed sweep keeps the steps it already saved. reconcile then makes the saved steps
+    match the steps its journal holds.
+
+    Attributes:
+        path (str): Location of the file, ending in ".h5" or ".npz"
+        header (variant): Description of the sweep, anything that can be written as JSON
+        chunk_rows (int): Number of steps in each HDF5 chunk
+        length (int): Number of steps saved
+    """
+
+    def __init__(self, path, header, chunk_rows=256):
+        """Opens the file the data will be saved to, keeping the steps saved by an earlier run
+
+        Args:
+            path (str): Location of the file, without the extension
+            header (variant): Description of the sweep, anything that can be written as JSON,
+                for example the test name, device names and parameters
+            chunk_rows (int): Number of steps in each HDF5 chunk
+        Returns:
+
+        """
+        if type(chunk_rows) != int:
+            raise TypeError
+        elif chunk_rows < 1:
+            raise ValueError
+        self.header = header
+        self.chunk_rows = chunk_rows
+        self.length = 0
+        self.columns = {}
+        if h5py is not None:
+            self.path = path + ".h5"
+            self.part = None
+            self.file = h5py.File(self.path, "a")
+            if self.file.attrs.get("header") == json.dumps(header):
+                for name in self.file:
+                    self.columns[name] = self.file[name]
+                if self.columns:
+                    # A column may be one step longer if the earlier run stopped part way through a step
+                    self.length = min(self.columns[name].shape[0] for name in self.columns)
+                if self.length == 0:
+                    self._truncate(0)  # the columns are made again from the first step
+            else:
+                self.file.close()
+                self.file = h5py.File(self.path, "w")  # Saved by a different sweep, so start again
+                self.file.attrs["header"] = json.dumps(header)
+        else:
+            self.path = path + ".npz"
+            self.file = None
+            self.step_starts = []  # Position in the part file where each step starts
+            if os.path.exists(self.path + ".part"):
+                self._read_part()
+            else:
+                self._new_part()
+
+    def _new_part(self):
+        """Private method that starts a part file holding just the header
+
+        Args:
+
+        Returns:
+
+        """
+        self.part = open(self.path + ".part", "w+b")  # read back when the store is closed
+        np.save(self.part, np.array(json.dumps(self.header)), allow_pickle=False)
+        self._sync_part()
+        self.header_end = self.part.tell()
+
+    def _sync_part(self):
+        """Private method that makes sure everything written to the part file is on disk
+
+        Args:
+
+        Returns:
+
+        """
+        self.part.flush()
+        os.fsync(self.part.fileno())
+
+    def _read_part(self):
+        """Private method that reads back the steps saved in the part file by an earlier run
+
+        The part file holds the header, then the column names, then the value of each column
+        at each step, each written with np.save. A step cut short by the earlier run stopping
+        is dropped from the file.
+
+        Args:
+
+        Returns:
+
+        """
+        self.part = open(self.path + ".part", "r+b")
+        try:
+            header = str(np.load(self.part, allow_pickle=False))
+        except (IOError, ValueError):
+            header = None
+        if header != json.dumps(self.header):
+            self.part.close()
+            self._new_part()  # Saved by a different sweep, so start again
+            return
+        self.header_end = self.part.tell()
+        complete_length = self.header_end  # the column names are only kept if a step was finished
+        try:
+            names = np.load(self.part, allow_pickle=False).tolist()
+            step_start = self.part.tell()
+            while True:
+                values = [np.load(self.part, allow_pickle=False) for name in names]
+                self.step_starts.append(step_start)
+                step_start = complete_length = self.part.tell()
+                if self.length == 0:
+                    for name, value in zip(names, values):
+                        self.columns[name] = value.dtype
+                self.length += 1
+        except (IOError, ValueError):
+            pass  # The end of the file, or of the last step that was finished
+        self.part.seek(complete_length)
+        self.part.truncate()
+
+    def _create_columns(self, step):
+        """Private method that makes a column for each numeric value in the first step
+
+        Args:
+            step (dict): Values recorded in the first step
+        Returns:
+
+        """
+        for name in step:
+            value = np.asarray(step[name])
+            if value.dtype.kind not in "biufc":
+                continue  # only numbers are saved
+            dtype = value.dtype
+            if dtype.kind in "iu":
+                dtype = np.float64  # stops later non integer values being truncated
+            if self.file is not None:
+                self.columns[name] = self.file.create_dataset(
+                    name, shape=(0,) + value.shape, maxshape=(None,) + value.shape,
+                    chunks=(self.chunk_rows,) + value.shape, dtype=dtype, compression="gzip")
+            else:
+                self.columns[name] = np.dtype(dtype)
+        if self.file is None:
+            np.save(self.part, np.array(sorted(self.columns)), allow_pickle=False)
+
+    def record(self, step):
+        """Saves the values recorded in one step
+
+        Args:
+            step (dict): Values recorded in the step
+        Returns:
+
+        """
+        if self.length == 0:
+            self._create_columns(step)
+        if self.file is not None:
+            for name in self.columns:
+                self.columns[name].resize(self.length + 1, axis=0)
+                self.columns[name][self.length] = step[name]
+        else:
+            self.step_starts.append(self.part.tell())
+            for name in sorted(self.columns):
+                np.save(self.part, np.asarray(step[name], dtype=self.columns[name]), allow_pickle=False)
+        self.length += 1
+        if self.file is not None:
+            self.file.flush()  # the step is on disk even if the sweep stops later
+        else:
+            self._sync_part()
+
+    def reconcile(self, completed):
+        """Makes the saved steps match the steps held by the journal of a resumed sweep
+
+        Steps saved after the last one the journal holds are dropped, as the sweep will run
+        them again, and steps the journal holds that were not saved are added from it.
+
+        Args:
+            completed (dict list): Values of the steps held by the journal, in order
+        Returns:
+
+        """
+        if self.length > len(completed):
+            self._truncate(len(completed))
+        for step in completed[self.length:]:
+            self.record(step)
+
+    def _truncate(self, length):
+        """Private method that drops every step after the first length steps
+
+        Args:
+            length (int): Number of steps to keep
+        Returns:
+
+        """
+        if self.file is not None:
+            for name in list(self.columns):
+                if length == 0:
+                    del self.file[name]  # made again from the next step, which may have other columns
+                else:
+                    self.columns[name].resize(length, axis=0)
+            self.file.flush()
+        else:
+            self.part.seek(self.step_starts[length] if length > 0 else self.header_end)
+            self.part.truncate()
+            self._sync_part()
+            del self.step_starts[length:]
+        if length == 0:
+            self.columns = {}
+        self.length = length
+
+    def close(self):
+        """Finishes saving the data
+
+        Without h5py the NPZ file is written from the part file, which is then removed.
+
+        Args:
+
+        Returns:
+
+        """
+        if self.file is not None:
+            self.file.close()
+            return
+        names = sorted(self.columns)
+        arrays = dict((name, []) for name in names)
+        self.part.seek(self.step_starts[0] if self.step_starts else self.header_end)
+        for step in range(self.length):
+            for name in names:
+                arrays[name].append(np.load(self.part, allow_pickle=False))
+        self.part.close()
+        arrays = dict((name, np.array(arrays[name], dtype=self.columns[name])) for name in names)
+        np.savez_compressed(self.path, header=np.array(json.dumps(self.header)), **arrays)
+        os.remove(self.path + ".part")
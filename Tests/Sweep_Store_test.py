@@ -0,0 +1,119 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+from mock import patch
+from Sweep_Store import *
+
+
+class ExpectedDataTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Stuff you only run once
+        super(ExpectedDataTest, cls).setUpClass()
+
+    def setUp(self):
+        # Stuff you run before each test
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "sweep")
+        self.steps = [{"point": (1, 2), "x": 1, "label": None},
+                      {"point": (3, 4), "x": 2.5, "label": None}]
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        # Stuff you want to run after each test
+        shutil.rmtree(self.directory)
+
+    def _save(self):
+        store = Sweep_Store(self.path, ["test", ["device"], ["parameter"]], chunk_rows=1)
+        for step in self.steps:
+            store.record(step)
+        store.close()
+        return store
+
+    def _stop(self, store):
+        # Closes the file without finishing the store, like a run that stopped part way
+        if store.file is not None:
+            store.file.close()
+        else:
+            store.part.close()
+
+    def _resume(self):
+        store = Sweep_Store(self.path, ["test", ["device"], ["parameter"]], chunk_rows=1)
+        store.record(self.steps[0])
+        self._stop(store)
+        store = Sweep_Store(self.path, ["test", ["device"], ["parameter"]], chunk_rows=1)
+        self.assertEqual(store.length, 1)  # kept from the run that stopped
+        store.reconcile(self.steps)  # the journal holds a step the store missed
+        self.assertEqual(store.length, 2)
+        store.close()
+        header, columns = load_sweep_data(store.path)
+        self.assertEqual(columns["x"][:].tolist(), [1.0, 2.5])
+
+    @patch.object(sys.modules[Sweep_Store.__module__], "h5py", None)
+    def test_npz_resumed_from_journal(self):
+        self._resume()
+        self.assertFalse(os.path.exists(self.path + ".npz.part"))
+
+    @unittest.skipIf(h5py is None, "h5py is not installed")
+    def test_h5_resumed_from_journal(self):
+        self._resume()
+
+    @patch.object(sys.modules[Sweep_Store.__module__], "h5py", None)
+    def test_npz_steps_on_disk_before_close(self):
+        store = Sweep_Store(self.path, "test")
+        for step in self.steps:
+            store.record(step)
+        store.part.write("\x93NUMPY")  # stopped part way through a write
+        self._stop(store)
+        store = Sweep_Store(self.path, "test")
+        self.assertEqual(store.length, 2)
+        store.reconcile(self.steps[:1])  # the journal did not get the last step, so it is run again
+        self.assertEqual(store.length, 1)
+        store.record({"point": (5, 6), "x": 4.0, "label": None})
+        store.close()
+        header, columns = load_sweep_data(store.path)
+        self.assertEqual(columns["point"].tolist(), [[1, 2], [5, 6]])
+        self.assertEqual(columns["x"].tolist(), [1.0, 4.0])
+
+    @patch.object(sys.modules[Sweep_Store.__module__], "h5py", None)
+    def test_finished_or_different_sweep_started_again(self):
+        self._save()
+        store = Sweep_Store(self.path, ["test", ["device"], ["parameter"]])
+        store.reconcile([])  # the journal of a finished sweep is removed, so nothing is kept
+        store.record(self.steps[1])
+        self._stop(store)
+        store = Sweep_Store(self.path, "another test")
+        self.assertEqual(store.length, 0)
+        store.close()
+        header, columns = load_sweep_data(store.path)
+        self.assertEqual(header, "another test")
+        self.assertEqual(columns, {})
+
+    @patch.object(sys.modules[Sweep_Store.__module__], "h5py", None)  # the module, whether run from Tests or the root
+    def test_npz_written_without_h5py(self):
+        store = self._save()
+        self.assertEqual(store.path, self.path + ".npz")
+        header, columns = load_sweep_data(store.path)
+        self.assertEqual(header, ["test", ["device"], ["parameter"]])
+        self.assertEqual(sorted(columns), ["point", "x"])  # None is not numeric so is not saved
+        self.assertEqual(columns["point"].tolist(), [[1, 2], [3, 4]])
+        self.assertEqual(columns["x"].tolist(), [1.0, 2.5])
+
+    @unittest.skipIf(h5py is None, "h5py is not installed")
+    def test_h5_written_with_h5py(self):
+        store = self._save()
+        self.assertEqual(store.path, self.path + ".h5")
+        header, columns = load_sweep_data(store.path)
+        self.assertEqual(header, ["test", ["device"], ["parameter"]])
+        self.assertEqual(columns["point"][:].tolist(), [[1, 2], [3, 4]])
+        self.assertEqual(columns["x"][:].tolist(), [1.0, 2.5])
+
+    def test_store_if_invalid_input_types_used(self):
+        self.assertRaises(TypeError, Sweep_Store, self.path, "test", 1.5)
+        self.assertRaises(ValueError, Sweep_Store, self.path, "test", 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,13 @@
 import RFSignalGenerators
 import BPMDevice
+import Instrument_Transport
 from pkg_resources import require
 
 require("numpy")
-require("cothread")
 require("matplotlib")
 import numpy as np
 import matplotlib.pyplot as plt
-import time
+from Sweep_Engine import *
 
 
 
@@ -44,6 +44,7 @@ def Template(RF,
     test_name = test_name.rsplit("Tests.")[1]
     test_name = test_name.replace("_", " ")
     print("Starting test \"" + test_name + "\"")
+    Instrument_Transport.latency_log.start_test(test_name)  # Instrument calls from here on are timed against this test
 
     # Readies devices that are used in the test so that they can be added to the report
     device_names = []
@@ -58,11 +59,17 @@ def Template(RF,
     parameter_names.append("Argument4: " + str(argument4))
 
     # Perform the test and plot the results
-    x = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
-    y = []
-    for index in x:
-        y.append(2*index)
+    plan = Sweep_Plan(
+        points=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+        setpoints=[("x", lambda step: step["point"])],  # Move the instruments to the point here
+        measurements=[("y", lambda step: 2*step["x"])])  # Read back the results here
+    results = plan.run(Sequential_Executor(sleep=Instrument_Transport.station_clock.sleep,
+                                           clock=Instrument_Transport.station_clock.time,
+                                           latency_log=Instrument_Transport.latency_log))
+    x = results["x"]
+    y = results["y"]
 
+    report_start = Instrument_Transport.station_clock.time()  # Plotting and reporting are timed as the report phase
     plt.plot(x,y)
 
     if report == None:
@@ -74,4 +81,4 @@ def Template(RF,
         report.setup_test(test_name, intro_text, device_names, parameter_names)
         report.add_figure_to_test(test_name)
 
-
+    Instrument_Transport.latency_log.record("phase", "report", Instrument_Transport.station_clock.time() - report_start)
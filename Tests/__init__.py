@@ -1,6 +1,13 @@
-from Beam_Power_Dependence import *
-from Fixed_voltage_amplitude_fill_pattern_test import *
-from Scaled_voltage_amplitude_fill_pattern_test import *
-from Template import *
-from Beam_position_attenuation_permutation_test import Beam_position_attenuation_permutation_test
-from Beam_position_equidistant_grid_raster_scan_test import Beam_position_equidistant_grid_raster_scan_test
+from Sweep_Engine import *
+import Instrument_Transport
+
+# Each test, and matplotlib behind it, is only imported when it is first used
+Instrument_Transport.lazy_package(__name__, {
+    "Sweep_Store": "Sweep_Store",
+    "load_sweep_data": "Sweep_Store",
+    "Beam_Power_Dependence": "Beam_Power_Dependence",
+    "Fixed_voltage_amplitude_fill_pattern_test": "Fixed_voltage_amplitude_fill_pattern_test",
+    "Scaled_voltage_amplitude_fill_pattern_test": "Scaled_voltage_amplitude_fill_pattern_test",
+    "Template": "Template",
+    "Beam_position_attenuation_permutation_test": "Beam_position_attenuation_permutation_test",
+    "Beam_position_equidistant_grid_raster_scan_test": "Beam_position_equidistant_grid_raster_scan_test"})